@@ -0,0 +1,162 @@
+"""
+Load generator for api_server.py.
+
+Each simulated client keeps one connection open and sends requests back to
+back for the given duration, mixing the reads and writes of a quiz: loading
+a hot public deck, listing and loading its own decks, checking answers and
+saving progress. Reports requests per second and latency percentiles.
+
+Usage, against a server already running on localhost:
+    python src/api_load.py --port 8765 --clients 50 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from api_server import DEFAULT_HOST, DEFAULT_PORT
+
+# Relative frequency of each kind of request in the mix
+REQUEST_MIX = (("public_deck", 4), ("answer", 4), ("progress", 2), ("decks", 1))
+
+class ApiClient:
+    """A keep-alive connection to the API server."""
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.token: Optional[str] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, payload: Dict[str, Any] = None) -> Tuple[int, Any]:
+        """Sends one request and returns the status code and decoded JSON body."""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self._writer.write(head.encode('latin-1') + b"\r\n" + body)
+        await self._writer.drain()
+
+        status_line, _, header_block = (await self._reader.readuntil(b"\r\n\r\n")).decode('latin-1').partition("\r\n")
+        headers = {}
+        for line in header_block.split("\r\n"):
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        data = await self._reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return int(status_line.split(" ", 2)[1]), json.loads(data) if data else None
+
+    async def login(self, username: str, password: str):
+        """Logs in, registering the account first if it does not exist yet."""
+        credentials = {"username": username, "password": password}
+        status, body = await self.request("POST", "/login", credentials)
+        if status == 401:
+            await self.request("POST", "/register", dict(credentials, hint="load test"))
+            status, body = await self.request("POST", "/login", credentials)
+        if status != 200:
+            raise RuntimeError(f"Login failed: {body}")
+        self.token = body["token"]
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+async def _prepare(host: str, port: int, username: str, password: str) -> Tuple[str, Dict[str, Any]]:
+    """Logs in and imports the first public deck. Returns the token and the deck."""
+    client = ApiClient(host, port)
+    try:
+        await client.login(username, password)
+        _, catalog = await client.request("GET", "/public")
+        if not catalog:
+            raise RuntimeError("The server has no public decks to load.")
+        deck_id = catalog[0]["deck_id"]
+        await client.request("POST", f"/public/{deck_id}/import")
+        _, deck = await client.request("GET", f"/decks/{deck_id}")
+        return client.token, deck
+    finally:
+        client.close()
+
+async def _run_client(host: str, port: int, token: str, deck: Dict[str, Any], deadline: float,
+                      latencies: List[float], errors: List[int]):
+    client = ApiClient(host, port)
+    client.token = token
+    kinds = [kind for kind, weight in REQUEST_MIX for _ in range(weight)]
+    deck_id, cards = deck["deck_id"], deck["cards"]
+    correct = total = 0
+    try:
+        while time.perf_counter() < deadline:
+            kind = random.choice(kinds)
+            if kind == "public_deck":
+                method, path, payload = "GET", f"/public/{deck_id}", None
+            elif kind == "answer":
+                index = random.randrange(len(cards))
+                method, path = "POST", f"/decks/{deck_id}/answer"
+                payload = {"card": index, "answer": cards[index]["back"], "strictness": 80}
+            elif kind == "progress":
+                correct, total = correct + 1, total + 1
+                method, path, payload = "POST", f"/decks/{deck_id}/progress", {"correct": correct, "total": total}
+            else:
+                method, path, payload = "GET", "/decks", None
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, payload)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        client.close()
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def run_load(host: str, port: int, clients: int, duration: float,
+                   username: str = "loadtest", password: str = "loadtest") -> Dict[str, float]:
+    """Runs the load test and returns its request rate and latencies in milliseconds."""
+    token, deck = await _prepare(host, port, username, password)
+    if not deck or not deck.get("cards"):
+        raise RuntimeError("The public deck has no cards to quiz.")
+    latencies: List[float] = []
+    errors: List[int] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_run_client(host, port, token, deck, start + duration, latencies, errors)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 0.5) * 1000 if latencies else 0.0,
+        "p99_ms": _percentile(latencies, 0.99) * 1000 if latencies else 0.0,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure the request rate of a running api_server.py.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=50, help="concurrent connections (default 50)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (default 10)")
+    parser.add_argument("--user", default="loadtest", help="account to run as, registered if missing")
+    parser.add_argument("--password", default="loadtest")
+    args = parser.parse_args(argv)
+
+    try:
+        result = asyncio.run(run_load(args.host, args.port, args.clients, args.duration, args.user, args.password))
+    except (OSError, RuntimeError) as e:
+        print(f"Load test failed: {e}", file=sys.stderr)
+        return 1
+    print(f"{result['requests']} requests in {args.duration:g}s with {args.clients} clients: "
+          f"{result['requests_per_second']:.0f} req/s, p50 {result['p50_ms']:.1f} ms, "
+          f"p99 {result['p99_ms']:.1f} ms, {result['errors']} errors")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Local HTTP/JSON service over the deck, quiz and progress core, so many
+clients can share one data directory.
+
+The server is a single asyncio event loop speaking plain HTTP/1.1 with
+keep-alive. File I/O runs on a thread pool, and password hashing on the
+auth module's own pool, so the loop only parses requests and routes them.
+Parsed decks come from the persistence module's deck cache, which every
+client shares. Concurrent requests for the same public deck or catalog are
+coalesced into one load. Each user's progress writes are applied one at a
+time, in the order they arrived.
+
+Endpoints (all bodies are JSON, authenticated ones need "Authorization: Bearer <token>"):
+    POST /register                  {"username", "password", "hint"}
+    POST /login                     {"username", "password"} -> {"token"}
+    GET  /decks                     the user's decks with their progress
+    GET  /decks/<id>                one of the user's decks, with its cards
+    POST /decks/<id>/answer         {"card", "answer", "strictness", "typo_tolerant"} -> {"correct", "answer"}
+    POST /decks/<id>/progress       {"correct", "total"}
+    GET  /progress                  the user's progress totals
+    GET  /public[?q=<query>]        the public catalog, or a search of it
+    GET  /public/<id>               one public deck, with its cards
+    POST /public/<id>/import        imports a public deck for the user
+
+Usage:
+    python src/api_server.py --port 8765
+See api_load.py for a load generator.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import re
+import secrets
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import auth
+import persistence
+from exceptions import AuthenticationError, CardError, DeckLoadError
+from matcher import matcher_for
+from models import Deck, card_key
+
+# Encode with orjson when it is installed, it is several times faster than the json module
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+except ImportError:
+    def _json_dumps(data: Any) -> bytes:
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Threads for blocking file I/O
+IO_WORKERS = 16
+# How long a login token stays valid
+SESSION_SECONDS = 12 * 60 * 60
+# Expired tokens are dropped by the first login after this many seconds
+SESSION_SWEEP_SECONDS = 60
+# Larger request bodies are refused
+MAX_BODY_BYTES = 1024 * 1024
+# Connections idle for longer than this are closed
+IDLE_TIMEOUT_SECONDS = 60
+
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class HttpError(Exception):
+    """An error that is sent to the client as a status code and message."""
+    def __init__(self, status: int, message: str):
+        self.status = status
+        self.message = message
+        super().__init__(message)
+
+class Request:
+    """A parsed request, with the user it was authenticated as, if any."""
+    __slots__ = ("method", "path", "query", "headers", "body", "username")
+
+    def __init__(self, method: str, path: str, query: Dict[str, List[str]], headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.username: Optional[str] = None
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON.")
+        if not isinstance(data, dict):
+            raise HttpError(400, "Request body must be a JSON object.")
+        return data
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """Reads one request from a connection, or returns None once the client has closed it."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "Request headers are too large.")
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line.")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Malformed Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body is too large.")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return Request(method.upper(), unquote(url.path), parse_qs(url.query), headers, body)
+
+def encode_response(status: int, payload: Any, keep_alive: bool = True) -> bytes:
+    """Returns a complete HTTP response with payload as its JSON body."""
+    body = _json_dumps(payload)
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+Handler = Callable[..., Awaitable[Any]]
+
+class FlashcardServer:
+    """The routes, sessions and shared state of one API server."""
+    def __init__(self, io_workers: int = IO_WORKERS):
+        self.users = auth.load_users()
+        self._executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="api-io")
+        # token -> (username, expiry)
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._next_session_sweep = 0.0
+        # Loads in progress, shared by every request that asks for the same thing meanwhile
+        self._in_flight: Dict[Tuple[str, ...], asyncio.Future] = {}
+        # username -> [lock, requests holding or waiting for it]; dropped when no request needs it
+        self._progress_locks: Dict[str, List] = {}
+        # Serialized cards of decks in the deck cache, dropped along with the deck
+        self._card_payloads: "weakref.WeakKeyDictionary[Deck, List[Dict[str, str]]]" = weakref.WeakKeyDictionary()
+        self._routes: List[Tuple[str, "re.Pattern", Handler, bool]] = [
+            ("POST", re.compile(r"/register"), self.register, False),
+            ("POST", re.compile(r"/login"), self.login, False),
+            ("GET", re.compile(r"/decks"), self.list_decks, True),
+            ("GET", re.compile(r"/decks/([^/]+)"), self.get_deck, True),
+            ("POST", re.compile(r"/decks/([^/]+)/answer"), self.check_answer, True),
+            ("POST", re.compile(r"/decks/([^/]+)/progress"), self.save_progress, True),
+            ("GET", re.compile(r"/progress"), self.progress_summary, True),
+            ("GET", re.compile(r"/public"), self.list_public, False),
+            ("GET", re.compile(r"/public/([^/]+)"), self.get_public_deck, False),
+            ("POST", re.compile(r"/public/([^/]+)/import"), self.import_public, True),
+        ]
+
+    async def _run(self, func: Callable, *args) -> Any:
+        """Runs a blocking call on the I/O threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _coalesced(self, key: Tuple[str, ...], func: Callable, *args) -> Any:
+        """Runs a blocking call, unless an identical one is already running, whose result is shared."""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(self._run(func, *args))
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # A client that disconnects must not cancel the load for the others
+        return await asyncio.shield(future)
+
+    def _cards_payload(self, deck: Deck) -> List[Dict[str, str]]:
+        cards = self._card_payloads.get(deck)
+        if cards is None:
+            cards = self._card_payloads[deck] = [card.to_dict() for card in deck.cards]
+        return cards
+
+    def _sweep_sessions(self):
+        """Drops expired tokens, at most once every SESSION_SWEEP_SECONDS."""
+        now = time.monotonic()
+        if now < self._next_session_sweep:
+            return
+        self._next_session_sweep = now + SESSION_SWEEP_SECONDS
+        for token in [token for token, (_, expiry) in self._sessions.items() if expiry < now]:
+            del self._sessions[token]
+
+    def _authenticate(self, request: Request):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        session = self._sessions.get(token) if scheme.lower() == "bearer" else None
+        if session is None or session[1] < time.monotonic():
+            self._sessions.pop(token, None)
+            raise HttpError(401, "Login required.")
+        request.username = session[0]
+
+    async def dispatch(self, request: Request) -> Tuple[int, Any]:
+        """Routes a request to its handler and turns errors into status codes."""
+        allowed = False
+        for method, pattern, handler, needs_login in self._routes:
+            match = pattern.fullmatch(request.path.rstrip("/") or "/")
+            if match is None:
+                continue
+            if method != request.method:
+                allowed = True
+                continue
+            try:
+                if needs_login:
+                    self._authenticate(request)
+                return 200, await handler(request, *match.groups())
+            except HttpError as e:
+                return e.status, {"error": e.message}
+            except AuthenticationError as e:
+                return 401, {"error": e.message}
+            except DeckLoadError as e:
+                return 404, {"error": e.message}
+            except KeyError as e:
+                return 400, {"error": f"Missing field: {e.args[0]}"}
+            except (CardError, ValueError, TypeError) as e:
+                return 400, {"error": str(e)}
+        if allowed:
+            return 405, {"error": "Method not allowed."}
+        return 404, {"error": "Not found."}
+
+    # --- Handlers ---
+
+    async def register(self, request: Request) -> Dict[str, Any]:
+        data = request.json()
+        return await asyncio.wrap_future(auth.submit_registration(
+            self.users, data.get("username"), data.get("password"), data.get("hint")))
+
+    async def login(self, request: Request) -> Dict[str, Any]:
+        data = request.json()
+        user = await asyncio.wrap_future(auth.submit_login(self.users, data.get("username"), data.get("password")))
+        token = secrets.token_urlsafe(32)
+        self._sweep_sessions()
+        self._sessions[token] = (user["username"], time.monotonic() + SESSION_SECONDS)
+        return {"token": token, "username": user["username"]}
+
+    async def list_decks(self, request: Request) -> List[Dict[str, Any]]:
+        decks = await self._run(persistence.load_all_user_decks, {"username": request.username})
+        return [{"deck_id": deck_id, "name": deck.name, "card_count": len(deck.cards), "progress": deck.progress}
+                for deck_id, deck in decks.items()]
+
+    async def _user_deck(self, username: str, deck_id: str) -> Deck:
+        return await self._coalesced(("deck", username, deck_id), persistence.load_user_deck, username, deck_id)
+
+    async def get_deck(self, request: Request, deck_id: str) -> Dict[str, Any]:
+        deck = await self._user_deck(request.username, deck_id)
+        progress = await self._run(persistence.load_progress, request.username, deck_id)
+        return {"deck_id": deck_id, "name": deck.name, "cards": self._cards_payload(deck), "progress": progress}
+
+    async def check_answer(self, request: Request, deck_id: str) -> Dict[str, Any]:
+        data = request.json()
+        deck = await self._user_deck(request.username, deck_id)
+        index = int(data["card"])
+        if not 0 <= index < len(deck.cards):
+            raise HttpError(400, "Card index out of range.")
+        card = deck.cards[index]
+        correct = matcher_for(card).matches(str(data.get("answer", "")), float(data.get("strictness", 80)),
+                                            bool(data.get("typo_tolerant", False)))
+        return {"correct": correct, "answer": card.back}
+
+    async def save_progress(self, request: Request, deck_id: str) -> Dict[str, Any]:
+        data = request.json()
+        progress = {"correct": float(data["correct"]), "total": float(data["total"])}
+        # asyncio locks wake their waiters first come, first served, so writes keep their order
+        entry = self._progress_locks.setdefault(request.username, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(persistence.save_progress, request.username, deck_id, progress)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._progress_locks[request.username]
+        return {"deck_id": deck_id, "progress": progress}
+
+    async def progress_summary(self, request: Request) -> Dict[str, Any]:
+        return await self._run(persistence.load_progress_summary, request.username)
+
+    async def list_public(self, request: Request) -> Any:
+        query = request.query.get("q", [""])[0]
+        if query:
+            results = await self._coalesced(("search", query), persistence.search_public_decks, query, 50, True)
+            return [{"deck_id": deck_id, "score": score} for deck_id, score in results]
+        catalog = await self._coalesced(("catalog",), persistence.load_public_catalog)
+        return list(catalog.values())
+
+    async def get_public_deck(self, request: Request, deck_id: str) -> Dict[str, Any]:
+        deck = await self._coalesced(("public", deck_id), persistence.load_public_deck, deck_id)
+        return {"deck_id": deck_id, "name": deck.name, "cards": self._cards_payload(deck)}
+
+    async def import_public(self, request: Request, deck_id: str) -> Dict[str, Any]:
+        deck = await self._coalesced(("public", deck_id), persistence.load_public_deck, deck_id)
+        await self._run(persistence.import_public_deck, request.username, deck)
+        await self._run(persistence.update_due_index, request.username, deck_id, [card_key(card) for card in deck.cards])
+        return {"deck_id": deck_id, "name": deck.name}
+
+    # --- Connections ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves the requests of one keep-alive connection until either side closes it."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT_SECONDS)
+                except HttpError as e:
+                    writer.write(encode_response(e.status, {"error": e.message}, keep_alive=False))
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                if request is None:
+                    break
+                try:
+                    status, payload = await self.dispatch(request)
+                except Exception as e:
+                    print(f"Error handling {request.method} {request.path}: {e}")
+                    status, payload = 500, {"error": "Internal server error."}
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        """Starts listening. Port 0 picks a free port, see the returned server's sockets."""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        """Stops the I/O threads and writes pending progress."""
+        self._executor.shutdown(wait=True)
+        persistence.flush_progress()
+
+async def serve(host: str, port: int):
+    server = FlashcardServer()
+    listener = await server.start(host, port)
+    print(f"Serving on http://{host}:{listener.sockets[0].getsockname()[1]}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve decks, quizzes and progress over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default {DEFAULT_PORT})")
+    parser.add_argument("--storage", choices=("json", "sqlite"), help="storage backend (default: FLASHCARD_STORAGE or json)")
+    args = parser.parse_args(argv)
+
+    persistence.configure_storage(args.storage)
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,16 @@
-import json
 import os
 import hashlib
-from typing import Dict, Any
+import hmac
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
 
 from exceptions import AuthenticationError
+from names import check_name
+from password_hash import DEFAULT_PARAMS, hash_password, verify_password
+from user_store import UserStore
 
 # Paths for data storage
 
@@ -12,60 +19,121 @@ from pathlib import Path
 # Pathlib version (cleaner & recommended)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
+# Accounts from before the user store, migrated into it on first use
 USERS_FILE = os.path.join(DATA_DIR, "users.json")
+USERS_DIR = os.path.join(DATA_DIR, "users")
+# Hashing cost picked for this machine by `python src/password_hash.py`
+KDF_PARAMS_FILE = os.path.join(DATA_DIR, "kdf.json")
 
-def _ensure_dir_exists(path):
-    """Helper function to create a directory if it doesn't exist."""
-    if not os.path.exists(path):
-        os.makedirs(path)
+# Hashing releases the GIL, so a few threads keep the UI responsive during a login
+HASH_WORKERS = 2
+# How long a successful login lets the same password be accepted without rehashing
+VERIFY_CACHE_SECONDS = 5 * 60
+
+_kdf_params: Optional[Dict[str, Any]] = None
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_executor_lock = threading.Lock()
+# username -> (stored hash, keyed digest of the password, expiry); never holds the password itself
+_verified: Dict[str, Tuple[str, bytes, float]] = {}
+_verified_key = os.urandom(32)
 
 def _hash_password(password: str) -> str:
-    """Hashes a password using SHA-256 for secure storage."""
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def load_users() -> Dict[str, Any]:
-    """Loads user data from the users file."""
-    _ensure_dir_exists(DATA_DIR)
-    if not os.path.exists(USERS_FILE):
-        return {}
-    
-    with open(USERS_FILE, "r") as f:
-        return json.load(f)
+    """Hashes a password with a salted, memory-hard KDF for secure storage."""
+    return hash_password(password, _get_kdf_params())
+
+def _get_kdf_params() -> Dict[str, Any]:
+    """Returns the calibrated hashing cost, or the default cost if none was calibrated."""
+    global _kdf_params
+    if _kdf_params is None:
+        try:
+            with open(KDF_PARAMS_FILE, 'r') as f:
+                _kdf_params = json.load(f)
+        except (OSError, ValueError):
+            _kdf_params = dict(DEFAULT_PARAMS)
+    return _kdf_params
+
+def _password_digest(username: str, password: str) -> bytes:
+    return hmac.new(_verified_key, f"{username}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+
+def _recently_verified(username: str, password: str, stored: str) -> bool:
+    entry = _verified.get(username)
+    if entry is None:
+        return False
+    cached_hash, digest, expiry = entry
+    if time.monotonic() > expiry or cached_hash != stored:
+        # Expired, or the password was changed since
+        _verified.pop(username, None)
+        return False
+    return hmac.compare_digest(digest, _password_digest(username, password))
 
-def save_users(users: Dict[str, Any]):
-    """Saves user data to the users file."""
-    _ensure_dir_exists(DATA_DIR)
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
+def _remember_verified(username: str, password: str, stored: str):
+    _verified[username] = (stored, _password_digest(username, password), time.monotonic() + VERIFY_CACHE_SECONDS)
 
-def register_user(users: Dict[str, Any], username: str, password: str, hint: str) -> Dict[str, str]:
+def load_users() -> UserStore:
+    """
+    Opens the user store. No accounts are read until they are looked up, and
+    nothing is written until an account is: the accounts in the old users
+    file are migrated into the store before the first write.
+    """
+    return UserStore(USERS_DIR, legacy_file=USERS_FILE)
+
+def register_user(users: UserStore, username: str, password: str, hint: str) -> Dict[str, str]:
     """Registers a new user, saving their details."""
     if not username or not password or not hint:
         raise AuthenticationError("Username, password, and hint cannot be empty.")
+    # The username names the user's deck and progress directories
+    check_name(username, "username")
+    # Hashing is slow on purpose, so a taken name is turned down before it;
+    # create still refuses a name registered by someone else in the meantime
     if username in users:
         raise AuthenticationError("Username already exists.")
 
     hashed_password = _hash_password(password)
-    users[username] = {
-        "password": hashed_password,
-        "hint": hint
-    }
-    save_users(users)
+    if not users.create(username, {"password": hashed_password, "hint": hint}):
+        raise AuthenticationError("Username already exists.")
     return {"username": username}
 
-def login_user(users: Dict[str, Any], username: str, password: str) -> Dict[str, str]:
+def login_user(users: UserStore, username: str, password: str) -> Dict[str, str]:
     """Authenticates a user and returns their data."""
-    if username not in users:
+    user = users.get(username) if isinstance(username, str) else None
+    if user is None:
         raise AuthenticationError("User not found.")
     
-    hashed_password = _hash_password(password)
-    if users[username]["password"] != hashed_password:
+    if _recently_verified(username, password, user["password"]):
+        return {"username": username}
+
+    try:
+        matches, needs_rehash = verify_password(password, user["password"], _get_kdf_params())
+    except ValueError:
+        matches, needs_rehash = False, False
+    if not matches:
         raise AuthenticationError("Incorrect password.")
 
+    if needs_rehash:
+        # Legacy SHA-256 hashes and outdated costs are replaced while the password is at hand
+        user["password"] = _hash_password(password)
+        users.update(username, user)
+    _remember_verified(username, password, user["password"])
     return {"username": username}
 
-def get_password_hint(users: Dict[str, Any], username: str) -> str:
+def get_password_hint(users: UserStore, username: str) -> str:
     """Retrieves the password hint for a given user."""
-    if username not in users:
+    user = users.get(username)
+    if user is None:
         return "User not found."
-    return users[username].get("hint", "No hint available.")
+    return user.get("hint", "No hint available.")
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            _hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+        return _hash_executor
+
+def submit_login(users: UserStore, username: str, password: str) -> Future:
+    """Runs login_user on a worker thread. The future raises its AuthenticationError, if any."""
+    return _get_hash_executor().submit(login_user, users, username, password)
+
+def submit_registration(users: UserStore, username: str, password: str, hint: str) -> Future:
+    """Runs register_user on a worker thread. The future raises its AuthenticationError, if any."""
+    return _get_hash_executor().submit(register_user, users, username, password, hint)
@@ -0,0 +1,182 @@
+"""
+Binary on-disk deck format with random access to single cards.
+
+Layout (little-endian):
+    header   magic "FCDK", format version (u16), reserved (u16),
+             card count (u32), metadata length (u32)
+    metadata UTF-8 JSON with every deck field except the cards
+    offsets  3 * card count + 1 u64 offsets into the string blob
+             (front, back and hint of card 0, then card 1, ...)
+    blob     the UTF-8 encoded card strings, back to back
+
+Files are read through mmap, so opening a deck only parses the header and
+metadata, and fetching card i decodes just that card's three strings.
+Conversion to and from the JSON Deck.to_dict schema is lossless. Deck files
+that refer to a stored card list are converted with the cards from the
+content store next to their deck directory.
+
+Usage:
+    python src/binary_deck.py to-binary deck.json deck.fcdb
+    python src/binary_deck.py to-json deck.fcdb deck.json
+"""
+
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Any, Tuple
+
+from content_store import CONTENT_DIRNAME, ContentStore
+from exceptions import InvalidDeckFileError
+from models import Card, Deck, PermutedCards
+
+BINARY_DECK_EXTENSION = ".fcdb"
+
+_MAGIC = b"FCDK"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHII")
+_OFFSET = struct.Struct("<Q")
+_CARD_OFFSETS = struct.Struct("<4Q")
+
+def write_binary_deck(deck_data: Dict[str, Any], path: str):
+    """Writes a deck in the Deck.to_dict schema to path in the binary format."""
+    if "cards" not in deck_data:
+        # Writing no cards would silently lose them
+        raise InvalidDeckFileError(deck_data.get("deck_id"), "The deck data has no cards to convert.")
+    metadata = {key: value for key, value in deck_data.items() if key != "cards"}
+    meta_bytes = json.dumps(metadata).encode('utf-8')
+    cards = deck_data["cards"]
+
+    strings = []
+    for card in cards:
+        strings.append(card.get("front", "").encode('utf-8'))
+        strings.append(card.get("back", "").encode('utf-8'))
+        strings.append((card.get("hint") or "").encode('utf-8'))
+    offsets = array('Q', [0])
+    for value in strings:
+        offsets.append(offsets[-1] + len(value))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(cards), len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(offsets.tobytes())
+        f.write(b"".join(strings))
+    os.replace(tmp_path, path)
+
+class BinaryCardSequence(Sequence):
+    """Read-only card list backed by a memory-mapped binary deck file."""
+    def __init__(self, mapped: mmap.mmap, card_count: int, offsets_start: int):
+        self._mapped = mapped
+        self._count = card_count
+        self._offsets_start = offsets_start
+        self._blob_start = offsets_start + (3 * card_count + 1) * _OFFSET.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def fields(self, index: int) -> Tuple[str, str, str]:
+        """Returns the raw front, back and hint strings of card index."""
+        front, back, hint, end = _CARD_OFFSETS.unpack_from(self._mapped, self._offsets_start + index * 3 * _OFFSET.size)
+        blob = self._blob_start
+        return (
+            self._mapped[blob + front:blob + back].decode('utf-8'),
+            self._mapped[blob + back:blob + hint].decode('utf-8'),
+            self._mapped[blob + hint:blob + end].decode('utf-8')
+        )
+
+    def _decode(self, index: int) -> Card:
+        return Card(*self.fields(index))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("card index out of range")
+        return self._decode(index)
+
+    def shuffled(self) -> PermutedCards:
+        """Returns the cards in random order without decoding them."""
+        order = array('Q', range(self._count))
+        random.shuffle(order)
+        return PermutedCards(self, order)
+
+def _open_mapped(path: str) -> Tuple[Dict[str, Any], BinaryCardSequence]:
+    """Maps a binary deck file and returns its metadata and card sequence."""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise InvalidDeckFileError(path)
+    if len(mapped) < _HEADER.size:
+        raise InvalidDeckFileError(path)
+    magic, version, _, card_count, meta_length = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise InvalidDeckFileError(path)
+
+    metadata = json.loads(mapped[_HEADER.size:_HEADER.size + meta_length].decode('utf-8'))
+    return metadata, BinaryCardSequence(mapped, card_count, _HEADER.size + meta_length)
+
+def open_binary_deck(path: str) -> Deck:
+    """Opens a binary deck file. Only the header and metadata are read up front."""
+    metadata, cards = _open_mapped(path)
+    return Deck(
+        name=metadata.get("name"),
+        deck_id=metadata.get("deck_id"),
+        cards=cards,
+        progress=metadata.get("progress", {"correct": 0, "total": 0})
+    )
+
+def read_binary_deck(path: str) -> Dict[str, Any]:
+    """Reads a binary deck file back into the Deck.to_dict schema."""
+    deck_data, cards = _open_mapped(path)
+    deck_data["cards"] = []
+    for index in range(len(cards)):
+        front, back, hint = cards.fields(index)
+        deck_data["cards"].append({"front": front, "back": back, "hint": hint})
+    return deck_data
+
+def _with_stored_cards(deck_data: Dict[str, Any], json_path: str) -> Dict[str, Any]:
+    """
+    Fills in the cards of a deck file that refers to a card list in the content
+    store, which sits next to the public and private deck directories.
+    """
+    if "cards" in deck_data or "content" not in deck_data:
+        return deck_data
+    content_id = deck_data["content"]
+    deck_dir = os.path.dirname(os.path.abspath(json_path))
+    # Public decks are one level below the content store, private decks two
+    for root in (os.path.dirname(deck_dir), os.path.dirname(os.path.dirname(deck_dir))):
+        store = ContentStore(os.path.join(root, CONTENT_DIRNAME))
+        if os.path.exists(store.path(content_id)):
+            deck_data = {key: value for key, value in deck_data.items() if key not in ("content", "card_count")}
+            deck_data["cards"] = json.loads(store.read(content_id))
+            return deck_data
+    raise InvalidDeckFileError(json_path, f"The stored card list {content_id} was not found.")
+
+def json_to_binary(json_path: str, binary_path: str):
+    """Converts a JSON deck file to the binary format."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        write_binary_deck(_with_stored_cards(json.load(f), json_path), binary_path)
+
+def binary_to_json(binary_path: str, json_path: str):
+    """Converts a binary deck file back to the JSON format."""
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(read_binary_deck(binary_path), f, indent=4)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-binary", "to-json"):
+        print("Usage: python binary_deck.py to-binary|to-json SOURCE DESTINATION", file=sys.stderr)
+        sys.exit(2)
+    if sys.argv[1] == "to-binary":
+        json_to_binary(sys.argv[2], sys.argv[3])
+    else:
+        binary_to_json(sys.argv[2], sys.argv[3])
@@ -0,0 +1,143 @@
+"""
+Per-card answer statistics in a fixed-width binary file.
+
+Layout (little-endian):
+    header   magic "FCST", format version (u16), reserved (u16),
+             record count (u32), padding to 16 bytes
+    records  one 32 byte record per card, in deck order:
+             card key (8 bytes), attempts (u32), correct (u32),
+             last seen Unix time (f64), current streak (i32), padding
+
+The streak counts consecutive correct answers, or consecutive wrong
+answers as a negative number.
+
+The card key is models.card_key, so records can be matched to cards again
+after the deck is edited or reordered. The file is memory-mapped and
+recording an answer rewrites a single record in place.
+"""
+
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from typing import Dict, List, Sequence
+
+from models import card_key
+
+_MAGIC = b"FCST"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHI4x")
+_RECORD = struct.Struct("<8sIIdi4x")
+# Offset of the counters inside a record, after the card key
+_COUNTERS = struct.Struct("<IIdi")
+_KEY_SIZE = 8
+
+CardStats = namedtuple("CardStats", ["attempts", "correct", "last_seen", "streak"])
+
+def _key_bytes(card) -> bytes:
+    return bytes.fromhex(card_key(card))
+
+class CardStatsFile:
+    """Memory-mapped per-card statistics for one user's deck."""
+    def __init__(self, path: str, cards: Sequence):
+        self.path = path
+        keys = [_key_bytes(card) for card in cards]
+        self._indexes: Dict[bytes, int] = {}
+        for index, key in enumerate(keys):
+            self._indexes.setdefault(key, index)
+        if not self._is_aligned(keys):
+            self._rewrite(keys)
+        self._file = open(path, 'r+b')
+        self._mapped = mmap.mmap(self._file.fileno(), 0)
+
+    def _is_aligned(self, keys: List[bytes]) -> bool:
+        """Checks whether the file on disk has one record per card, in card order."""
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return False
+                magic, version, _, count = _HEADER.unpack(header)
+                if magic != _MAGIC or version != _VERSION or count != len(keys):
+                    return False
+                for key in keys:
+                    record = f.read(_RECORD.size)
+                    if record[:_KEY_SIZE] != key:
+                        return False
+        except OSError:
+            return False
+        return True
+
+    def _read_existing(self) -> Dict[bytes, bytes]:
+        """Returns the counters of every record in the current file, by card key."""
+        counters = {}
+        try:
+            with open(self.path, 'rb') as f:
+                magic, version, _, count = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != _MAGIC or version != _VERSION:
+                    return counters
+                for _ in range(count):
+                    record = f.read(_RECORD.size)
+                    if len(record) < _RECORD.size:
+                        break
+                    counters[record[:_KEY_SIZE]] = record[_KEY_SIZE:]
+        except (OSError, struct.error):
+            pass
+        return counters
+
+    def _rewrite(self, keys: List[bytes]):
+        """Writes a new file aligned to the current card order, keeping known counters."""
+        existing = self._read_existing()
+        empty = _RECORD.pack(b"", 0, 0, 0.0, 0)[_KEY_SIZE:]
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(keys)))
+            f.write(b"".join(key + existing.get(key, empty) for key in keys))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def _offset(self, card) -> int:
+        return _HEADER.size + self._indexes[_key_bytes(card)] * _RECORD.size + _KEY_SIZE
+
+    def get(self, card) -> CardStats:
+        """Returns the statistics recorded for card."""
+        return CardStats(*_COUNTERS.unpack_from(self._mapped, self._offset(card)))
+
+    def record(self, card, correct: bool, now: float = None):
+        """Records one answer to card, rewriting only that card's counters."""
+        offset = self._offset(card)
+        attempts, correct_count, _, streak = _COUNTERS.unpack_from(self._mapped, offset)
+        if correct:
+            correct_count += 1
+            streak = streak + 1 if streak > 0 else 1
+        else:
+            streak = streak - 1 if streak < 0 else -1
+        _COUNTERS.pack_into(self._mapped, offset, attempts + 1, correct_count,
+                            time.time() if now is None else now, streak)
+
+    def weakest(self, cards: Sequence, limit: int = 10) -> List:
+        """Returns up to limit attempted cards with the lowest share of correct answers."""
+        attempted = []
+        for card in cards:
+            stats = self.get(card)
+            if stats.attempts:
+                attempted.append((stats.correct / stats.attempts, stats.streak, card))
+        attempted.sort(key=lambda entry: (entry[0], entry[1]))
+        return [card for _, _, card in attempted[:limit]]
+
+    def flush(self):
+        """Writes modified records back to the file."""
+        self._mapped.flush()
+
+    def close(self):
+        """Flushes and unmaps the file."""
+        if not self._mapped.closed:
+            self._mapped.flush()
+            self._mapped.close()
+            self._file.close()
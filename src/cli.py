@@ -0,0 +1,269 @@
+"""
+Headless command line interface for scripted jobs, without the GUI.
+
+    python src/cli.py import deck.txt --user alice       import a Q:/A:/H: text deck
+    python src/cli.py export deck_1 --user alice -o out  export a deck as text or JSON
+    python src/cli.py grade deck_1 --user alice answers  grade one answer per line, in card order
+    python src/cli.py review --user alice                quiz the cards due across all decks
+    python src/cli.py stats --user alice                 show progress totals
+    python src/cli.py reindex                            rebuild the catalog, search and progress indexes
+    python src/cli.py gc                                 remove stored card lists no deck uses any more
+
+Only the modules a command needs are imported, and only once it runs;
+tkinter, PIL and the dependency installer of main.py are never loaded.
+Commands that only read (export, stats) leave the data directory untouched.
+Pass --storage sqlite to work on the SQLite backend.
+"""
+
+import argparse
+import sys
+
+def _open_storage(args):
+    import persistence
+    persistence.configure_storage(args.storage)
+    return persistence
+
+def _check_user(username: str) -> bool:
+    """Returns whether the account exists, printing an error if it does not."""
+    from auth import load_users
+    if username in load_users():
+        return True
+    print(f"Error: no user named '{username}'.", file=sys.stderr)
+    return False
+
+def _load_deck(persistence, args):
+    if args.public:
+        return persistence.load_public_deck(args.deck_id)
+    deck = persistence.load_user_deck(args.user, args.deck_id)
+    deck.progress = persistence.load_progress(args.user, args.deck_id)
+    return deck
+
+def cmd_import(args) -> int:
+    if args.user and not _check_user(args.user):
+        return 1
+    _open_storage(args)
+    import text_import
+    forwarded = [args.file, "--public"] if args.public else [args.file, "--user", args.user]
+    if args.name:
+        forwarded += ["--name", args.name]
+    if args.strict:
+        forwarded.append("--strict")
+    return text_import.main(forwarded)
+
+def cmd_export(args) -> int:
+    persistence = _open_storage(args)
+    from exceptions import DeckLoadError
+    try:
+        deck = _load_deck(persistence, args)
+    except DeckLoadError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            import json
+            json.dump(deck.to_dict(), out, indent=4, ensure_ascii=False)
+            out.write("\n")
+        else:
+            # The format read by text_import, see deck_import_guide.txt
+            for card in deck.cards:
+                out.write(f"Q: {card.front}\nA: {card.back}\n")
+                if card.hint:
+                    out.write(f"H: {card.hint}\n")
+                out.write("\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def cmd_grade(args) -> int:
+    if not _check_user(args.user):
+        return 1
+    persistence = _open_storage(args)
+    from exceptions import DeckLoadError
+    from matcher import grade_batch, matcher_for
+    try:
+        deck = persistence.load_user_deck(args.user, args.deck_id)
+    except DeckLoadError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    source = open(args.answers, 'r', encoding='utf-8') if args.answers != "-" else sys.stdin
+    with source:
+        answers = [line.rstrip("\n") for line in source]
+    if len(answers) > len(deck.cards):
+        print(f"Error: {len(answers)} answers for {len(deck.cards)} cards.", file=sys.stderr)
+        return 1
+    cards = deck.cards[:len(answers)]
+    if args.typos:
+        results = [matcher_for(card).matches(answer, args.strictness, True) for answer, card in zip(answers, cards)]
+    else:
+        results, _ = grade_batch(answers, cards, args.strictness)
+
+    for number, (card, correct) in enumerate(zip(cards, results), 1):
+        print(f"{number}\t{'correct' if correct else 'wrong'}\t{card.front}")
+    correct_count = sum(results)
+    print(f"{correct_count}/{len(results)} correct")
+
+    if args.save:
+        progress = persistence.load_progress(args.user, args.deck_id)
+        persistence.save_progress(args.user, args.deck_id, {"correct": progress["correct"] + correct_count,
+                                                            "total": progress["total"] + len(results)})
+        persistence.flush_progress()
+    return 0
+
+def cmd_review(args) -> int:
+    if not _check_user(args.user):
+        return 1
+    persistence = _open_storage(args)
+    from matcher import matcher_for
+    from scheduler import Scheduler, review_quality
+    due = persistence.load_due_cards(args.user, limit=args.limit)
+    if not due:
+        print("No cards are due for review.")
+        return 0
+
+    # The schedule and session results of every deck a due card came from
+    schedulers = {}
+    results = {}
+    for number, (deck_id, card) in enumerate(due, 1):
+        print(f"{number}/{len(due)}\t{card.front}", flush=True)
+        answer = sys.stdin.readline()
+        if not answer:
+            break
+        correct = matcher_for(card).matches(answer.strip(), args.strictness, args.typos)
+        print("correct" if correct else f"wrong, the answer is: {card.back}")
+        if deck_id not in schedulers:
+            deck = persistence.load_user_deck(args.user, deck_id)
+            schedulers[deck_id] = Scheduler(deck.cards, persistence.load_schedule(args.user, deck_id))
+            results[deck_id] = [0, 0]
+        schedulers[deck_id].review(card, review_quality(correct, 1))
+        results[deck_id][0] += correct
+        results[deck_id][1] += 1
+
+    for deck_id, scheduler in schedulers.items():
+        schedule = scheduler.to_dict()
+        persistence.save_schedule(args.user, deck_id, schedule)
+        persistence.update_due_index(args.user, deck_id, scheduler.card_keys(), schedule)
+        progress = persistence.load_progress(args.user, deck_id)
+        persistence.save_progress(args.user, deck_id, {"correct": progress["correct"] + results[deck_id][0],
+                                                       "total": progress["total"] + results[deck_id][1]})
+    persistence.flush_progress()
+    correct_count = sum(correct for correct, _ in results.values())
+    print(f"{correct_count}/{sum(total for _, total in results.values())} correct")
+    return 0
+
+def _percent(totals) -> str:
+    if not totals["total"]:
+        return "no answers yet"
+    return f"{totals['correct'] / totals['total'] * 100:.0f}% of {totals['total']:g} answers correct"
+
+def cmd_stats(args) -> int:
+    if args.user and not _check_user(args.user):
+        return 1
+    persistence = _open_storage(args)
+    # Reading the totals must not create them, stats only reads
+    if args.user:
+        summary = persistence.load_progress_summary(args.user, build_missing=False)
+        entries = summary["decks"]
+    else:
+        summary = persistence.load_global_progress_summary(build_missing=False)
+        entries = summary["users"]
+    print(f"Overall: {_percent(summary)}")
+    for name in sorted(entries):
+        print(f"{name}: {_percent(entries[name])}")
+    return 0
+
+def cmd_reindex(args) -> int:
+    if args.user and not _check_user(args.user):
+        return 1
+    persistence = _open_storage(args)
+    catalog = persistence.sync_public_catalog()
+    persistence.rebuild_search_index()
+    persistence.rebuild_progress_summary()
+    print(f"Reindexed {len(catalog)} public decks.")
+
+    if args.user:
+        from models import card_key
+        decks = persistence.load_all_user_decks({"username": args.user})
+        for deck_id, deck in decks.items():
+            persistence.update_due_index(args.user, deck_id, map(card_key, deck.cards))
+        print(f"Reindexed the due cards of {len(decks)} decks of '{args.user}'.")
+    return 0
+
+def cmd_gc(args) -> int:
+    persistence = _open_storage(args)
+    if args.grace_hours is None:
+        removed, freed = persistence.collect_unused_content()
+    else:
+        removed, freed = persistence.collect_unused_content(args.grace_hours * 3600)
+    print(f"Removed {removed} unused card lists, {freed} bytes.")
+    return 0
+
+def _add_owner(parser: argparse.ArgumentParser):
+    owner = parser.add_mutually_exclusive_group(required=True)
+    owner.add_argument("--user", help="a private deck of this user")
+    owner.add_argument("--public", action="store_true", help="a public deck")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="flashcards", description="Work with decks and progress without the GUI.")
+    parser.add_argument("--storage", choices=("json", "sqlite"), help="storage backend (default: FLASHCARD_STORAGE or json)")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    command = commands.add_parser("import", help="import a Q:/A:/H: text deck file")
+    command.add_argument("file", help="path to the .txt deck file")
+    _add_owner(command)
+    command.add_argument("--name", help="deck name (defaults to the file name)")
+    command.add_argument("--strict", action="store_true", help="stop at the first malformed block")
+    command.set_defaults(run=cmd_import)
+
+    command = commands.add_parser("export", help="write a deck as text or JSON")
+    command.add_argument("deck_id")
+    _add_owner(command)
+    command.add_argument("--format", choices=("text", "json"), default="text", help="output format (default text)")
+    command.add_argument("-o", "--output", help="output file (default: standard output)")
+    command.set_defaults(run=cmd_export)
+
+    command = commands.add_parser("grade", help="grade answers, one per line in card order, against a deck")
+    command.add_argument("deck_id")
+    command.add_argument("answers", nargs="?", default="-", help="answers file (default: standard input)")
+    command.add_argument("--user", required=True)
+    command.add_argument("--strictness", type=float, default=80, help="required similarity in percent (default 80)")
+    command.add_argument("--typos", action="store_true", help="accept misspelled words")
+    command.add_argument("--save", action="store_true", help="add the results to the deck's progress")
+    command.set_defaults(run=cmd_grade)
+
+    command = commands.add_parser("review", help="quiz the cards due across all decks, one answer per line of input")
+    command.add_argument("--user", required=True)
+    command.add_argument("--limit", type=int, help="review at most this many cards")
+    command.add_argument("--strictness", type=float, default=80, help="required similarity in percent (default 80)")
+    command.add_argument("--typos", action="store_true", help="accept misspelled words")
+    command.set_defaults(run=cmd_review)
+
+    command = commands.add_parser("stats", help="show progress totals of a user, or of every user")
+    command.add_argument("--user")
+    command.set_defaults(run=cmd_stats)
+
+    command = commands.add_parser("reindex", help="rebuild the public catalog, search index and progress totals")
+    command.add_argument("--user", help="also rebuild the due cards index of this user")
+    command.set_defaults(run=cmd_reindex)
+
+    command = commands.add_parser("gc", help="remove stored card lists that no deck refers to any more")
+    command.add_argument("--grace-hours", type=float, help="keep lists written this recently (default 1)")
+    command.set_defaults(run=cmd_gc)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    from exceptions import DeckLoadError
+    try:
+        return args.run(args)
+    except (OSError, DeckLoadError, ValueError) as e:
+        # ValueError covers InvalidNameError and files that are not valid UTF-8 or JSON
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
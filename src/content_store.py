@@ -0,0 +1,116 @@
+"""
+Content-addressed storage for the card lists of decks.
+
+A deck's cards are stored once, under the SHA-256 digest of their canonical
+encoding, which leaves out the deck's name and ID. Deck files refer to their
+cards by that digest, so identical decks, whether public or private to
+different users, share a single stored card list and a single parsed copy
+in the deck cache. Deck files themselves stay a few hundred bytes.
+
+Card lists are never changed once written. Saving a deck with different
+cards stores a new list, and collect_garbage removes the lists that no deck
+refers to any more.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, Set, Tuple
+
+CONTENT_DIRNAME = "content"
+CONTENT_EXTENSION = ".cards"
+
+# Lists written this recently are never collected, their deck file may not be saved yet
+GC_GRACE_SECONDS = 60 * 60
+
+def canonical_card(card: Any) -> Dict[str, str]:
+    """Returns the canonical form of a Card, CardView or card dictionary."""
+    if isinstance(card, dict):
+        return {"front": card.get("front") or "", "back": card.get("back") or "", "hint": card.get("hint") or ""}
+    return {"front": card.front, "back": card.back, "hint": card.hint or ""}
+
+def encode_card_batch(cards: Iterable[Any]) -> str:
+    """Encodes cards as the comma-separated items of the canonical card list."""
+    return json.dumps([canonical_card(card) for card in cards], separators=(',', ':'), ensure_ascii=False)[1:-1]
+
+def encode_cards(cards: Iterable[Any]) -> bytes:
+    """Returns the canonical encoding of a card list, from which its digest is computed."""
+    return f"[{encode_card_batch(cards)}]".encode('utf-8')
+
+class ContentStore:
+    """The card lists stored under root, in subdirectories by digest prefix."""
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest + CONTENT_EXTENSION)
+
+    def put(self, data: bytes) -> Tuple[str, bool]:
+        """Stores an encoded card list. Returns its digest and whether it was new."""
+        return self.put_chunks((data,))
+
+    def put_chunks(self, chunks: Iterable[bytes]) -> Tuple[str, bool]:
+        """
+        Stores an encoded card list that arrives in chunks, hashing it while it
+        is written. Returns its digest and whether it was new.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(self.root, f"incoming-{os.getpid()}-{id(digest)}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            content_id = digest.hexdigest()
+            path = self.path(content_id)
+            if os.path.exists(path):
+                # Already stored. Refresh its age so a running collection keeps it, but
+                # rarely, since a new modification time also invalidates cached copies.
+                if time.time() - os.stat(path).st_mtime > GC_GRACE_SECONDS / 2:
+                    os.utime(path)
+                return content_id, False
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            return content_id, True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def read(self, digest: str) -> bytes:
+        """Returns the encoded card list stored under digest."""
+        with open(self.path(digest), 'rb') as f:
+            return f.read()
+
+    def digests(self) -> Iterator[str]:
+        """Yields the digest of every stored card list."""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.scandir(self.root):
+            if prefix.is_dir():
+                for entry in os.scandir(prefix.path):
+                    if entry.name.endswith(CONTENT_EXTENSION):
+                        yield entry.name[:-len(CONTENT_EXTENSION)]
+
+    def collect_garbage(self, live: Set[str], grace_seconds: float = GC_GRACE_SECONDS) -> Tuple[int, int]:
+        """
+        Removes the card lists whose digest is not in live and that are older
+        than grace_seconds. Returns the number of lists removed and bytes freed.
+        """
+        removed, freed = 0, 0
+        cutoff = time.time() - grace_seconds
+        for digest in list(self.digests()):
+            if digest in live:
+                continue
+            path = self.path(digest)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    continue
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            freed += stat.st_size
+        return removed, freed
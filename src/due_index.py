@@ -0,0 +1,171 @@
+"""
+Per-user index of when the cards in each deck are due for review.
+
+The index maps every deck to its (due time, card key) pairs, sorted by due
+time. It is stored next to the user's progress as an append-only log: saving,
+or quizzing a deck appends one line with that deck's new pairs, so an update
+costs the size of the deck rather than of the whole index. Imports add their
+new cards a batch at a time, each batch a line that extends the deck. Reading
+folds the log, later lines replacing or extending earlier ones, and once enough
+lines are superseded the log is rewritten as a single snapshot line. Appends and that
+rewrite hold a file lock, as other processes may update the same index.
+
+Finding the cards due across every deck merges the per-deck lists and only
+reads as many entries as are due.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from itertools import islice, takewhile
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from file_lock import file_lock
+
+DUE_INDEX_FILENAME = "due.index"
+DUE_LOCK_FILENAME = "due.index.lock"
+
+# The log is rewritten once it holds this many superseded deck lines
+DUE_COMPACT_THRESHOLD = 256
+
+def _tagged(deck_id: str, entries: List[Tuple[float, str]]) -> Iterator[Tuple[float, str, str]]:
+    for due, key in entries:
+        yield due, deck_id, key
+
+class DueIndex:
+    """The due index of one user, stored in the user's progress directory."""
+    def __init__(self, user_dir: str):
+        self.path = os.path.join(user_dir, DUE_INDEX_FILENAME)
+        self.lock_path = os.path.join(user_dir, DUE_LOCK_FILENAME)
+        self._lock = threading.Lock()
+        self._decks: Dict[str, List[Tuple[float, str]]] = None
+        # Decks extended since their entries were last sorted
+        self._unsorted: Set[str] = set()
+        # (inode, size) of the log as far as it has been read, and the deck lines in it
+        self._stamp = None
+        self._records = 0
+
+    def _apply(self, record: Dict):
+        if "decks" in record:
+            # A snapshot, written by compaction or by versions before the log
+            self._decks = {deck_id: [tuple(entry) for entry in entries] for deck_id, entries in record["decks"].items()}
+            self._records = len(self._decks)
+            self._unsorted.clear()
+        elif "a" in record:
+            self._extend(record["d"], [tuple(entry) for entry in record["a"]])
+            self._records += 1
+        else:
+            self._decks[record["d"]] = [tuple(entry) for entry in record["e"]]
+            self._unsorted.discard(record["d"])
+            self._records += 1
+
+    def _extend(self, deck_id: str, entries: List[Tuple[float, str]]):
+        # Sorted lazily, as an import extends the same deck many times
+        self._decks.setdefault(deck_id, []).extend(entries)
+        self._unsorted.add(deck_id)
+
+    def _catch_up(self):
+        """Reads whatever was appended to the log since it was last read. Called with the file lock held."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._decks, self._stamp, self._records = {}, None, 0
+            self._unsorted.clear()
+            return
+        if self._decks is None or self._stamp is None or self._stamp[0] != st.st_ino or st.st_size < self._stamp[1]:
+            # First read, or the log was compacted by another process
+            self._decks, self._records = {}, 0
+            self._unsorted.clear()
+            offset = 0
+        else:
+            offset = self._stamp[1]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        for line in data.split(b"\n"):
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # A crash can leave a partial line behind
+                continue
+        self._stamp = (st.st_ino, offset + len(data))
+
+    def _load(self) -> Dict[str, List[Tuple[float, str]]]:
+        try:
+            st = os.stat(self.path)
+            current = self._stamp == (st.st_ino, st.st_size)
+        except OSError:
+            st, current = None, self._stamp is None
+        if self._decks is None or not current:
+            if st is not None:
+                with file_lock(self.lock_path):
+                    self._catch_up()
+            else:
+                self._decks, self._stamp, self._records = {}, None, 0
+                self._unsorted.clear()
+        for deck_id in self._unsorted:
+            # Sorting concatenated sorted runs only merges them
+            self._decks[deck_id].sort()
+        self._unsorted.clear()
+        return self._decks
+
+    def _compact(self):
+        """Rewrites the log as one snapshot line. Called with both locks held, right after catching up."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps({"version": 1, "decks": self._decks}, separators=(',', ':')) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        st = os.stat(self.path)
+        self._stamp = (st.st_ino, st.st_size)
+        self._records = len(self._decks)
+
+    def _append(self, record: Dict):
+        """Appends a deck line to the log and applies it. Called with both locks held, right after catching up."""
+        data = (json.dumps(record, separators=(',', ':')) + "\n").encode('utf-8')
+        with open(self.path, 'a+b') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            self._stamp = (os.fstat(f.fileno()).st_ino, size + len(data))
+        self._apply(record)
+        if self._records - len(self._decks) >= DUE_COMPACT_THRESHOLD:
+            for deck_id in self._unsorted:
+                self._decks[deck_id].sort()
+            self._unsorted.clear()
+            self._compact()
+
+    def update_deck(self, deck_id: str, entries: Iterable[Tuple[float, str]]):
+        """Replaces the (due time, card key) pairs of a deck by appending them to the log."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            self._append({"d": deck_id, "e": sorted(entries)})
+
+    def extend_deck(self, deck_id: str, entries: Iterable[Tuple[float, str]]):
+        """Adds (due time, card key) pairs to a deck, keeping the ones it has."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock, file_lock(self.lock_path):
+            self._catch_up()
+            self._append({"d": deck_id, "a": sorted(entries)})
+
+    def due(self, now: float = None, limit: int = None) -> List[Tuple[float, str, str]]:
+        """Returns (due time, deck ID, card key) for the cards due at time now, earliest first."""
+        now = time.time() if now is None else now
+        with self._lock:
+            per_deck = [
+                _tagged(deck_id, entries)
+                for deck_id, entries in self._load().items() if entries and entries[0][0] <= now
+            ]
+            due_cards = takewhile(lambda entry: entry[0] <= now, heapq.merge(*per_deck))
+            return list(islice(due_cards, limit))
@@ -0,0 +1,83 @@
+"""
+Bounded Damerau-Levenshtein distance for short tokens.
+
+Uses Hyyrö's bit-parallel extension of Myers' algorithm for the optimal
+string alignment distance (insertions, deletions, substitutions and
+adjacent transpositions). One column of the DP matrix is processed per
+character of the second token, using Python integers as bit vectors.
+
+Callers pass the largest distance they care about. Tokens whose lengths
+already differ by more than that are rejected without running the
+algorithm, and the scan stops as soon as the bound can no longer be met.
+
+deletion_levels supports an index for finding candidate tokens: two
+tokens within k edits always share a string reachable from both by at
+most k deletions, so only tokens sharing such a variant need checking.
+"""
+
+from functools import lru_cache
+from typing import Iterator, Set
+
+# Number of (token, token, bound) results kept between checks
+DISTANCE_CACHE_SIZE = 65536
+
+def deletion_levels(token: str, depth: int) -> Iterator[Set[str]]:
+    """Yields {token}, then the strings with exactly 1, 2, ... depth characters deleted."""
+    frontier = {token}
+    yield frontier
+    for _ in range(depth):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))}
+        yield frontier
+
+def deletion_variants(token: str, depth: int) -> Set[str]:
+    """Returns token and every string obtained from it by deleting up to depth characters."""
+    return set().union(*deletion_levels(token, depth))
+
+def osa_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Returns the optimal string alignment distance between a and b, or
+    max_distance + 1 if it is larger than max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return len(a)
+
+    # Bit i of peq[c] is set where a[i] == c
+    peq = {}
+    for i, char in enumerate(a):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    length = len(a)
+    mask = (1 << length) - 1
+    last = 1 << (length - 1)
+    vp, vn, d0, pm_prev = mask, 0, 0, 0
+    score = length
+    remaining = len(b)
+    for char in b:
+        pm = peq.get(char, 0)
+        transposed = (((~d0) & pm) << 1) & pm_prev
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | transposed) & mask
+        hp = (vn | ~(d0 | vp)) & mask
+        hn = d0 & vp
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        remaining -= 1
+        # The score can drop by at most one per remaining character
+        if score - remaining > max_distance:
+            return max_distance + 1
+        hp = ((hp << 1) | 1) & mask
+        hn = (hn << 1) & mask
+        vp = (hn | ~(d0 | hp)) & mask
+        vn = d0 & hp
+        pm_prev = pm
+    return score if score <= max_distance else max_distance + 1
+
+@lru_cache(maxsize=DISTANCE_CACHE_SIZE)
+def within_distance(a: str, b: str, max_distance: int) -> bool:
+    """Checks whether a and b are at most max_distance edits apart. Results are cached."""
+    return osa_distance(a, b, max_distance) <= max_distance
@@ -34,3 +34,14 @@ class DeckError(Exception):
 class InvalidDeckFileError(DeckLoadError):
     def __init__(self, deck_name, message="The deck file format is invalid or corrupted."):
         super().__init__(deck_name, message)
+
+class DeckFormatError(InvalidDeckFileError):
+    def __init__(self, deck_name, line_number, message="Malformed card block"):
+        self.line_number = line_number
+        super().__init__(deck_name, f"{message} at line {line_number}")
+
+class InvalidNameError(ValueError):
+    def __init__(self, name, kind="name", message="may only contain letters, digits, '.', '_' and '-', at most 64 of them, and cannot start with a dot"):
+        self.name = name
+        self.message = f"Invalid {kind} {name!r}: it {message}."
+        super().__init__(self.message)
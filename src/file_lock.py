@@ -0,0 +1,34 @@
+"""
+Exclusive locks shared by the processes that use one data directory.
+
+The GUI, the CLI and the API server may all write the same progress files,
+so read-modify-write cycles on them hold an advisory lock on a lock file
+next to them. Where fcntl is unavailable (Windows) the lock only keeps the
+threads of one process apart.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(path: str):
+    """Holds an exclusive lock on path, created if missing, for the block. Not re-entrant."""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+    with thread_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'a') as f:
+            if fcntl is not None:
+                # Released when the file is closed
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
@@ -1,3 +1,7 @@
+import time
+# Taken before any other import, so --profile-startup can time the imports
+STARTUP_TIME = time.perf_counter()
+
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 from tkinter import scrolledtext
@@ -5,8 +9,8 @@ import random
 import sys
 import subprocess
 import os
-from typing import List, Dict, Any
-import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Tuple
 import uuid
 
 # --- Custom Imports ---
@@ -18,12 +22,17 @@ except ImportError:
     Image, ImageTk = None, None
 
 # Import our custom exception classes
-from exceptions import DependencyInstallationError, AuthenticationError, DeckLoadError
+from exceptions import DependencyInstallationError, AuthenticationError, DeckLoadError, InvalidNameError
 
 # Import our application logic
-from auth import login_user, register_user, load_users, get_password_hint
-from models import Card, Deck, Session
-from persistence import save_deck_to_private, save_deck_to_public, load_all_user_decks, load_all_public_decks, import_public_deck, save_progress
+from auth import submit_login, submit_registration, load_users, get_password_hint
+from models import Card, Deck, Session, card_key
+from text_import import import_text_deck
+from matcher import matcher_for, is_similar
+from scheduler import Scheduler, review_quality
+from sampling import FenwickSampler, card_weight
+from startup_profile import StartupProfiler
+from persistence import configure_storage, save_deck_to_private, save_deck_to_public, load_all_user_decks, load_public_catalog, sync_public_catalog, load_public_deck, import_public_deck, save_progress, load_schedule, save_schedule, open_card_stats, update_due_index, load_progress_summary, progress_summary_is_current, search_public_decks
 
 # --- Dependency Check and Installation ---
 def check_and_install_dependencies():
@@ -60,34 +69,134 @@ FONT_NORMAL = ("Helvetica", 14)
 CARD_BACKGROUND = ["#F5F5F5", "#CCCCCC"] # White and Grey
 CORRECT_COLOR = "#2ECC71"
 WRONG_COLOR = "#E74C3C"
+# How often the mainloop checks on password hashing running in the background
+HASH_POLL_MS = 20
+
+class _LazyFrame:
+    """A screen of the app that is only built the first time it is used."""
+    def __init__(self, builder_name: str):
+        self.builder_name = builder_name
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, app, owner=None):
+        if app is None:
+            return self
+        frame = app.frames.get(self.name)
+        if frame is None:
+            frame = app.frames[self.name] = getattr(app, self.builder_name)()
+        return frame
 
 class FlashcardApp:
-    def __init__(self, root):
+    login_frame = _LazyFrame("create_login_frame")
+    register_frame = _LazyFrame("create_register_frame")
+    main_menu_frame = _LazyFrame("create_main_menu_frame")
+    deck_creation_frame = _LazyFrame("create_deck_creation_frame")
+    study_mode_frame = _LazyFrame("create_study_mode_frame")
+    quiz_mode_frame = _LazyFrame("create_quiz_mode_frame")
+    quiz_settings_frame = _LazyFrame("create_quiz_settings_frame")
+
+    def __init__(self, root, profiler: StartupProfiler = None, report_startup: bool = False):
         self.root = root
         self.root.title("Flashcard App")
         self.root.geometry("800x600")
-
-        # Load resources and data
-        self.users = load_users()
+        self.profiler = profiler or StartupProfiler()
+        self.report_startup = report_startup
+        self.frames: Dict[str, tk.Frame] = {}
+
+        # Accounts, storage and the public catalog are loaded while the login screen is up.
+        # One worker keeps the loads in order: user data is only prefetched once storage is configured.
+        self.users = None
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.startup_data = self.prefetch_executor.submit(self.load_startup_data)
+        self.prefetched_user_data: Optional[Tuple[str, Future]] = None
         self.current_user: Dict[str, Any] = None
         self.current_deck: Deck = None
         self.all_user_decks: Dict[str, Deck] = {}
-        self.all_public_decks: Dict[str, Deck] = {}
+        self.public_catalog: Dict[str, Dict[str, Any]] = {}
         self.quiz_session: Session = None
         self.quiz_cards: List[Card] = []
         self.current_card_index = 0
         self.quiz_tries = 1
         self.tries_left = self.quiz_tries
         self.quiz_strictness = 80
-        
+        self.quiz_typo_tolerant = tk.BooleanVar(value=False)
+        self.quiz_spaced = tk.BooleanVar(value=False)
+        self.quiz_scheduler: Scheduler = None
+        self.quiz_stats = None
+        self.quiz_weighted = tk.BooleanVar(value=False)
+        self.quiz_sampler: FenwickSampler = None
+        self.quiz_sample_indexes: List[int] = []
+
         # Set a solid background color 
         self.background_label = tk.Label(self.root, bg=BACKGROUND_COLOR)
         self.background_label.place(x=0, y=0, relwidth=1, relheight=1)
         
         self.create_main_menu()
-        self.create_widgets()
+        # Only the login screen is built here, the other screens on first use (see _LazyFrame)
+        self.login_frame.bind("<Map>", self.on_first_paint)
+        self.profiler.mark("widget construction")
         self.show_login_screen()
 
+    def load_startup_data(self):
+        """Opens the user store and storage and syncs the public catalog. Runs in the background."""
+        start = time.perf_counter()
+        self.users = load_users()
+        # Use the storage backend selected by the FLASHCARD_STORAGE environment variable
+        configure_storage()
+        # Rebuild the public deck catalog if decks were added or changed outside the app
+        sync_public_catalog()
+        self.profiler.record("data load", time.perf_counter() - start)
+
+    def on_first_paint(self, event=None):
+        """Ends the startup profile once the login screen is on screen."""
+        self.login_frame.unbind("<Map>")
+        self.root.update_idletasks()
+        self.profiler.mark("first paint")
+        if self.report_startup:
+            self.when_done(self.startup_data, lambda _: print(self.profiler.report(), file=sys.stderr))
+
+    def after_startup(self, callback: Callable[[], None]):
+        """Calls callback on the Tk thread once the startup data is loaded, or reports why it failed."""
+        def loaded(future):
+            try:
+                future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load the app data: {e}")
+                return
+            callback()
+        self.when_done(self.startup_data, loaded)
+
+    def prefetch_user_data(self, username: str):
+        """Starts loading a user's decks and progress in the background, so they are ready after login."""
+        if not username or (self.prefetched_user_data and self.prefetched_user_data[0] == username):
+            return
+        self.prefetched_user_data = (username, self.prefetch_executor.submit(self.load_user_data, username))
+
+    @staticmethod
+    def load_user_data(username: str) -> Tuple[Dict[str, Deck], Dict[str, Any]]:
+        decks, summary = load_all_user_decks({"username": username}), load_progress_summary(username)
+        if not progress_summary_is_current(username):
+            # The totals lag behind progress saved elsewhere, the decks hold the latest
+            summary = {"correct": 0, "total": 0, "decks": {}}
+            for deck_id, deck in decks.items():
+                summary["decks"][deck_id] = deck.progress
+                summary["correct"] += deck.progress['correct']
+                summary["total"] += deck.progress['total']
+        return decks, summary
+
+    def take_user_data(self) -> Tuple[Dict[str, Deck], Dict[str, Any]]:
+        """Returns the current user's decks and progress summary, prefetched if possible. A prefetch is used once."""
+        username = self.current_user['username']
+        prefetched, self.prefetched_user_data = self.prefetched_user_data, None
+        if prefetched is not None and prefetched[0] == username:
+            try:
+                return prefetched[1].result()
+            except Exception as e:
+                print(f"Error prefetching decks of {username}: {e}")
+        return self.load_user_data(username)
+
     def create_main_menu(self):
         """Creates the main menu bar with File and Help options."""
         menubar = tk.Menu(self.root)
@@ -123,20 +232,13 @@ class FlashcardApp:
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while reading the guide file: {e}")
             
-    def create_widgets(self):
-        """Initializes the frames for different parts of the app."""
-        self.login_frame = self.create_login_frame()
-        self.register_frame = self.create_register_frame()
-        self.main_menu_frame = self.create_main_menu_frame()
-        self.deck_creation_frame = self.create_deck_creation_frame()
-        self.study_mode_frame = self.create_study_mode_frame()
-        self.quiz_mode_frame = self.create_quiz_mode_frame()
-        self.quiz_settings_frame = self.create_quiz_settings_frame()
+    def _ensure_frame(self, name: str) -> tk.Frame:
+        """Builds the screen called name if it has not been used yet, so its widgets exist."""
+        return getattr(self, name)
 
     def show_frame(self, frame_to_show):
         """Switches to a new frame."""
-        for frame in [self.login_frame, self.register_frame, self.main_menu_frame, self.deck_creation_frame,
-                      self.study_mode_frame, self.quiz_mode_frame, self.quiz_settings_frame]:
+        for frame in self.frames.values():
             frame.grid_forget()
         frame_to_show.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
         self.root.grid_rowconfigure(0, weight=1)
@@ -149,6 +251,8 @@ class FlashcardApp:
         tk.Label(frame, text="Username:", bg=BACKGROUND_COLOR, fg="#F5F5F5", font=FONT_NORMAL).pack(pady=(20, 5))
         self.username_entry = tk.Entry(frame, bg="#2c2c2c", fg="#F5F5F5", insertbackground="#F5F5F5", font=FONT_NORMAL)
         self.username_entry.pack(pady=5)
+        # The user's decks load while they type their password
+        self.username_entry.bind("<FocusOut>", lambda _: self.prefetch_user_data(self.username_entry.get()))
         
         tk.Label(frame, text="Password:", bg=BACKGROUND_COLOR, fg="#F5F5F5", font=FONT_NORMAL).pack(pady=(10, 5))
         self.password_entry = tk.Entry(frame, show="*", bg="#2c2c2c", fg="#F5F5F5", insertbackground="#F5F5F5", font=FONT_NORMAL)
@@ -214,6 +318,7 @@ class FlashcardApp:
 
         tk.Button(frame, text="Create New Deck", command=self.show_deck_creation_screen, bg=BUTTON_COLOR, fg="#F5F5F5", font=FONT_BOLD).pack(pady=10)
         tk.Button(frame, text="Import Public Deck", command=self.show_public_decks_dialog, bg="#e2904a", fg="#F5F5F5", font=FONT_BOLD).pack(pady=5)
+        tk.Button(frame, text="Import Text Deck", command=self.handle_import_text_deck, bg="#e2904a", fg="#F5F5F5", font=FONT_BOLD).pack(pady=5)
         tk.Button(frame, text="Logout", command=self.handle_logout, bg=BUTTON_COLOR, fg="#F5F5F5", font=FONT_BOLD).pack(pady=5)
         
         self.import_status_label = tk.Label(frame, text="", bg=BACKGROUND_COLOR, fg="#F5F5F5", font=FONT_NORMAL)
@@ -322,6 +427,13 @@ class FlashcardApp:
         self.strictness_entry = tk.Entry(frame, bg="#2c2c2c", fg="#F5F5F5", insertbackground="#F5F5F5", font=FONT_NORMAL)
         self.strictness_entry.insert(0, "80")
         self.strictness_entry.pack(pady=5)
+
+        tk.Checkbutton(frame, text="Accept Typos", variable=self.quiz_typo_tolerant, bg=BACKGROUND_COLOR, fg="#F5F5F5",
+                       selectcolor="#2c2c2c", activebackground=BACKGROUND_COLOR, font=FONT_NORMAL).pack(pady=5)
+        tk.Checkbutton(frame, text="Focus on Weak Cards", variable=self.quiz_weighted, bg=BACKGROUND_COLOR, fg="#F5F5F5",
+                       selectcolor="#2c2c2c", activebackground=BACKGROUND_COLOR, font=FONT_NORMAL).pack(pady=5)
+        tk.Checkbutton(frame, text="Spaced Repetition (due cards only)", variable=self.quiz_spaced, bg=BACKGROUND_COLOR, fg="#F5F5F5",
+                       selectcolor="#2c2c2c", activebackground=BACKGROUND_COLOR, font=FONT_NORMAL).pack(pady=5)
         
         tk.Button(frame, text="Start Quiz", command=self.start_quiz, bg=BUTTON_COLOR, fg="#F5F5F5", font=FONT_BOLD).pack(pady=10)
         tk.Button(frame, text="Back to Menu", command=self.show_main_menu, bg=BUTTON_COLOR, fg="#F5F5F5", font=FONT_BOLD).pack(pady=5)
@@ -330,15 +442,28 @@ class FlashcardApp:
 
     # --- Core Application Logic ---
 
+    def when_done(self, future, callback):
+        """Calls callback with the future's result on the Tk thread once it has finished."""
+        if future.done():
+            callback(future)
+        else:
+            self.root.after(HASH_POLL_MS, self.when_done, future, callback)
+
     def handle_login(self):
-        try:
-            username = self.username_entry.get()
-            password = self.password_entry.get()
-            user = login_user(self.users, username, password)
-            self.current_user = user
+        username = self.username_entry.get()
+        password = self.password_entry.get()
+        self.login_status_label.config(text="Checking password...", fg="#F5F5F5")
+        self.prefetch_user_data(username)
+
+        def logged_in(future):
+            try:
+                self.current_user = future.result()
+            except AuthenticationError as e:
+                self.login_status_label.config(text=str(e), fg=WRONG_COLOR)
+                return
             self.show_main_menu()
-        except AuthenticationError as e:
-            self.login_status_label.config(text=str(e), fg=WRONG_COLOR)
+
+        self.after_startup(lambda: self.when_done(submit_login(self.users, username, password), logged_in))
 
     def show_register_screen(self):
         self.show_frame(self.register_frame)
@@ -351,20 +476,24 @@ class FlashcardApp:
         self.new_password_entry.config(show="*")
 
     def handle_register(self):
-        try:
-            username = self.new_username_entry.get()
-            password = self.new_password_entry.get()
-            hint = self.hint_entry.get()
-            user = register_user(self.users, username, password, hint)
-            self.current_user = user
+        username = self.new_username_entry.get()
+        password = self.new_password_entry.get()
+        hint = self.hint_entry.get()
+        self.register_status_label.config(text="Creating account...", fg="#F5F5F5")
+
+        def registered(future):
+            try:
+                self.current_user = future.result()
+            except (AuthenticationError, InvalidNameError) as e:
+                self.register_status_label.config(text=str(e), fg=WRONG_COLOR)
+                return
             self.show_main_menu()
-        except AuthenticationError as e:
-            self.register_status_label.config(text=str(e), fg=WRONG_COLOR)
+
+        self.after_startup(lambda: self.when_done(submit_registration(self.users, username, password, hint), registered))
 
     def handle_show_hint(self):
         username = self.username_entry.get()
-        hint = get_password_hint(self.users, username)
-        messagebox.showinfo("Password Hint", hint)
+        self.after_startup(lambda: messagebox.showinfo("Password Hint", get_password_hint(self.users, username)))
 
     def handle_logout(self):
         self.current_user = None
@@ -386,15 +515,21 @@ class FlashcardApp:
         for widget in self.deck_list_frame.winfo_children():
             widget.destroy()
 
-        self.all_user_decks = load_all_user_decks(self.current_user)
+        self.all_user_decks, summary = self.take_user_data()
         
         if not self.all_user_decks:
             tk.Label(self.deck_list_frame, text="No private decks. Create a new one!", bg=BACKGROUND_COLOR, fg="#F5F5F5").pack(pady=10)
 
+        if summary['total'] > 0:
+            overall_percent = (summary['correct'] / summary['total']) * 100
+            tk.Label(self.deck_list_frame, text=f"{overall_percent:.0f}% Learned across all decks", bg=BACKGROUND_COLOR, fg="#e2904a", font=FONT_BOLD).pack(pady=5)
+
         for deck_id, deck in self.all_user_decks.items():
-            progress_total = deck.progress['total']
+            # The summary holds the running totals; decks it has not seen yet fall back to their own progress
+            progress = summary['decks'].get(deck_id, deck.progress)
+            progress_total = progress['total']
             if progress_total > 0:
-                progress_percent = (deck.progress['correct'] / progress_total) * 100
+                progress_percent = (progress['correct'] / progress_total) * 100
             else:
                 progress_percent = 0
             
@@ -446,30 +581,56 @@ class FlashcardApp:
             new_deck.add_card(card)
 
         if visibility == "public":
-            save_deck_to_public(new_deck)
-            messagebox.showinfo("Success", f"Deck '{new_deck.name}' saved as public.")
+            duplicate_of = save_deck_to_public(new_deck)
+            if duplicate_of is not None:
+                original_name = load_public_catalog().get(duplicate_of, {}).get("name", duplicate_of)
+                messagebox.showinfo("Success", f"Deck '{new_deck.name}' saved as public. It has the same cards as the public deck '{original_name}', so they are stored only once.")
+            else:
+                messagebox.showinfo("Success", f"Deck '{new_deck.name}' saved as public.")
         else:
             save_deck_to_private(self.current_user['username'], new_deck)
+            update_due_index(self.current_user['username'], new_deck.deck_id, map(card_key, new_deck.cards))
             messagebox.showinfo("Success", f"Deck '{new_deck.name}' saved as private.")
             
         self.show_main_menu()
         
     def show_public_decks_dialog(self):
         """Displays a dialog for the user to select a public deck to import."""
-        self.all_public_decks = load_all_public_decks()
+        self.public_catalog = load_public_catalog()
         
         dialog = tk.Toplevel(self.root)
         dialog.title("Import Public Deck")
-        dialog.geometry("400x400")
+        dialog.geometry("400x450")
         dialog.transient(self.root)
         
         tk.Label(dialog, text="Select a deck to import:", font=FONT_BOLD).pack(pady=10)
+
+        search_var = tk.StringVar()
+        tk.Entry(dialog, textvariable=search_var, width=40).pack(pady=5)
         
         listbox = tk.Listbox(dialog, width=50, height=15)
         listbox.pack(pady=10)
 
-        for deck_id, deck in self.all_public_decks.items():
-            listbox.insert(tk.END, deck.name)
+        # Listbox rows map to deck IDs by position, so decks sharing a name stay distinct
+        all_deck_ids = sorted(self.public_catalog, key=lambda d: (self.public_catalog[d]["name"] or "").lower())
+        listed_deck_ids = []
+
+        def show_decks(*_):
+            query = search_var.get()
+            if query.strip():
+                # The last word is matched as a prefix, so results follow the typing
+                found = [deck_id for deck_id, _ in search_public_decks(query, prefix_last=True)]
+                deck_ids = [deck_id for deck_id in found if deck_id in self.public_catalog]
+            else:
+                deck_ids = all_deck_ids
+            listed_deck_ids[:] = deck_ids
+            listbox.delete(0, tk.END)
+            for deck_id in deck_ids:
+                entry = self.public_catalog[deck_id]
+                listbox.insert(tk.END, f"{entry['name']} ({entry['card_count']} cards)")
+
+        search_var.trace_add("write", show_decks)
+        show_decks()
             
         def import_selected_deck():
             selected_index = listbox.curselection()
@@ -477,21 +638,53 @@ class FlashcardApp:
                 messagebox.showerror("Error", "Please select a deck to import.")
                 return
             
-            selected_name = listbox.get(selected_index[0])
-            
-            # Find the deck ID by name (this is a simple approach,
-            # in a real app you'd use a better way to map listbox items to deck IDs)
-            selected_deck = next((d for d in self.all_public_decks.values() if d.name == selected_name), None)
-
-            if selected_deck:
-                import_public_deck(self.current_user['username'], selected_deck)
-                messagebox.showinfo("Success", f"Deck '{selected_deck.name}' imported successfully!")
-                self.show_main_menu()
+            # Only the chosen deck is parsed, the catalog is enough for the listing
+            try:
+                selected_deck = load_public_deck(listed_deck_ids[selected_index[0]])
+            except DeckLoadError as e:
+                messagebox.showerror("Error", str(e))
+                return
+
+            import_public_deck(self.current_user['username'], selected_deck)
+            update_due_index(self.current_user['username'], selected_deck.deck_id, map(card_key, selected_deck.cards))
+            messagebox.showinfo("Success", f"Deck '{selected_deck.name}' imported successfully!")
+            self.show_main_menu()
             dialog.destroy()
             
         tk.Button(dialog, text="Import", command=import_selected_deck, bg=BUTTON_COLOR, fg="#F5F5F5").pack(pady=5)
         tk.Button(dialog, text="Cancel", command=dialog.destroy, bg=BUTTON_COLOR, fg="#F5F5F5").pack(pady=5)
     
+    def handle_import_text_deck(self):
+        """Imports a Q:/A:/H: text file chosen by the user as a new private deck."""
+        file_path = filedialog.askopenfilename(title="Import Text Deck", filetypes=[("Text files", "*.txt")])
+        if not file_path:
+            return
+
+        # Large files take a while, so the import runs in the background
+        errors = []
+        future = self.prefetch_executor.submit(import_text_deck, file_path, self.current_user['username'],
+                                               on_error=errors.append)
+
+        def imported(future):
+            try:
+                _, card_count = future.result()
+            except (OSError, UnicodeDecodeError) as e:
+                messagebox.showerror("Error", f"Could not read the deck file: {e}")
+                return
+            except (DeckLoadError, ValueError) as e:
+                # Malformed decks and names that may not be used for a new deck
+                messagebox.showerror("Error", f"Could not import the deck: {e}")
+                return
+
+            message = f"Imported {card_count} cards."
+            if errors:
+                skipped_lines = ", ".join(str(e.line_number) for e in errors[:10])
+                message += f"\n{len(errors)} malformed card(s) skipped near line(s) {skipped_lines}."
+            messagebox.showinfo("Import Complete", message)
+            self.show_main_menu()
+
+        self.when_done(future, imported)
+
     # --- Study Mode ---
 
     def start_study_mode(self, deck: Deck):
@@ -546,11 +739,38 @@ class FlashcardApp:
             self.quiz_strictness = 80
             
         if not self.current_deck.cards:
+            # The status label lives in the quiz frame, which is built on first use
+            self._ensure_frame("quiz_mode_frame")
             self.quiz_status_label.config(text="No cards in this deck.", fg=WRONG_COLOR)
             return
 
-        self.quiz_cards = self.current_deck.get_shuffled_cards()
-        self.quiz_session = Session(self.current_deck.name, len(self.quiz_cards))
+        if self.quiz_stats is not None:
+            self.quiz_stats.close()
+        self.quiz_stats = open_card_stats(self.current_user['username'], self.current_deck)
+        self.quiz_sampler = None
+
+        if self.quiz_spaced.get():
+            schedule = load_schedule(self.current_user['username'], self.current_deck.deck_id)
+            self.quiz_scheduler = Scheduler(self.current_deck.cards, schedule)
+            due_count = self.quiz_scheduler.due_count()
+            if not due_count:
+                messagebox.showinfo("Quiz", "No cards in this deck are due for review.")
+                return
+            # Cards are drawn from the due queue one at a time as the quiz advances
+            self.quiz_cards = [self.quiz_scheduler.next_due()]
+            self.quiz_session = Session(self.current_deck.name, due_count)
+        elif self.quiz_weighted.get():
+            self.quiz_scheduler = None
+            # Cards are drawn one at a time, weighted by how often they were missed
+            now = time.time()
+            self.quiz_sampler = self.current_deck.get_weighted_sampler(lambda card: card_weight(self.quiz_stats.get(card), now))
+            self.quiz_sample_indexes = [self.quiz_sampler.sample()]
+            self.quiz_cards = [self.current_deck.cards[self.quiz_sample_indexes[0]]]
+            self.quiz_session = Session(self.current_deck.name, len(self.current_deck.cards))
+        else:
+            self.quiz_scheduler = None
+            self.quiz_cards = self.current_deck.get_shuffled_cards()
+            self.quiz_session = Session(self.current_deck.name, len(self.quiz_cards))
         self.current_card_index = 0
         self.tries_left = self.quiz_tries
         self.show_frame(self.quiz_mode_frame)
@@ -578,10 +798,11 @@ class FlashcardApp:
 
     def check_answer(self):
         user_answer = self.answer_entry.get().strip()
-        correct_answer = self.quiz_cards[self.current_card_index].back.strip()
         
-        if self.is_similar(user_answer, correct_answer, self.quiz_strictness):
+        if matcher_for(self.quiz_cards[self.current_card_index]).matches(
+                user_answer, self.quiz_strictness, typo_tolerant=self.quiz_typo_tolerant.get()):
             self.quiz_session.correct += 1
+            self.record_answer(True)
             self.quiz_status_label.config(text="Correct!", fg=CORRECT_COLOR)
             self.animate_flip(self.quiz_card_canvas, self.quiz_card_text, self.quiz_cards[self.current_card_index].back, color=CORRECT_COLOR)
             self.root.after(1500, self.show_next_card_quiz)
@@ -591,6 +812,7 @@ class FlashcardApp:
                 self.quiz_status_label.config(text=f"Incorrect. Tries left: {self.tries_left}", fg=WRONG_COLOR)
             else:
                 self.quiz_status_label.config(text="Wrong Answer.", fg=WRONG_COLOR)
+                self.record_answer(False)
                 self.animate_flip(self.quiz_card_canvas, self.quiz_card_text, self.quiz_cards[self.current_card_index].back, color=WRONG_COLOR)
                 self.root.after(1500, self.show_next_card_quiz)
                 
@@ -599,33 +821,30 @@ class FlashcardApp:
         Checks if two strings are similar based on a given strictness level.
         For dates, it requires an exact match.
         """
-        user_lower = user_answer.strip().lower()
-        correct_lower = correct_answer.strip().lower()
+        return is_similar(user_answer, correct_answer, strictness)
 
-        # Check for dates - simple check for now
-        if re.search(r'\d{4}|\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}', user_lower) and user_lower != correct_lower:
-            return False
-
-        # Tokenize and clean up strings
-        user_words = set(re.findall(r'\b\w+\b', user_lower))
-        correct_words = set(re.findall(r'\b\w+\b', correct_lower))
-        
-        # Remove common stop words for general text comparison
-        stop_words = {"the", "a", "an", "is", "of", "in", "to", "for", "on", "and", "by"}
-        user_words = user_words - stop_words
-        correct_words = correct_words - stop_words
-
-        if not user_words or not correct_words:
-            return user_lower == correct_lower
-
-        intersection = user_words.intersection(correct_words)
-        union = user_words.union(correct_words)
-        
-        similarity_score = (len(intersection) / len(union)) * 100
-        return similarity_score >= strictness
+    def record_answer(self, correct: bool):
+        """Updates the statistics, sampling weight and spaced repetition schedule of the current card."""
+        card = self.quiz_cards[self.current_card_index]
+        self.quiz_stats.record(card, correct)
+        if self.quiz_sampler is not None:
+            # Reweight the card right away so the rest of the session adapts
+            index = self.quiz_sample_indexes[self.current_card_index]
+            self.quiz_sampler.update(index, card_weight(self.quiz_stats.get(card), time.time()))
+        if self.quiz_scheduler is not None:
+            attempts = self.quiz_tries - self.tries_left + 1
+            self.quiz_scheduler.review(card, review_quality(correct, attempts))
 
     def show_next_card_quiz(self):
         self.current_card_index += 1
+        if self.quiz_scheduler is not None and self.current_card_index < self.quiz_session.total:
+            card = self.quiz_scheduler.next_due()
+            if card is not None:
+                self.quiz_cards.append(card)
+        elif self.quiz_sampler is not None and self.current_card_index < self.quiz_session.total:
+            index = self.quiz_sampler.sample()
+            self.quiz_sample_indexes.append(index)
+            self.quiz_cards.append(self.current_deck.cards[index])
         self.show_card_quiz()
 
     def end_quiz(self):
@@ -634,6 +853,14 @@ class FlashcardApp:
             self.current_deck.progress['correct'] += self.quiz_session.correct
             self.current_deck.progress['total'] += self.quiz_session.total
             save_progress(self.current_user['username'], self.current_deck.deck_id, self.current_deck.progress)
+            if self.quiz_scheduler is not None:
+                schedule = self.quiz_scheduler.to_dict()
+                save_schedule(self.current_user['username'], self.current_deck.deck_id, schedule)
+                update_due_index(self.current_user['username'], self.current_deck.deck_id,
+                                 self.quiz_scheduler.card_keys(), schedule)
+        if self.quiz_stats is not None:
+            self.quiz_stats.close()
+            self.quiz_stats = None
 
         # Display session results
         session_percent = (self.quiz_session.correct / self.quiz_session.total) * 100 if self.quiz_session.total > 0 else 0
@@ -685,9 +912,12 @@ class FlashcardApp:
             self.root.after(20, self.fade_in, canvas, item, end_color, next_text, step + 1, steps)
 
 if __name__ == "__main__":
+    profiler = StartupProfiler(STARTUP_TIME)
+    profiler.mark("imports")
     try:
         root = tk.Tk()
-        app = FlashcardApp(root)
+        profiler.mark("tk init")
+        app = FlashcardApp(root, profiler, report_startup="--profile-startup" in sys.argv[1:])
         root.mainloop()
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -0,0 +1,239 @@
+"""
+Answer matching for quizzes, usable without the GUI.
+
+The correct answer of a card is normalized and tokenized once into an
+AnswerMatcher, which is cached on the card. Grading an answer then only
+has to tokenize the user's input.
+
+An answer is accepted when the Jaccard similarity of the two word sets,
+ignoring stop words, reaches the strictness percentage. Answers containing
+a year or date must match the correct answer exactly.
+
+In typo-tolerant mode, a word of the answer that is not in the correct
+answer still counts as shared when it is within a few edits of one of the
+correct words (see edit_distance.py). The number of edits allowed per word
+grows with the word's length and shrinks as the strictness rises.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+
+from edit_distance import deletion_levels, deletion_variants, within_distance
+
+STOP_WORDS = frozenset({"the", "a", "an", "is", "of", "in", "to", "for", "on", "and", "by"})
+
+_WORD_RE = re.compile(r'\b\w+\b')
+# Any run of four digits, which also covers dd/mm/yyyy and dd-mm-yyyy dates
+_DATE_RE = re.compile(r'\d{4}')
+
+# Upper bound on the edits allowed per word in typo-tolerant mode
+MAX_TYPOS_PER_WORD = 2
+
+def tokenize(text: str) -> FrozenSet[str]:
+    """Returns the lowercased words of text, without stop words."""
+    return frozenset(_WORD_RE.findall(text.strip().lower())) - STOP_WORDS
+
+def tokens(text: str) -> List[str]:
+    """Returns the lowercased words of text in order, with repeats, without stop words."""
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+def _jaccard(shared: int, user_count: int, correct_count: int) -> float:
+    return (shared / (user_count + correct_count - shared)) * 100
+
+def typo_budget(word_length: int, strictness: float) -> int:
+    """Returns the number of edits a correct word of this length may differ by."""
+    return max(0, min(MAX_TYPOS_PER_WORD, int(word_length * (100 - strictness) // 100)))
+
+class AnswerMatcher:
+    """The precomputed form of one correct answer."""
+    __slots__ = ("answer", "_lower", "_words", "_typo_index")
+
+    def __init__(self, correct_answer: str):
+        self.answer = correct_answer
+        self._lower = correct_answer.strip().lower()
+        self._words = tokenize(self._lower)
+        self._typo_index: Dict[str, List[str]] = None
+
+    def _build_typo_index(self) -> Dict[str, List[str]]:
+        """Maps every deletion variant of the correct words to the words it came from."""
+        index = {}
+        for word in sorted(self._words):
+            for variant in deletion_variants(word, typo_budget(len(word), 0)):
+                index.setdefault(variant, []).append(word)
+        return index
+
+    def _closest_unused(self, word: str, variants: Set[str], used: Set[str], budgets: List[int]) -> Optional[str]:
+        """Returns a correct word sharing one of the variants that word is within budget of."""
+        lookup = self._typo_index.get
+        targets = {target for variant in variants for target in lookup(variant, ()) if target not in used}
+        for target in sorted(targets):
+            budget = budgets[len(target)]
+            if abs(len(target) - len(word)) <= budget and within_distance(word, target, budget):
+                return target
+        return None
+
+    def _typo_shared(self, user_words: FrozenSet[str], strictness: float) -> int:
+        """
+        Counts shared words, pairing each remaining answer word with at most one
+        correct word within its typo budget. Stops as soon as the strictness is
+        reached, or can no longer be reached.
+        """
+        shared = len(user_words & self._words)
+        user_count, correct_count = len(user_words), len(self._words)
+        # The fewest shared words that reach the strictness
+        needed = shared
+        while needed < min(user_count, correct_count) and _jaccard(needed, user_count, correct_count) < strictness:
+            needed += 1
+        if shared >= needed or _jaccard(needed, user_count, correct_count) < strictness:
+            return shared
+        if self._typo_index is None:
+            self._typo_index = self._build_typo_index()
+
+        used = set(user_words & self._words)
+        candidates = sorted(user_words - self._words)
+        longest = max(map(len, candidates)) + MAX_TYPOS_PER_WORD
+        budgets = [typo_budget(length, strictness) for length in range(longest + 1)]
+        for position, word in enumerate(candidates):
+            if shared + len(candidates) - position < needed:
+                break
+            # Close matches share variants with fewer deletions, so search level by level
+            for variants in deletion_levels(word, budgets[len(word) + MAX_TYPOS_PER_WORD]):
+                target = self._closest_unused(word, variants, used, budgets)
+                if target is not None:
+                    used.add(target)
+                    shared += 1
+                    break
+            if shared >= needed:
+                break
+        return shared
+
+    def similarity(self, user_answer: str) -> float:
+        """Returns the Jaccard similarity of the two word sets as a percentage."""
+        user_lower = user_answer.strip().lower()
+        if user_lower == self._lower:
+            return 100.0
+        user_words = tokenize(user_lower)
+        if not user_words or not self._words:
+            return 0.0
+        shared = len(user_words & self._words)
+        return _jaccard(shared, len(user_words), len(self._words))
+
+    def matches(self, user_answer: str, strictness: float, typo_tolerant: bool = False) -> bool:
+        """
+        Checks whether user_answer is close enough to the correct answer.
+        With typo_tolerant, misspelled words can still count as shared.
+        """
+        user_lower = user_answer.strip().lower()
+        if user_lower == self._lower:
+            # Identical answers score 100, or are accepted outright when they have no words
+            return not self._words or 100 >= strictness
+        if _DATE_RE.search(user_lower):
+            return False
+
+        user_words = set(_WORD_RE.findall(user_lower))
+        user_words -= STOP_WORDS
+        if not user_words or not self._words:
+            return False
+        if typo_tolerant:
+            shared = self._typo_shared(frozenset(user_words), strictness)
+        else:
+            shared = len(user_words & self._words)
+        return _jaccard(shared, len(user_words), len(self._words)) >= strictness
+
+@lru_cache(maxsize=4096)
+def compile_answer(correct_answer: str) -> AnswerMatcher:
+    """Returns the matcher for an answer, shared between cards with the same answer."""
+    return AnswerMatcher(correct_answer)
+
+def matcher_for(card) -> AnswerMatcher:
+    """
+    Returns the matcher for a card's answer. It is cached on Card objects and
+    rebuilt if the answer was edited; card views fall back to compile_answer.
+    """
+    matcher = getattr(card, "_matcher", None)
+    if matcher is not None and matcher.answer == card.back:
+        return matcher
+    matcher = compile_answer(card.back)
+    try:
+        card._matcher = matcher
+    except AttributeError:
+        pass
+    return matcher
+
+def is_similar(user_answer: str, correct_answer: str, strictness: float, typo_tolerant: bool = False) -> bool:
+    """Checks if two answers are similar based on a given strictness level."""
+    return compile_answer(correct_answer).matches(user_answer, strictness, typo_tolerant)
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """
+    Returns NumPy, which speeds up batch grading when it is installed, or None.
+    It is only imported by the first batch, as loading it takes longer than grading a few answers.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+def _shared_word_counts(user_words: List[FrozenSet[str]], correct_words: List[FrozenSet[str]]) -> List[int]:
+    """Counts the words each user answer shares with its correct answer."""
+    np = _numpy()
+    if np is None:
+        return [len(user & correct) for user, correct in zip(user_words, correct_words)]
+
+    # Number the words through a shared vocabulary, then key every word by (pair, word)
+    # so a single isin call finds the shared words of all pairs at once
+    vocabulary = {}
+    def encode(word_sets):
+        rows, ids = [], []
+        for row, words in enumerate(word_sets):
+            for word in words:
+                rows.append(row)
+                ids.append(vocabulary.setdefault(word, len(vocabulary)))
+        return np.asarray(rows, dtype=np.int64), np.asarray(ids, dtype=np.int64)
+
+    user_rows, user_ids = encode(user_words)
+    correct_rows, correct_ids = encode(correct_words)
+    size = max(len(vocabulary), 1)
+    shared = np.isin(user_rows * size + user_ids, correct_rows * size + correct_ids)
+    return np.bincount(user_rows[shared], minlength=len(user_words)).tolist()
+
+def grade_batch(user_answers: Sequence[str], cards: Sequence,
+                strictness: Union[float, Sequence[float]]) -> Tuple[List[bool], List[float]]:
+    """
+    Grades many (answer, card) pairs at once, with one strictness value per pair
+    or a single value for all of them. Returns the results of AnswerMatcher.matches
+    and the scores of AnswerMatcher.similarity, identical to grading pair by pair.
+    """
+    if len(user_answers) != len(cards):
+        raise ValueError("Every answer needs a card to be graded against.")
+    if isinstance(strictness, (int, float)):
+        strictness = [strictness] * len(cards)
+    elif len(strictness) != len(cards):
+        raise ValueError("Every answer needs a strictness value.")
+
+    exact, dated, user_words, correct_words = [], [], [], []
+    for user_answer, card in zip(user_answers, cards):
+        matcher = matcher_for(card)
+        user_lower = user_answer.strip().lower()
+        exact.append(user_lower == matcher._lower)
+        dated.append(_DATE_RE.search(user_lower) is not None)
+        user_words.append(frozenset(_WORD_RE.findall(user_lower)) - STOP_WORDS)
+        correct_words.append(matcher._words)
+
+    results, scores = [], []
+    shared_counts = _shared_word_counts(user_words, correct_words)
+    for i, shared in enumerate(shared_counts):
+        if exact[i]:
+            scores.append(100.0)
+            results.append(not correct_words[i] or 100 >= strictness[i])
+        elif not user_words[i] or not correct_words[i]:
+            scores.append(0.0)
+            results.append(False)
+        else:
+            score = _jaccard(shared, len(user_words[i]), len(correct_words[i]))
+            scores.append(score)
+            results.append(not dated[i] and score >= strictness[i])
+    return results, scores
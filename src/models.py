@@ -1,16 +1,28 @@
 import uuid
 import random
-from typing import Dict, List, Any
+import hashlib
+from array import array
+from itertools import accumulate
+from collections.abc import MutableSequence, Sequence
+from typing import Callable, Dict, List, Any, Iterable, Union
 from exceptions import CardError
+from sampling import FenwickSampler
+
+# Decks with at least this many cards are kept in a compact CardStore
+COMPACT_DECK_THRESHOLD = 10000
 
 class Card:
     """Represents a single flashcard with a front, back, and optional hint."""
+    # _matcher caches the precompiled answer matcher, see matcher.matcher_for
+    __slots__ = ("front", "back", "hint", "_matcher")
+
     def __init__(self, front: str, back: str, hint: str = None):
         if not front or not back:
             raise CardError("Card must have both a front and a back.")
         self.front = front.strip()
         self.back = back.strip()
         self.hint = hint.strip() if hint else ""
+        self._matcher = None
 
     def to_dict(self) -> Dict[str, str]:
         """Converts the Card object to a dictionary for serialization."""
@@ -29,6 +41,197 @@ class Card:
             hint=card_data.get("hint")
         )
 
+def card_key(card) -> str:
+    """
+    Returns a stable identifier for a card, derived from its question and answer.
+    Per-card data such as schedules and statistics is stored under this key.
+    """
+    return hashlib.sha1(f"{card.front}\x1f{card.back}".encode('utf-8')).hexdigest()[:16]
+
+class CardView:
+    """A read-only view of one card inside a CardStore, with the same API as Card."""
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "CardStore", index: int):
+        self._store = store
+        self._index = index
+
+    @property
+    def front(self) -> str:
+        return self._store._field(self._index, 0)
+
+    @property
+    def back(self) -> str:
+        return self._store._field(self._index, 1)
+
+    @property
+    def hint(self) -> str:
+        return self._store._field(self._index, 2)
+
+    def to_dict(self) -> Dict[str, str]:
+        """Converts the card to a dictionary for serialization."""
+        return {
+            "front": self.front,
+            "back": self.back,
+            "hint": self.hint
+        }
+
+class CardStore(Sequence):
+    """
+    Columnar storage for large decks. The front, back and hint of every card
+    live in one shared UTF-8 buffer, located through a single offset array.
+    Indexing returns lightweight CardView objects.
+    """
+    def __init__(self, cards: Iterable[Card] = ()):
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+        self.extend(cards)
+
+    @staticmethod
+    def from_dicts(card_data: Iterable[Dict[str, str]]) -> "CardStore":
+        """Builds a CardStore from serialized card dictionaries."""
+        return CardStore(Card.from_dict(card) for card in card_data)
+
+    def append(self, card: Card):
+        """Adds a card to the end of the store."""
+        self.extend((card,))
+
+    def extend(self, cards: Iterable[Card]):
+        """Adds several cards to the end of the store in one buffer write."""
+        encoded = []
+        for card in cards:
+            encoded.append(card.front.encode('utf-8'))
+            encoded.append(card.back.encode('utf-8'))
+            encoded.append(card.hint.encode('utf-8'))
+        base = len(self._data)
+        self._offsets.extend(base + end for end in accumulate(map(len, encoded)))
+        self._data += b"".join(encoded)
+
+    def _field(self, index: int, field: int) -> str:
+        position = index * 3 + field
+        return self._data[self._offsets[position]:self._offsets[position + 1]].decode('utf-8')
+
+    def __len__(self) -> int:
+        return (len(self._offsets) - 1) // 3
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CardView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("card index out of range")
+        return CardView(self, index)
+
+    def shuffled(self) -> "PermutedCards":
+        """Returns the cards in random order by shuffling an index array."""
+        order = array('Q', range(len(self)))
+        random.shuffle(order)
+        return PermutedCards(self, order)
+
+class PermutedCards(Sequence):
+    """A reordered view over a card sequence, backed by an index array."""
+    def __init__(self, cards: Sequence, order: array):
+        self._cards = cards
+        self._order = order
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._cards[i] for i in self._order[index]]
+        return self._cards[self._order[index]]
+
+class LazyCardList(MutableSequence):
+    """
+    A list of cards that keeps the raw card dictionaries and only builds
+    Card objects when a card is first accessed.
+    """
+    def __init__(self, card_data: Iterable[Union[Dict[str, str], Card]]):
+        self._items = list(card_data)
+
+    def _decode(self, index: int) -> Card:
+        item = self._items[index]
+        if not isinstance(item, Card):
+            item = Card.from_dict(item)
+            self._items[index] = item
+        return item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(len(self._items)))]
+        return self._decode(index)
+
+    def __setitem__(self, index, card):
+        self._items[index] = card
+
+    def __delitem__(self, index):
+        del self._items[index]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self._decode(i)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyCardList)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"LazyCardList({len(self._items)} cards)"
+
+    def insert(self, index: int, card: Card):
+        self._items.insert(index, card)
+
+class CopyOnWriteCards(MutableSequence):
+    """
+    A deck's cards while they are a card list shared with other decks.
+    Reads go to the shared list; the first change makes a private copy.
+    """
+    def __init__(self, shared: Sequence):
+        self.shared = shared
+        self._cards = shared
+
+    def _writable(self) -> List[Card]:
+        if self._cards is self.shared:
+            self._cards = list(self.shared)
+        return self._cards
+
+    def __getitem__(self, index):
+        return self._cards[index]
+
+    def __setitem__(self, index, card):
+        self._writable()[index] = card
+
+    def __delitem__(self, index):
+        del self._writable()[index]
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __iter__(self):
+        return iter(self._cards)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, LazyCardList, CopyOnWriteCards)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CopyOnWriteCards({len(self._cards)} cards)"
+
+    def insert(self, index: int, card: Card):
+        self._writable().insert(index, card)
+
+    @property
+    def shuffled(self):
+        """The shuffled() of the cards, for compact and memory-mapped sequences that have one, otherwise None."""
+        return getattr(self._cards, "shuffled", None)
+
 class Deck:
     """Represents a collection of flashcards."""
     def __init__(self, name: str, deck_id: str, cards: List[Card] = None, progress: Dict[str, int] = None):
@@ -43,10 +246,18 @@ class Deck:
 
     def get_shuffled_cards(self) -> List[Card]:
         """Returns a shuffled copy of the deck's cards."""
+        # Compact and memory-mapped card sequences shuffle an index array instead
+        shuffled = getattr(self.cards, "shuffled", None)
+        if shuffled is not None:
+            return shuffled()
         shuffled_cards = self.cards[:]
         random.shuffle(shuffled_cards)
         return shuffled_cards
 
+    def get_weighted_sampler(self, weight: Callable[[Card], float]) -> FenwickSampler:
+        """Returns a sampler that draws card indexes in proportion to weight(card)."""
+        return FenwickSampler(weight(card) for card in self.cards)
+
     def to_dict(self) -> Dict[str, Any]:
         """Converts the Deck object to a dictionary for serialization."""
         return {
@@ -57,12 +268,24 @@ class Deck:
         }
 
     @staticmethod
-    def from_dict(deck_data: Dict[str, Any]):
-        """Creates a Deck object from a dictionary."""
+    def from_dict(deck_data: Dict[str, Any], lazy: bool = False):
+        """
+        Creates a Deck object from a dictionary.
+        With lazy=True, cards are only decoded when they are first accessed,
+        whatever the deck's size. Otherwise very large decks are kept in a
+        compact CardStore.
+        """
+        card_data = deck_data.get("cards", [])
+        if lazy:
+            cards = LazyCardList(card_data)
+        elif len(card_data) >= COMPACT_DECK_THRESHOLD:
+            cards = CardStore.from_dicts(card_data)
+        else:
+            cards = [Card.from_dict(card) for card in card_data]
         return Deck(
             name=deck_data.get("name"),
             deck_id=deck_data.get("deck_id"),
-            cards=[Card.from_dict(card) for card in deck_data.get("cards", [])],
+            cards=cards,
             progress=deck_data.get("progress", {"correct": 0, "total": 0})
         )
 
@@ -0,0 +1,60 @@
+"""
+Usernames and deck IDs, which become parts of file paths.
+
+New accounts and decks must use a plain name: 1 to 64 letters, digits, '.',
+'_' or '-', not starting with a dot, so it can never climb out of its
+directory or hide as a dotfile. Older versions allowed any name, so names
+already in use are never rejected when read: a name that is not plain is
+stored under its percent-encoding behind a '%', which no plain name starts
+with, unless an older version already stored it under its own name.
+"""
+
+import os
+import re
+from urllib.parse import quote, unquote
+
+from exceptions import InvalidNameError
+
+_NAME_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+ENCODED_PREFIX = "%"
+
+def is_valid_name(name) -> bool:
+    """Returns True if name may be used for a new account or deck."""
+    return isinstance(name, str) and _NAME_RE.fullmatch(name) is not None and not name.startswith(".")
+
+def check_name(name, kind: str = "name") -> str:
+    """Returns name, or raises InvalidNameError if it may not be used for a new account or deck."""
+    if not is_valid_name(name):
+        raise InvalidNameError(name, kind)
+    return name
+
+def path_name(name: str) -> str:
+    """Returns the file name that stands for a name: plain names as they are, others encoded."""
+    if is_valid_name(name):
+        return name
+    return ENCODED_PREFIX + quote(name, safe="")
+
+def name_from_path(file_name: str) -> str:
+    """Returns the name a file name stands for, the reverse of path_name."""
+    if file_name.startswith(ENCODED_PREFIX):
+        return unquote(file_name[len(ENCODED_PREFIX):])
+    return file_name
+
+def _is_single_component(name: str) -> bool:
+    """Returns True if name, used as it is, stays a single entry of its directory."""
+    return (bool(name) and name not in (".", "..") and "\0" not in name
+            and os.sep not in name and (os.altsep is None or os.altsep not in name))
+
+def named_path(directory: str, name: str, suffix: str = "") -> str:
+    """
+    Returns the path in directory for a username or deck ID, with suffix
+    appended. Names that are not plain are encoded, unless an older version
+    already stored them under their own name and that stays inside directory.
+    """
+    path = os.path.join(directory, path_name(name) + suffix)
+    if not is_valid_name(name) and _is_single_component(name) and not os.path.exists(path):
+        legacy_path = os.path.join(directory, name + suffix)
+        if os.path.exists(legacy_path):
+            return legacy_path
+    return path
@@ -0,0 +1,123 @@
+"""
+Salted, memory-hard password hashing with tunable cost.
+
+Hashes are stored as strings that carry their algorithm, cost and salt:
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+    pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>
+scrypt is used when the OpenSSL that Python was built with provides it, and
+PBKDF2 otherwise. Hashes written before this module, a bare unsalted
+SHA-256 hex digest, still verify but are reported as needing a rehash.
+
+calibrate() times the key derivation on this machine and picks the highest
+cost that stays within a target latency. Running this module calibrates
+and saves the parameters that auth.py uses for new hashes:
+    python src/password_hash.py [target milliseconds]
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+if hasattr(hashlib, "scrypt"):
+    DEFAULT_PARAMS = {"algorithm": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+else:
+    DEFAULT_PARAMS = {"algorithm": "pbkdf2_sha256", "iterations": 200000}
+
+# Calibration never goes below these costs, however slow the machine
+MIN_SCRYPT_N = 2 ** 12
+MIN_PBKDF2_ITERATIONS = 50000
+DEFAULT_TARGET_SECONDS = 0.25
+
+def _usable(params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not params or (params.get("algorithm") == "scrypt" and not hasattr(hashlib, "scrypt")):
+        return DEFAULT_PARAMS
+    return params
+
+def _derive(password: str, salt: bytes, params: Dict[str, Any]) -> bytes:
+    if params["algorithm"] == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        # scrypt needs 128 * n * r bytes; OpenSSL refuses anything over maxmem
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=HASH_BYTES)
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, params["iterations"], HASH_BYTES)
+
+def _encode(params: Dict[str, Any], salt: bytes, derived: bytes) -> str:
+    if params["algorithm"] == "scrypt":
+        cost = [params["n"], params["r"], params["p"]]
+    else:
+        cost = [params["iterations"]]
+    return "$".join([params["algorithm"]] + [str(value) for value in cost] + [salt.hex(), derived.hex()])
+
+def _decode(stored: str) -> Tuple[Dict[str, Any], bytes, bytes]:
+    parts = stored.split("$")
+    if parts[0] == "scrypt" and len(parts) == 6:
+        params = {"algorithm": "scrypt", "n": int(parts[1]), "r": int(parts[2]), "p": int(parts[3])}
+    elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+        params = {"algorithm": "pbkdf2_sha256", "iterations": int(parts[1])}
+    else:
+        raise ValueError("unknown password hash format")
+    return params, bytes.fromhex(parts[-2]), bytes.fromhex(parts[-1])
+
+def hash_password(password: str, params: Dict[str, Any] = None) -> str:
+    """Hashes a password with a new random salt."""
+    params = _usable(params)
+    salt = os.urandom(SALT_BYTES)
+    return _encode(params, salt, _derive(password, salt, params))
+
+def verify_password(password: str, stored: str, params: Dict[str, Any] = None) -> Tuple[bool, bool]:
+    """
+    Checks a password against a stored hash. Returns whether it matches and
+    whether the stored hash should be replaced, because it is a legacy hash
+    or was made with other cost parameters than params.
+    """
+    if "$" not in stored:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    stored_params, salt, expected = _decode(stored)
+    matches = hmac.compare_digest(_derive(password, salt, stored_params), expected)
+    return matches, stored_params != _usable(params)
+
+def calibrate(target_seconds: float = DEFAULT_TARGET_SECONDS, algorithm: str = None) -> Dict[str, Any]:
+    """
+    Returns the cost parameters of the most expensive hash that takes at most
+    target_seconds on this machine, doubling the cost until the target is passed.
+    """
+    algorithm = algorithm or DEFAULT_PARAMS["algorithm"]
+    if algorithm == "scrypt":
+        params = {"algorithm": "scrypt", "n": MIN_SCRYPT_N, "r": 8, "p": 1}
+        cost_key = "n"
+    else:
+        params = {"algorithm": "pbkdf2_sha256", "iterations": MIN_PBKDF2_ITERATIONS}
+        cost_key = "iterations"
+
+    salt = os.urandom(SALT_BYTES)
+    while True:
+        start = time.perf_counter()
+        _derive("calibration", salt, params)
+        elapsed = time.perf_counter() - start
+        # The cost roughly doubles the time, so stop before the next step overshoots
+        if elapsed * 2 > target_seconds:
+            return params
+        params = dict(params, **{cost_key: params[cost_key] * 2})
+
+def main(argv=None):
+    """Calibrates the hashing cost and saves it where auth.py reads it."""
+    from auth import KDF_PARAMS_FILE
+
+    argv = sys.argv[1:] if argv is None else argv
+    target_seconds = float(argv[0]) / 1000 if argv else DEFAULT_TARGET_SECONDS
+    params = calibrate(target_seconds)
+    os.makedirs(os.path.dirname(KDF_PARAMS_FILE), exist_ok=True)
+    with open(KDF_PARAMS_FILE, 'w') as f:
+        json.dump(params, f)
+    print(f"Saved {params} to {KDF_PARAMS_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,31 @@
 import json
 import os
-from typing import Dict, Any
-from models import Deck
+import hashlib
+import functools
+import atexit
+import threading
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, Any, Callable, Tuple, Iterable, Iterator, List, Optional, Sequence
+from models import Card, CopyOnWriteCards, Deck, card_key
+from exceptions import DeckLoadError
+from names import check_name, name_from_path, named_path
+from progress_journal import ProgressJournal
+from binary_deck import BINARY_DECK_EXTENSION, open_binary_deck
+from card_stats import CardStatsFile
+from content_store import CONTENT_DIRNAME, GC_GRACE_SECONDS, ContentStore, encode_card_batch, encode_cards
+from due_index import DueIndex
+from progress_summary import ProgressSummary
+from search_index import SearchIndex, add_card_terms, add_name_terms, deck_terms
 from pathlib import Path
 
+# Decode with orjson when it is installed, it is several times faster than the json module
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # Pathlib version (cleaner & recommended)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 BASE_DATA_DIR = PROJECT_ROOT / "data"
@@ -17,98 +39,879 @@ PRIVATE_DECKS_DIR = os.path.join(BASE_DATA_DIR, "decks", "private")
 PUBLIC_DECKS_DIR = os.path.join(BASE_DATA_DIR, "decks", "public")
 USER_PROGRESS_DIR = os.path.join(BASE_DATA_DIR, "progress")
 
+# Index of public decks, so listing them does not require parsing every deck file
+PUBLIC_CATALOG_PATH = os.path.join(BASE_DATA_DIR, "decks", "public_catalog.json")
+
+# Alternative storage backend, selected with configure_storage() or the FLASHCARD_STORAGE variable
+STORAGE_ENV_VAR = "FLASHCARD_STORAGE"
+SQLITE_DB_PATH = os.path.join(BASE_DATA_DIR, "flashcards.db")
+_storage_backend = None
+
+# Directories already known to exist, so repeated saves skip the makedirs call
+_existing_dirs = set()
+
+# Memory budget of the in-process deck cache, measured in deck file bytes
+DECK_CACHE_BUDGET = 64 * 1024 * 1024
+
+# Thread pool that overlaps deck file reads when loading many decks
+LOAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+_load_executor = None
+_load_executor_lock = threading.Lock()
+
+# Open progress journals, keyed by the user's progress directory
+_progress_journals: Dict[str, ProgressJournal] = {}
+_progress_journals_lock = threading.Lock()
+
+# Cross-deck due indexes, one per user, guarded by the progress journals lock
+_due_indexes: Dict[str, DueIndex] = {}
+
+# Running progress totals, keyed by the progress directory
+_progress_summaries: Dict[str, ProgressSummary] = {}
+
+# Public deck search indexes, keyed by the directory of the public catalog
+_search_indexes: Dict[str, SearchIndex] = {}
+_search_indexes_lock = threading.Lock()
+# Index directories whose first build is running in the background
+_search_index_builds = set()
+
+class DeckCache:
+    """
+    Least-recently-used cache of parsed deck files, keyed by path.
+    An entry is only reused while the file's (mtime, size) is unchanged,
+    and the least recently used entries are evicted once the total size
+    of the cached files exceeds the budget.
+    """
+    def __init__(self, budget_bytes: int):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> Any:
+        """Returns the cached value for path, or None if it is missing or stale."""
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            if entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                self._remove(path)
+                return None
+            self._entries.move_to_end(path)
+            return entry[2]
+
+    def put(self, path: str, stat: os.stat_result, value: Any):
+        """Caches a value for path and evicts old entries that no longer fit."""
+        if stat.st_size > self.budget_bytes:
+            return
+        with self._lock:
+            self._remove(path)
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, value)
+            self._used_bytes += stat.st_size
+            while self._used_bytes > self.budget_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path: str = None):
+        """Drops the entry for path, or every entry when no path is given."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._used_bytes = 0
+            else:
+                self._remove(path)
+
+    def set_budget(self, budget_bytes: int):
+        """Changes the memory budget, evicting entries if necessary."""
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            while self._entries and self._used_bytes > self.budget_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._used_bytes -= entry[1]
+
+_deck_cache = DeckCache(DECK_CACHE_BUDGET)
+
+def set_deck_cache_budget(budget_bytes: int):
+    """Sets how many bytes of deck files may be kept parsed in memory."""
+    _deck_cache.set_budget(budget_bytes)
+
+def configure_storage(kind: str = None, db_path: str = None):
+    """
+    Selects where decks and progress are stored: "json" (the default file tree)
+    or "sqlite". When no kind is given, the FLASHCARD_STORAGE environment variable is used.
+    The first time SQLite storage is opened, the existing JSON data is migrated into it.
+    """
+    global _storage_backend
+    kind = (kind or os.environ.get(STORAGE_ENV_VAR) or "json").lower()
+    if kind == "json":
+        _storage_backend = None
+    elif kind == "sqlite":
+        from sqlite_store import SQLiteStorage
+        backend = SQLiteStorage(db_path or SQLITE_DB_PATH)
+        if not backend.is_migrated():
+            flush_progress()
+            backend.migrate_json_tree(PRIVATE_DECKS_DIR, PUBLIC_DECKS_DIR, USER_PROGRESS_DIR)
+        _storage_backend = backend
+    else:
+        raise ValueError(f"Unknown storage backend: {kind}")
+
+def _storage_operation(func):
+    """Routes a storage function to the configured backend, if one is set."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _storage_backend is not None:
+            return getattr(_storage_backend, func.__name__)(*args, **kwargs)
+        return func(*args, **kwargs)
+    return wrapper
+
+def _updates_progress_summary(func):
+    """Applies every saved progress record to the running progress totals."""
+    @functools.wraps(func)
+    def wrapper(username: str, deck_id: str, progress: Dict[str, float]):
+        func(username, deck_id, progress)
+        _get_progress_summary().record(username, deck_id, progress)
+    return wrapper
+
+def _indexes_public_deck(func):
+    """Adds decks saved as public to the search index, whichever backend stores them."""
+    @functools.wraps(func)
+    def wrapper(deck: Deck) -> Optional[str]:
+        duplicate_of = func(deck)
+        _get_search_index().update_deck(deck.deck_id, deck_terms(deck.name, deck.cards))
+        return duplicate_of
+    return wrapper
+
+def _indexes_streamed_public_deck(func):
+    """Counts the words of a streamed public deck as its cards are written, then indexes it."""
+    @functools.wraps(func)
+    def wrapper(username: Optional[str], deck_id: str, name: str, cards: Iterable[Card], batch_size: int = 1000) -> int:
+        if username is not None:
+            return func(username, deck_id, name, cards, batch_size)
+        terms = Counter()
+        add_name_terms(terms, name)
+        card_count = func(username, deck_id, name, _counting_terms(cards, terms), batch_size)
+        _get_search_index().update_deck(deck_id, dict(terms))
+        return card_count
+    return wrapper
+
+def _counting_terms(cards: Iterable[Card], terms: Counter) -> Iterator[Card]:
+    for card in cards:
+        add_card_terms(terms, card)
+        yield card
+
+def _ensure_dir(path: str):
+    """Creates a directory once per process."""
+    if path not in _existing_dirs:
+        os.makedirs(path, exist_ok=True)
+        _existing_dirs.add(path)
+
 def ensure_deck_storage():
     """Ensures the necessary deck storage directories exist."""
-    os.makedirs(PUBLIC_DECKS_DIR, exist_ok=True)
-    os.makedirs(PRIVATE_DECKS_DIR, exist_ok=True)
-    os.makedirs(USER_PROGRESS_DIR, exist_ok=True)
+    _ensure_dir(PUBLIC_DECKS_DIR)
+    _ensure_dir(PRIVATE_DECKS_DIR)
+    _ensure_dir(USER_PROGRESS_DIR)
+
+def _get_user_dir(root: str, username: str) -> str:
+    """Returns a user's directory under root. Every per-user path is built from it."""
+    return named_path(root, username)
 
 def _get_user_deck_path(username: str, deck_id: str) -> str:
     """Returns the file path for a specific user's private deck."""
-    user_private_dir = os.path.join(PRIVATE_DECKS_DIR, username)
-    os.makedirs(user_private_dir, exist_ok=True)
-    return os.path.join(user_private_dir, f"{deck_id}.json")
+    return named_path(_get_user_dir(PRIVATE_DECKS_DIR, username), deck_id, ".json")
 
 def _get_public_deck_path(deck_id: str) -> str:
     """Returns the file path for a specific public deck."""
-    return os.path.join(PUBLIC_DECKS_DIR, f"{deck_id}.json")
-    
-def _get_progress_path(username: str, deck_id: str) -> str:
-    """Returns the file path for a user's progress on a specific deck."""
-    user_progress_dir = os.path.join(USER_PROGRESS_DIR, username)
-    os.makedirs(user_progress_dir, exist_ok=True)
-    return os.path.join(user_progress_dir, f"{deck_id}.json")
+    return named_path(PUBLIC_DECKS_DIR, deck_id, ".json")
+
+def _check_new_deck_id(deck_path: str, deck_id: str):
+    """Raises InvalidNameError if a deck that does not exist yet would get an ID that is not a plain name."""
+    if not os.path.exists(deck_path):
+        check_name(deck_id, "deck ID")
+
+def _get_content_store() -> ContentStore:
+    """Returns the store of deck card lists, which sits next to the public and private deck directories."""
+    return ContentStore(os.path.join(os.path.dirname(PUBLIC_DECKS_DIR), CONTENT_DIRNAME))
+
+def _write_deck_data(deck_path: str, deck_data: Dict[str, Any]) -> bytes:
+    """Atomically writes a deck file, so a crash never leaves a partial one behind. Returns the written bytes."""
+    raw = json.dumps(deck_data, indent=4).encode('utf-8')
+    tmp_path = f"{deck_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp_path, deck_path)
+    _deck_cache.invalidate(deck_path)
+    return raw
 
+def _write_deck_file(deck_path: str, name: str, deck_id: str, content_id: str, card_count: int,
+                     progress: Dict[str, float] = None) -> bytes:
+    """Atomically writes a deck file that refers to its stored card list. Returns the written bytes."""
+    return _write_deck_data(deck_path, {
+        "name": name,
+        "deck_id": deck_id,
+        "content": content_id,
+        "card_count": card_count,
+        "progress": progress if progress is not None else {"correct": 0, "total": 0}
+    })
+    
+@_storage_operation
 def save_deck_to_private(username: str, deck: Deck):
     """Saves a deck as a private deck for a specific user."""
     ensure_deck_storage()
     deck_path = _get_user_deck_path(username, deck.deck_id)
-    with open(deck_path, 'w') as f:
-        json.dump(deck.to_dict(), f, indent=4)
-    # Also initialize an empty progress file for this new deck
+    _check_new_deck_id(deck_path, deck.deck_id)
+    _ensure_dir(os.path.dirname(deck_path))
+    content_id, _ = _get_content_store().put(encode_cards(deck.cards))
+    _write_deck_file(deck_path, deck.name, deck.deck_id, content_id, len(deck.cards), deck.progress)
+    # Also reset the progress for this deck, which only queues a journal record
     save_progress(username, deck.deck_id, {"correct": 0, "total": 0})
 
-def save_deck_to_public(deck: Deck):
-    """Saves a deck as a public deck."""
+@_indexes_public_deck
+@_storage_operation
+def save_deck_to_public(deck: Deck) -> Optional[str]:
+    """
+    Saves a deck as a public deck and records it in the public catalog.
+    Returns the ID of an existing public deck with exactly the same cards, or None.
+    The cards of such duplicates are only stored once.
+    """
     ensure_deck_storage()
     deck_path = _get_public_deck_path(deck.deck_id)
-    with open(deck_path, 'w') as f:
-        json.dump(deck.to_dict(), f, indent=4)
+    _check_new_deck_id(deck_path, deck.deck_id)
+    content_id, _ = _get_content_store().put(encode_cards(deck.cards))
+    raw = _write_deck_file(deck_path, deck.name, deck.deck_id, content_id, len(deck.cards), deck.progress)
+    return _record_public_deck(deck.deck_id, deck.name, len(deck.cards), hashlib.sha256(raw).hexdigest(), content_id)
+
+def _record_public_deck(deck_id: str, name: str, card_count: int, digest: str, content_id: str) -> Optional[str]:
+    """
+    Adds or updates a freshly written public deck in the catalog.
+    Returns the ID of another public deck with the same cards, or None.
+    """
+    catalog = load_public_catalog()
+    duplicate_of = next((other_id for other_id, entry in catalog.items()
+                         if other_id != deck_id and entry.get("content") == content_id), None)
+    catalog[deck_id] = _catalog_entry(deck_id, name, card_count, os.stat(_get_public_deck_path(deck_id)),
+                                      digest, content_id)
+    _save_public_catalog(catalog)
+    return duplicate_of
+
+@_indexes_streamed_public_deck
+@_storage_operation
+def save_deck_stream(username: Optional[str], deck_id: str, name: str, cards: Iterable[Card],
+                     batch_size: int = 1000) -> int:
+    """
+    Writes a deck whose cards come from an iterator, encoding them in batches
+    so the full card list is never held in memory. The deck is saved as a private
+    deck of the given user, or as a public deck when username is None.
+    Returns the number of cards written.
+    """
+    ensure_deck_storage()
+    if username is None:
+        deck_path = _get_public_deck_path(deck_id)
+    else:
+        deck_path = _get_user_deck_path(username, deck_id)
+        _ensure_dir(os.path.dirname(deck_path))
+    _check_new_deck_id(deck_path, deck_id)
+
+    card_count = 0
+
+    def encoded_batches() -> Iterator[bytes]:
+        nonlocal card_count
+        yield b"["
+        for batch in _batched(cards, batch_size):
+            # One encoder call per batch, without the surrounding brackets
+            yield (("," if card_count else "") + encode_card_batch(batch)).encode('utf-8')
+            card_count += len(batch)
+        yield b"]"
+
+    # The card list is hashed while it is written; the deck file is only written once it is complete
+    content_id, _ = _get_content_store().put_chunks(encoded_batches())
+    raw = _write_deck_file(deck_path, name, deck_id, content_id, card_count)
+
+    if username is None:
+        _record_public_deck(deck_id, name, card_count, hashlib.sha256(raw).hexdigest(), content_id)
+    else:
+        save_progress(username, deck_id, {"correct": 0, "total": 0})
+    return card_count
+
+def _batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """Groups an iterable into lists of at most batch_size items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _write_json_atomic(path: str, data: Any):
+    """Writes JSON to a temporary file and renames it over the target path."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _catalog_entry(deck_id: str, name: str, card_count: int, stat: os.stat_result, digest: str,
+                   content_id: str) -> Dict[str, Any]:
+    """Builds the catalog record describing a single public deck file."""
+    return {
+        "deck_id": deck_id,
+        "name": name,
+        "card_count": card_count,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": digest,
+        "content": content_id
+    }
+
+def _save_public_catalog(catalog: Dict[str, Dict[str, Any]]):
+    """Persists the public deck catalog."""
+    _write_json_atomic(PUBLIC_CATALOG_PATH, {"version": 1, "decks": catalog})
+
+@_storage_operation
+def load_public_catalog() -> Dict[str, Dict[str, Any]]:
+    """
+    Loads the public deck catalog, keyed by deck ID.
+    Falls back to rebuilding it when the catalog file is missing or unreadable.
+    """
+    try:
+        with open(PUBLIC_CATALOG_PATH, 'r') as f:
+            return json.load(f)["decks"]
+    except (OSError, ValueError, KeyError):
+        return sync_public_catalog()
+
+@_storage_operation
+def sync_public_catalog() -> Dict[str, Dict[str, Any]]:
+    """
+    Brings the public catalog in line with the files on disk.
+    Only decks whose size or modification time changed are parsed again.
+    """
+    ensure_deck_storage()
+    try:
+        with open(PUBLIC_CATALOG_PATH, 'r') as f:
+            old_catalog = json.load(f)["decks"]
+    except (OSError, ValueError, KeyError):
+        old_catalog = None
+
+    catalog = {}
+    reindexed = {}
+    changed = old_catalog is None
+    with os.scandir(PUBLIC_DECKS_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json'):
+                continue
+            deck_id = name_from_path(entry.name[:-len('.json')])
+            stat = entry.stat()
+            known = (old_catalog or {}).get(deck_id)
+            if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+                catalog[deck_id] = known
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    raw = f.read()
+                deck_data = _json_loads(raw)
+                if "content" in deck_data:
+                    content_id, card_count = deck_data["content"], deck_data.get("card_count", 0)
+                    deck = _resolve_reference(deck_data)
+                else:
+                    # Decks written before the content store: hash their cards the same way
+                    content_id = hashlib.sha256(encode_cards(deck_data.get("cards", []))).hexdigest()
+                    card_count = len(deck_data.get("cards", []))
+                    deck = Deck.from_dict(deck_data, lazy=True)
+                catalog[deck_id] = _catalog_entry(deck_id, deck_data.get("name"), card_count,
+                                                  stat, hashlib.sha256(raw).hexdigest(), content_id)
+                changed = True
+                reindexed[deck_id] = deck_terms(deck.name, deck.cards)
+            except Exception as e:
+                print(f"Error loading public deck {entry.name}: {e}")
+
+    if old_catalog is not None and set(old_catalog) != set(catalog):
+        changed = True
+    if changed:
+        _save_public_catalog(catalog)
+        removed = dict.fromkeys(set(old_catalog or ()) - set(catalog))
+        _get_search_index().update_decks({**reindexed, **removed})
+    return catalog
+
+def _get_search_index(build: bool = True) -> SearchIndex:
+    """
+    Returns the public deck search index. An index that was never built is
+    built in the background unless build is False; until then searches only
+    find the decks saved since. The reindex command builds it up front.
+    """
+    index_dir = os.path.dirname(PUBLIC_CATALOG_PATH)
+    with _search_indexes_lock:
+        index = _search_indexes.get(index_dir)
+        if index is None:
+            index = _search_indexes[index_dir] = SearchIndex(index_dir)
+        start_build = build and not index.exists() and index_dir not in _search_index_builds
+        if start_build:
+            _search_index_builds.add(index_dir)
+    if start_build:
+        threading.Thread(target=_build_search_index, args=(index, index_dir), daemon=True).start()
+    return index
 
-def load_deck(file_path: str) -> Deck:
-    """Loads a deck from a specified file path."""
-    with open(file_path, 'r') as f:
-        deck_data = json.load(f)
-        return Deck.from_dict(deck_data)
+def _public_deck_terms() -> Dict[str, Dict[str, float]]:
+    """Returns the weighted words of every public deck, loading one deck at a time."""
+    terms = {}
+    for deck_id in list(load_public_catalog()):
+        try:
+            deck = load_public_deck(deck_id)
+        except (OSError, ValueError, DeckLoadError) as e:
+            print(f"Error loading public deck {deck_id}: {e}")
+            continue
+        terms[deck_id] = deck_terms(deck.name, deck.cards)
+    return terms
 
+def _build_search_index(index: SearchIndex, index_dir: str):
+    """Builds a search index that does not exist yet, on a background thread."""
+    try:
+        index.start_rebuild()
+        index.rebuild(_public_deck_terms())
+    except Exception as e:
+        index.cancel_rebuild()
+        print(f"Error building the search index: {e}")
+    finally:
+        with _search_indexes_lock:
+            _search_index_builds.discard(index_dir)
+
+def rebuild_search_index():
+    """Rebuilds the public deck search index from every public deck, in case it was damaged or lost."""
+    index_dir = os.path.dirname(PUBLIC_CATALOG_PATH)
+    index = _get_search_index(build=False)
+    with _search_indexes_lock:
+        # Reading the catalog may save index updates, which must not start a second build
+        _search_index_builds.add(index_dir)
+    index.start_rebuild()
+    try:
+        index.rebuild(_public_deck_terms())
+    except Exception:
+        index.cancel_rebuild()
+        raise
+    finally:
+        with _search_indexes_lock:
+            _search_index_builds.discard(index_dir)
+
+def search_public_decks(query: str, limit: int = 50, prefix_last: bool = False) -> List[Tuple[str, float]]:
+    """
+    Finds public decks by their name and card text. Returns (deck ID, score)
+    pairs, best match first. See search_index.py for the query syntax.
+    """
+    return _get_search_index().search(query, limit, prefix_last)
+
+def load_deck(file_path: str, lazy: bool = False) -> Deck:
+    """
+    Loads a deck from a specified file path, resolving imported public deck references.
+    Unchanged files are served from the deck cache without being read again.
+    """
+    stat = os.stat(file_path)
+    cached = _deck_cache.get(file_path, stat)
+    if cached is None and file_path.endswith(BINARY_DECK_EXTENSION):
+        # Binary decks are memory-mapped, their cards are decoded on access
+        cached = open_binary_deck(file_path)
+        _deck_cache.put(file_path, stat, cached)
+    elif cached is None:
+        with open(file_path, 'rb') as f:
+            cached = _json_loads(f.read())
+        if "content" in cached:
+            # Stored card lists never change, so the resolved deck can be cached
+            cached = _resolve_reference(cached)
+        _deck_cache.put(file_path, stat, cached)
+    return _deck_from_cache_entry(cached, lazy)
+
+def _deck_from_cache_entry(cached: Any, lazy: bool) -> Deck:
+    """
+    Builds the deck a caller gets from a deck cache entry. Callers may change
+    their deck, so they never get the cached object itself.
+    """
+    if isinstance(cached, Deck):
+        return _copy_deck(cached)
+    if "public_ref" in cached:
+        # Public deck references are cached as their raw data, so changes to the public deck are picked up
+        return _resolve_public_reference(cached)
+    # Decks written before the content store are cached as their raw data, and built as the caller asks
+    deck = Deck.from_dict(cached, lazy=lazy)
+    deck.progress = dict(deck.progress)
+    return deck
+
+def _copy_deck(deck: Deck) -> Deck:
+    """Returns a copy of a cached deck whose cards are only copied once they are changed."""
+    cards = deck.cards.shared if isinstance(deck.cards, CopyOnWriteCards) else deck.cards
+    return Deck(name=deck.name, deck_id=deck.deck_id, cards=CopyOnWriteCards(cards), progress=dict(deck.progress))
+
+def _resolve_reference(deck_data: Dict[str, Any]) -> Deck:
+    """Builds a deck from a file that refers to a stored card list or to a public deck."""
+    if "content" in deck_data:
+        return Deck(
+            name=deck_data.get("name"),
+            deck_id=deck_data.get("deck_id"),
+            cards=CopyOnWriteCards(_load_shared_cards(deck_data["content"])),
+            progress=dict(deck_data.get("progress", {"correct": 0, "total": 0}))
+        )
+    return _resolve_public_reference(deck_data)
+
+def _load_shared_cards(content_id: str) -> Sequence:
+    """Returns the in-memory card list that every deck with these cards shares, for read-only use."""
+    path = _get_content_store().path(content_id)
+    try:
+        stat = os.stat(path)
+        cards = _deck_cache.get(path, stat)
+        if cards is None:
+            with open(path, 'rb') as f:
+                cards = Deck.from_dict({"cards": _json_loads(f.read())}, lazy=True).cards
+            _deck_cache.put(path, stat, cards)
+    except (OSError, ValueError) as e:
+        raise DeckLoadError(content_id) from e
+    return cards
+
+def _load_shared_public_deck(deck_id: str) -> Deck:
+    """Returns a public deck whose cards are the in-memory copy that all of its importers share."""
+    try:
+        return load_deck(_get_public_deck_path(deck_id), lazy=True)
+    except (OSError, ValueError) as e:
+        raise DeckLoadError(deck_id) from e
+
+@_storage_operation
+def collect_unused_content(grace_seconds: float = GC_GRACE_SECONDS) -> Tuple[int, int]:
+    """
+    Removes stored card lists that no public or private deck file refers to.
+    Returns the number of card lists removed and the bytes freed. Nothing is
+    removed if any deck file cannot be read, since it may refer to a list.
+    """
+    deck_dirs = [PUBLIC_DECKS_DIR]
+    if os.path.isdir(PRIVATE_DECKS_DIR):
+        deck_dirs += [entry.path for entry in os.scandir(PRIVATE_DECKS_DIR) if entry.is_dir()]
+    live = set()
+    for deck_dir in deck_dirs:
+        if not os.path.isdir(deck_dir):
+            continue
+        for entry in os.scandir(deck_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    content_id = _json_loads(f.read()).get("content")
+            except (OSError, ValueError) as e:
+                print(f"Error reading deck {entry.path}, skipping garbage collection: {e}")
+                return 0, 0
+            if content_id:
+                live.add(content_id)
+    return _get_content_store().collect_garbage(live, grace_seconds)
+
+def _resolve_public_reference(deck_data: Dict[str, Any]) -> Deck:
+    """
+    Builds a user's deck from a reference to a public deck plus the user's overlay.
+    The card list is shared with every other importer unless the overlay adds cards.
+    """
+    shared = _load_shared_public_deck(deck_data["public_ref"])
+    overlay = deck_data.get("overlay", {})
+    # A copy of the cached public deck, whose cards are only copied once they are changed
+    cards = shared.cards
+    if overlay.get("added_cards"):
+        cards = list(shared.cards) + [Card.from_dict(card) for card in overlay["added_cards"]]
+    return Deck(
+        name=overlay.get("name", shared.name),
+        deck_id=deck_data.get("deck_id", shared.deck_id),
+        cards=cards
+    )
+
+def _is_deck_file(filename: str) -> bool:
+    """Returns True for JSON and binary deck files."""
+    return filename.endswith('.json') or filename.endswith(BINARY_DECK_EXTENSION)
+
+def _deck_id_from_filename(filename: str) -> str:
+    return name_from_path(os.path.splitext(filename)[0])
+
+def _cached_deck(file_path: str, lazy: bool = False) -> Optional[Deck]:
+    """Returns the deck for file_path if the cache holds an up-to-date copy, otherwise None."""
+    try:
+        cached = _deck_cache.get(file_path, os.stat(file_path))
+        return _deck_from_cache_entry(cached, lazy) if cached is not None else None
+    except (OSError, DeckLoadError):
+        return None
+
+def _load_in_parallel(load: Callable[[str], Any], filenames: List[str],
+                      load_cached: Callable[[str], Any] = None) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+    """
+    Runs load(filename) for every file on the loading thread pool, so file reads overlap.
+    Files that load_cached can serve from memory are handled directly, skipping the pool.
+    Yields (filename, result, error) in the original order; error is None on success.
+    """
+    global _load_executor
+    results = {}
+    if load_cached is not None:
+        for filename in filenames:
+            result = load_cached(filename)
+            if result is not None:
+                results[filename] = result
+    misses = [filename for filename in filenames if filename not in results]
+
+    futures = {}
+    if len(misses) >= 2:
+        with _load_executor_lock:
+            if _load_executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _load_executor = ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix="deck-loader")
+        futures = {filename: _load_executor.submit(load, filename) for filename in misses}
+
+    for filename in filenames:
+        if filename in results:
+            yield filename, results[filename], None
+            continue
+        try:
+            result = futures[filename].result() if futures else load(filename)
+        except Exception as e:
+            yield filename, None, e
+        else:
+            yield filename, result, None
+
+@_storage_operation
 def load_all_user_decks(user: Dict[str, Any]) -> Dict[str, Deck]:
     """Loads all decks owned by a specific user, including their progress."""
     decks = {}
-    user_private_dir = os.path.join(PRIVATE_DECKS_DIR, user['username'])
-    
+    username = user['username']
+    user_private_dir = _get_user_dir(PRIVATE_DECKS_DIR, username)
+
+    def with_progress(filename: str, deck: Optional[Deck]) -> Optional[Deck]:
+        if deck is not None:
+            deck.progress = load_progress(username, _deck_id_from_filename(filename))
+        return deck
+
+    def load_with_progress(filename: str) -> Deck:
+        # Cards are decoded on demand, the deck list only needs names and progress
+        return with_progress(filename, load_deck(os.path.join(user_private_dir, filename), lazy=True))
+
+    def cached_with_progress(filename: str) -> Optional[Deck]:
+        return with_progress(filename, _cached_deck(os.path.join(user_private_dir, filename), lazy=True))
+
     if os.path.exists(user_private_dir):
-        for filename in os.listdir(user_private_dir):
-            if filename.endswith('.json'):
-                deck_id = filename.replace('.json', '')
-                try:
-                    deck_path = os.path.join(user_private_dir, filename)
-                    deck = load_deck(deck_path)
-                    deck.progress = load_progress(user['username'], deck_id)
-                    decks[deck_id] = deck
-                except Exception as e:
-                    print(f"Error loading deck {filename}: {e}")
+        filenames = [filename for filename in os.listdir(user_private_dir) if _is_deck_file(filename)]
+        for filename, deck, error in _load_in_parallel(load_with_progress, filenames, cached_with_progress):
+            if error is not None:
+                print(f"Error loading deck {filename}: {error}")
+            else:
+                decks[_deck_id_from_filename(filename)] = deck
     return decks
 
+@_storage_operation
 def load_all_public_decks() -> Dict[str, Deck]:
     """Loads all public decks."""
     decks = {}
+
+    def load_public(filename: str) -> Deck:
+        return load_deck(os.path.join(PUBLIC_DECKS_DIR, filename))
+
+    def cached_public(filename: str) -> Optional[Deck]:
+        return _cached_deck(os.path.join(PUBLIC_DECKS_DIR, filename))
+
     if os.path.exists(PUBLIC_DECKS_DIR):
-        for filename in os.listdir(PUBLIC_DECKS_DIR):
-            if filename.endswith('.json'):
-                deck_id = filename.replace('.json', '')
-                try:
-                    deck_path = os.path.join(PUBLIC_DECKS_DIR, filename)
-                    deck = load_deck(deck_path)
-                    decks[deck_id] = deck
-                except Exception as e:
-                    print(f"Error loading public deck {filename}: {e}")
+        filenames = [filename for filename in os.listdir(PUBLIC_DECKS_DIR) if _is_deck_file(filename)]
+        for filename, deck, error in _load_in_parallel(load_public, filenames, cached_public):
+            if error is not None:
+                print(f"Error loading public deck {filename}: {error}")
+            else:
+                decks[_deck_id_from_filename(filename)] = deck
     return decks
 
+@_storage_operation
+def load_public_deck(deck_id: str) -> Deck:
+    """Loads a single public deck by its ID."""
+    deck_path = _get_public_deck_path(deck_id)
+    try:
+        return load_deck(deck_path)
+    except (OSError, ValueError) as e:
+        raise DeckLoadError(deck_id) from e
+
+@_storage_operation
+def load_user_deck(username: str, deck_id: str) -> Deck:
+    """Loads a single private deck of a user by its ID."""
+    deck_path = _get_user_deck_path(username, deck_id)
+    try:
+        return load_deck(deck_path, lazy=True)
+    except (OSError, ValueError) as e:
+        raise DeckLoadError(deck_id) from e
+
+@_storage_operation
 def import_public_deck(username: str, deck: Deck):
-    """Imports a public deck by saving a copy to the user's private storage."""
-    save_deck_to_private(username, deck)
+    """
+    Imports a public deck for a user. Instead of copying the cards, the user's
+    private storage gets a small reference to the public deck with an empty overlay
+    for the user's own changes.
+    """
+    ensure_deck_storage()
+    deck_path = _get_user_deck_path(username, deck.deck_id)
+    _ensure_dir(os.path.dirname(deck_path))
+    _write_deck_data(deck_path, {"name": deck.name, "deck_id": deck.deck_id, "public_ref": deck.deck_id, "overlay": {}})
+    save_progress(username, deck.deck_id, {"correct": 0, "total": 0})
     print(f"Public deck '{deck.name}' imported for user '{username}'.")
     
+def _get_progress_journal(username: str) -> ProgressJournal:
+    """Returns the progress journal for a user, opening it on first use."""
+    user_progress_dir = _get_user_dir(USER_PROGRESS_DIR, username)
+    with _progress_journals_lock:
+        journal = _progress_journals.get(user_progress_dir)
+        if journal is None:
+            journal = _progress_journals[user_progress_dir] = ProgressJournal(user_progress_dir)
+        return journal
+
+@_storage_operation
 def load_progress(username: str, deck_id: str) -> Dict[str, float]:
     """Loads the progress for a user on a specific deck."""
-    progress_path = _get_progress_path(username, deck_id)
-    if os.path.exists(progress_path):
-        with open(progress_path, 'r') as f:
-            return json.load(f)
+    progress = _get_progress_journal(username).get(deck_id)
+    if progress is not None:
+        return progress
     return {"correct": 0.0, "total": 0.0}
 
+@_updates_progress_summary
+@_storage_operation
 def save_progress(username: str, deck_id: str, progress: Dict[str, float]):
-    """Saves the progress for a user on a specific deck."""
-    progress_path = _get_progress_path(username, deck_id)
-    with open(progress_path, 'w') as f:
-        json.dump(progress, f, indent=4)
+    """
+    Saves the progress for a user on a specific deck.
+    The update is appended to the user's progress journal in the next batch.
+    """
+    _get_progress_journal(username).record(deck_id, progress)
+
+@_storage_operation
+def all_progress() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Returns the progress of every user on every deck, as {username: {deck_id: progress}}."""
+    progress = {}
+    if os.path.isdir(USER_PROGRESS_DIR):
+        for entry in os.scandir(USER_PROGRESS_DIR):
+            if entry.is_dir():
+                username = name_from_path(entry.name)
+                progress[username] = _get_progress_journal(username).all_progress()
+    return progress
+
+def _get_progress_summary(rebuild: bool = False, build_missing: bool = True) -> ProgressSummary:
+    """
+    Returns the running progress totals, building them from all progress
+    on first use unless build_missing is off, or every time when rebuild is set.
+    """
+    with _progress_journals_lock:
+        summary = _progress_summaries.get(USER_PROGRESS_DIR)
+        if summary is None:
+            summary = _progress_summaries[USER_PROGRESS_DIR] = ProgressSummary(USER_PROGRESS_DIR)
+    if rebuild or (build_missing and not summary.exists()):
+        summary.rebuild(all_progress())
+    return summary
+
+def rebuild_progress_summary():
+    """Recomputes the running progress totals from every user's saved progress."""
+    flush_progress()
+    _get_progress_summary(rebuild=True)
+
+def load_progress_summary(username: str, build_missing: bool = True) -> Dict[str, Any]:
+    """
+    Returns a user's overall progress totals and the totals of each of their decks.
+    With build_missing off, totals that were never saved are computed without saving them.
+    """
+    return _get_progress_summary(build_missing=build_missing).user_summary(username, all_progress)
+
+def progress_summary_is_current(username: str) -> bool:
+    """
+    Returns whether a user's progress totals were written after their progress
+    last changed. Another process may have saved progress whose totals it has
+    not written yet, and the user's own progress is the more recent then.
+    """
+    summary = _get_progress_summary(build_missing=False)
+    if not summary.exists():
+        # Totals are computed from the progress itself until they are first saved
+        return True
+    return summary.user_modified(username) >= _get_progress_journal(username).last_modified()
+
+def load_global_progress_summary(build_missing: bool = True) -> Dict[str, Any]:
+    """Returns the progress totals across all users, and per user, like load_progress_summary."""
+    return _get_progress_summary(build_missing=build_missing).global_summary(all_progress)
+
+def _get_schedule_path(username: str, deck_id: str) -> str:
+    """Returns the file holding a user's spaced repetition schedule for a deck."""
+    return named_path(_get_user_dir(USER_PROGRESS_DIR, username), deck_id, ".schedule")
+
+@_storage_operation
+def load_schedule(username: str, deck_id: str) -> Dict[str, List[float]]:
+    """Loads a user's spaced repetition state for a deck, keyed by models.card_key."""
+    try:
+        with open(_get_schedule_path(username, deck_id), 'rb') as f:
+            return _json_loads(f.read())
+    except (OSError, ValueError):
+        return {}
+
+@_storage_operation
+def save_schedule(username: str, deck_id: str, schedule: Dict[str, List[float]]):
+    """Saves a user's spaced repetition state for a deck."""
+    _ensure_dir(_get_user_dir(USER_PROGRESS_DIR, username))
+    _write_json_atomic(_get_schedule_path(username, deck_id), schedule)
+
+def open_card_stats(username: str, deck: Deck) -> CardStatsFile:
+    """
+    Opens the per-card statistics of a user's deck. Statistics files are
+    memory-mapped, so they live next to the progress files with every backend.
+    """
+    stats_path = named_path(_get_user_dir(USER_PROGRESS_DIR, username), deck.deck_id, ".stats")
+    return CardStatsFile(stats_path, deck.cards)
+
+def _get_due_index(username: str) -> DueIndex:
+    """Returns the due index for a user, opening it on first use."""
+    user_progress_dir = _get_user_dir(USER_PROGRESS_DIR, username)
+    with _progress_journals_lock:
+        index = _due_indexes.get(user_progress_dir)
+        if index is None:
+            index = _due_indexes[user_progress_dir] = DueIndex(user_progress_dir)
+        return index
+
+def update_due_index(username: str, deck_id: str, card_keys: Iterable[str],
+                     schedule: Dict[str, List[float]] = None):
+    """
+    Re-indexes the cards of one deck after it was saved, imported or quizzed.
+    Scheduled cards are indexed at their due time and new cards as due
+    immediately. The schedule is loaded unless the caller passes it in.
+    """
+    if schedule is None:
+        schedule = load_schedule(username, deck_id)
+    due_times = {}
+    for key in card_keys:
+        saved = schedule.get(key)
+        due_times[key] = saved[3] if saved else 0.0
+    _get_due_index(username).update_deck(deck_id, ((due, key) for key, due in due_times.items()))
+
+def extend_due_index(username: str, deck_id: str, card_keys: Iterable[str]):
+    """Adds new cards of a deck, due immediately, to the due index. Used by imports, a batch at a time."""
+    _get_due_index(username).extend_deck(deck_id, ((0.0, key) for key in card_keys))
+
+def load_due_cards(username: str, now: float = None, limit: int = None) -> List[Tuple[str, Card]]:
+    """
+    Returns (deck ID, card) for the cards due across all of a user's decks,
+    earliest first. Only the decks that have due cards are loaded.
+    """
+    cards_by_key: Dict[str, Dict[str, Card]] = {}
+    due_cards = []
+    seen = set()
+    for _, deck_id, key in _get_due_index(username).due(now, limit):
+        if (deck_id, key) in seen:
+            # An imported deck can hold the same card twice
+            continue
+        seen.add((deck_id, key))
+        if deck_id not in cards_by_key:
+            try:
+                deck = load_user_deck(username, deck_id)
+            except DeckLoadError as e:
+                print(f"Error loading deck {deck_id}: {e}")
+                deck = Deck(None, deck_id)
+            cards_by_key[deck_id] = {card_key(card): card for card in deck.cards}
+        card = cards_by_key[deck_id].get(key)
+        if card is not None:
+            due_cards.append((deck_id, card))
+    return due_cards
+
+def flush_progress():
+    """Writes every pending progress update, and the progress totals, to disk."""
+    with _progress_journals_lock:
+        journals = list(_progress_journals.values())
+        summaries = list(_progress_summaries.values())
+    for journal in journals:
+        journal.flush()
+    for summary in summaries:
+        summary.flush()
+
+atexit.register(flush_progress)
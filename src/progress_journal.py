@@ -0,0 +1,230 @@
+"""
+Append-only progress storage for a single user.
+
+Progress updates are appended to a journal as compact JSON lines and written
+in batches with a single fsync. A background compaction folds the journal
+into an atomically replaced snapshot. Reading returns the snapshot with the
+journal tail applied on top. Because every record holds the full progress of
+a deck, replaying a record twice is harmless, and a torn last line left by a
+crash is simply ignored.
+
+Other processes (the GUI, the CLI, the API server) may write the same files.
+Appends and compaction hold a file lock, and the cached state catches up
+with the files whenever they changed on disk since it was last read.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+from file_lock import file_lock
+from names import name_from_path, named_path
+
+SNAPSHOT_FILENAME = "progress.snapshot"
+JOURNAL_FILENAME = "progress.journal"
+LOCK_FILENAME = "progress.lock"
+
+# Pending records are written once this many have accumulated, or after the delay
+JOURNAL_BATCH_SIZE = 64
+JOURNAL_FLUSH_DELAY = 0.05
+
+# The journal is folded into the snapshot once it holds this many records
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+class ProgressJournal:
+    """Snapshot plus journal for the progress files in one user's progress directory."""
+    def __init__(self, user_dir: str):
+        self.user_dir = user_dir
+        self.snapshot_path = os.path.join(user_dir, SNAPSHOT_FILENAME)
+        self.journal_path = os.path.join(user_dir, JOURNAL_FILENAME)
+        self.lock_path = os.path.join(user_dir, LOCK_FILENAME)
+        self._lock = threading.RLock()
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+        # Which snapshot the state was read from, and how far into the journal
+        self._snapshot_stamp = None
+        self._journal_offset = 0
+        self._pending = []
+        self._journal_records = 0
+        self._flush_timer = None
+        self._compacting = False
+
+    def _read_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                return dict(json.load(f)["decks"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+
+    def _replay(self, state: Dict[str, Dict[str, Any]], offset: int) -> Tuple[int, int]:
+        """Applies the journal from offset onwards. Returns the offset reached and the records read."""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return offset, 0
+        # A line without its newline is a crash leftover, terminated by the next append
+        end = data.rfind(b"\n") + 1
+        records = 0
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+                state[record["d"]] = record["p"]
+                records += 1
+            except (ValueError, KeyError, TypeError):
+                # A crash can leave a partial line behind
+                continue
+        return offset + end, records
+
+    def _is_current(self) -> bool:
+        """Returns whether the cached state saw every change made to the files."""
+        if self._state is None or _file_stamp(self.snapshot_path) != self._snapshot_stamp:
+            return False
+        try:
+            journal_size = os.path.getsize(self.journal_path)
+        except OSError:
+            journal_size = 0
+        return journal_size == self._journal_offset
+
+    def last_modified(self) -> int:
+        """Returns the newest modification time of the snapshot and journal, in nanoseconds, or 0."""
+        modified = 0
+        for path in (self.snapshot_path, self.journal_path):
+            try:
+                modified = max(modified, os.stat(path).st_mtime_ns)
+            except OSError:
+                pass
+        return modified
+
+    def _catch_up(self):
+        """Brings the cached state up to date with the files. Called with the file lock held."""
+        snapshot_stamp = _file_stamp(self.snapshot_path)
+        if self._state is None or snapshot_stamp != self._snapshot_stamp:
+            # First read, or another process compacted the journal
+            self._state = self._read_snapshot()
+            self._snapshot_stamp = snapshot_stamp
+            self._journal_offset = self._journal_records = 0
+        self._journal_offset, records = self._replay(self._state, self._journal_offset)
+        self._journal_records += records
+        # Records queued here are newer than anything already on disk
+        for deck_id, progress in self._pending:
+            self._state[deck_id] = progress
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the cached state, first re-reading whatever changed on disk."""
+        if not self._is_current():
+            if os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path):
+                with file_lock(self.lock_path):
+                    self._catch_up()
+            else:
+                self._state = {deck_id: progress for deck_id, progress in self._pending}
+                self._snapshot_stamp = None
+                self._journal_offset = self._journal_records = 0
+        return self._state
+
+    def _legacy_progress(self, deck_id: str) -> Optional[Dict[str, Any]]:
+        """Reads a progress file written before the journal existed."""
+        try:
+            with open(named_path(self.user_dir, deck_id, ".json"), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, deck_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the latest progress recorded for a deck, or None."""
+        with self._lock:
+            progress = self._load_state().get(deck_id)
+        if progress is None:
+            progress = self._legacy_progress(deck_id)
+        return dict(progress) if progress is not None else None
+
+    def all_progress(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the progress of every deck, including legacy per-deck files."""
+        progress = {}
+        if os.path.isdir(self.user_dir):
+            for filename in os.listdir(self.user_dir):
+                if filename.endswith('.json'):
+                    deck_id = name_from_path(filename[:-len('.json')])
+                    legacy = self._legacy_progress(deck_id)
+                    if legacy is not None:
+                        progress[deck_id] = legacy
+        with self._lock:
+            progress.update((deck_id, dict(p)) for deck_id, p in self._load_state().items())
+        return progress
+
+    def record(self, deck_id: str, progress: Dict[str, Any]):
+        """Queues a progress update; it is written with the next batch."""
+        with self._lock:
+            progress = dict(progress)
+            self._load_state()[deck_id] = progress
+            self._pending.append((deck_id, progress))
+            if len(self._pending) >= JOURNAL_BATCH_SIZE:
+                self.flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(JOURNAL_FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Appends all pending records to the journal with a single fsync."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            data = "".join(json.dumps({"d": deck_id, "p": progress}, separators=(',', ':')) + "\n"
+                           for deck_id, progress in self._pending).encode('utf-8')
+            with file_lock(self.lock_path):
+                # Read what other processes appended first, so the offset stays exact
+                self._catch_up()
+                with open(self.journal_path, 'a+b') as f:
+                    size = f.seek(0, os.SEEK_END)
+                    if size:
+                        f.seek(size - 1)
+                        if f.read(1) != b"\n":
+                            data = b"\n" + data
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._journal_offset = size + len(data)
+            self._journal_records += len(self._pending)
+            self._pending = []
+            if self._journal_records >= JOURNAL_COMPACT_THRESHOLD and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Folds the journal into a new snapshot and empties the journal."""
+        with self._lock:
+            try:
+                self.flush()
+                with file_lock(self.lock_path):
+                    # Built from the files rather than the cache: other processes
+                    # may have appended or compacted since this one last read them
+                    state = self._read_snapshot()
+                    self._replay(state, 0)
+                    tmp_path = f"{self.snapshot_path}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        json.dump({"version": 1, "decks": state}, f, separators=(',', ':'))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.snapshot_path)
+                    # Replaying the old journal over the new snapshot would be harmless,
+                    # so a crash before this truncation loses nothing
+                    with open(self.journal_path, 'w') as f:
+                        f.flush()
+                        os.fsync(f.fileno())
+                    self._state = state
+                    self._snapshot_stamp = _file_stamp(self.snapshot_path)
+                    self._journal_offset = self._journal_records = 0
+            finally:
+                self._compacting = False
@@ -0,0 +1,165 @@
+"""
+Running progress totals per deck, per user and across all users.
+
+Every progress update is applied as a delta against the last value stored
+for that deck, so the totals never need a scan of the progress tree. Each
+user has a small summary file with their deck and overall totals, and one
+global file holds the totals of every user, for admin views.
+
+Updates are queued and written in batches, like the progress journal: one
+rewrite of each affected user's file and of the global file per batch. The
+GUI, the CLI and the API server may share the files, so a batch is applied
+under a file lock to the files as they are on disk, never to a cached copy.
+"""
+
+import json
+import os
+import threading
+from typing import Callable, Dict, Any, List, Tuple
+
+from file_lock import file_lock
+from names import named_path
+
+# Used for the global file in the progress directory and for each user's file
+SUMMARY_FILENAME = "progress.summary"
+SUMMARY_LOCK_FILENAME = "progress.summary.lock"
+
+# Queued updates are written after this delay, or when flushed
+SUMMARY_FLUSH_DELAY = 0.5
+
+def _empty_summary(entries_key: str) -> Dict[str, Any]:
+    return {"version": 1, "correct": 0, "total": 0, entries_key: {}}
+
+def _write_atomic(path: str, data: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _totals(all_progress: Dict[str, Dict[str, Dict[str, float]]]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Computes the global summary and each user's summary from {username: {deck_id: progress}}."""
+    glob = _empty_summary("users")
+    users = {}
+    for username, decks in all_progress.items():
+        user = users[username] = _empty_summary("decks")
+        for deck_id, progress in decks.items():
+            correct, total = progress.get("correct", 0), progress.get("total", 0)
+            user["decks"][deck_id] = [correct, total]
+            user["correct"] += correct
+            user["total"] += total
+        glob["users"][username] = [user["correct"], user["total"]]
+        glob["correct"] += user["correct"]
+        glob["total"] += user["total"]
+    return glob, users
+
+class ProgressSummary:
+    """Progress totals for every user whose progress lives under progress_dir."""
+    def __init__(self, progress_dir: str):
+        self.progress_dir = progress_dir
+        self.global_path = os.path.join(progress_dir, SUMMARY_FILENAME)
+        self.lock_path = os.path.join(progress_dir, SUMMARY_LOCK_FILENAME)
+        self._lock = threading.RLock()
+        # {username: {deck_id: [correct, total]}}, the latest value of each deck not yet written
+        self._pending: Dict[str, Dict[str, List[float]]] = {}
+        self._flush_timer = None
+
+    def exists(self) -> bool:
+        """Returns True once the global summary file has been written."""
+        return os.path.exists(self.global_path)
+
+    def _user_path(self, username: str) -> str:
+        return os.path.join(named_path(self.progress_dir, username), SUMMARY_FILENAME)
+
+    @staticmethod
+    def _read(path: str, entries_key: str) -> Dict[str, Any]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return _empty_summary(entries_key)
+
+    def user_modified(self, username: str) -> int:
+        """Returns when a user's summary file was last written, in nanoseconds, or 0."""
+        try:
+            return os.stat(self._user_path(username)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def record(self, username: str, deck_id: str, progress: Dict[str, float]):
+        """Queues a deck's new progress; the totals are updated with the next batch."""
+        with self._lock:
+            self._pending.setdefault(username, {})[deck_id] = [progress.get("correct", 0), progress.get("total", 0)]
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(SUMMARY_FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Applies the queued updates to the summary files, as read under the file lock."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            with file_lock(self.lock_path):
+                glob = self._read(self.global_path, "users")
+                changed_users = 0
+                for username, decks in self._pending.items():
+                    user_path = self._user_path(username)
+                    user = self._read(user_path, "decks")
+                    changed = False
+                    for deck_id, (correct, total) in decks.items():
+                        old_correct, old_total = user["decks"].get(deck_id, (0, 0))
+                        if deck_id in user["decks"] and (correct, total) == (old_correct, old_total):
+                            continue
+                        user["decks"][deck_id] = [correct, total]
+                        user["correct"] += correct - old_correct
+                        user["total"] += total - old_total
+                        changed = True
+                    if not changed:
+                        continue
+                    old_correct, old_total = glob["users"].get(username, (0, 0))
+                    glob["users"][username] = [user["correct"], user["total"]]
+                    glob["correct"] += user["correct"] - old_correct
+                    glob["total"] += user["total"] - old_total
+                    _write_atomic(user_path, user)
+                    changed_users += 1
+                if changed_users:
+                    _write_atomic(self.global_path, glob)
+            self._pending = {}
+
+    def user_summary(self, username: str, all_progress: Callable[[], Dict] = None) -> Dict[str, Any]:
+        """
+        Returns a user's overall totals and the totals of each of their decks.
+        If no summary was written yet, they are computed from all_progress()
+        when it is given, without writing anything.
+        """
+        self.flush()
+        if all_progress is not None and not self.exists():
+            user = _totals(all_progress())[1].get(username, _empty_summary("decks"))
+        else:
+            user = self._read(self._user_path(username), "decks")
+        return {"correct": user["correct"], "total": user["total"],
+                "decks": {deck_id: {"correct": c, "total": t} for deck_id, (c, t) in user["decks"].items()}}
+
+    def global_summary(self, all_progress: Callable[[], Dict] = None) -> Dict[str, Any]:
+        """Returns the totals across all users and the overall totals of each user, like user_summary."""
+        self.flush()
+        if all_progress is not None and not self.exists():
+            glob = _totals(all_progress())[0]
+        else:
+            glob = self._read(self.global_path, "users")
+        return {"correct": glob["correct"], "total": glob["total"],
+                "users": {username: {"correct": c, "total": t} for username, (c, t) in glob["users"].items()}}
+
+    def rebuild(self, all_progress: Dict[str, Dict[str, Dict[str, float]]]):
+        """Recomputes every total from {username: {deck_id: progress}}, once, when no summary exists yet."""
+        glob, users = _totals(all_progress)
+        with self._lock, file_lock(self.lock_path):
+            for username, user in users.items():
+                _write_atomic(self._user_path(username), user)
+            _write_atomic(self.global_path, glob)
@@ -0,0 +1,89 @@
+"""
+Weighted random sampling for quizzes that favour weak cards.
+
+FenwickSampler keeps card weights in a Fenwick (binary indexed) tree, so
+drawing a card and changing a card's weight both take O(log n). Weights
+can change after every answer without rebuilding anything.
+"""
+
+import random
+from typing import Iterable
+
+DAY_SECONDS = 24 * 60 * 60
+
+# Cards unseen for this many days or more get the full recency boost
+RECENCY_CAP_DAYS = 7.0
+# Weight multiplier for a card that was just answered, so it does not repeat at once
+JUST_SEEN_FACTOR = 0.1
+
+def card_weight(stats, now: float) -> float:
+    """
+    Returns the sampling weight of a card from its answer statistics (see
+    card_stats.CardStats): the smoothed error rate, scaled up the longer the
+    card has not been seen. Unseen cards count as half wrong and long unseen.
+    """
+    error_rate = (stats.attempts - stats.correct + 1) / (stats.attempts + 2)
+    days = max(0.0, (now - stats.last_seen) / DAY_SECONDS)
+    return error_rate * min(RECENCY_CAP_DAYS, JUST_SEEN_FACTOR + days)
+
+class FenwickSampler:
+    """Draws indexes with probability proportional to their weights."""
+    def __init__(self, weights: Iterable[float], rng: random.Random = None):
+        self._weights = [float(weight) for weight in weights]
+        self._rng = rng or random.Random()
+        # Build the tree in O(n) by pushing each node's sum up to its parent
+        self._tree = [0.0] + self._weights
+        size = len(self._weights)
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                self._tree[parent] += self._tree[i]
+        self._top_bit = 1 << (size.bit_length() - 1) if size else 0
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+    def total(self) -> float:
+        """Returns the sum of all weights."""
+        total, i = 0.0, len(self._weights)
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def weight(self, index: int) -> float:
+        return self._weights[index]
+
+    def update(self, index: int, weight: float):
+        """Changes the weight of index."""
+        delta = float(weight) - self._weights[index]
+        self._weights[index] = float(weight)
+        i = index + 1
+        while i <= len(self._weights):
+            self._tree[i] += delta
+            i += i & -i
+
+    def sample(self) -> int:
+        """Draws an index, or raises IndexError if every weight is zero."""
+        target = self._rng.random() * self.total()
+        position, step = 0, self._top_bit
+        # Descend the tree to the first index whose prefix sum exceeds target
+        while step:
+            following = position + step
+            if following <= len(self._weights) and self._tree[following] <= target:
+                position = following
+                target -= self._tree[following]
+            step >>= 1
+        if position >= len(self._weights) or self._weights[position] <= 0:
+            # Rounding can leave target at or past the end of the last positive weight
+            position = self._nearest_positive(min(position, len(self._weights) - 1))
+        return position
+
+    def _nearest_positive(self, position: int) -> int:
+        for index in range(max(position, 0), len(self._weights)):
+            if self._weights[index] > 0:
+                return index
+        for index in range(position - 1, -1, -1):
+            if self._weights[index] > 0:
+                return index
+        raise IndexError("cannot sample from weights that are all zero")
@@ -0,0 +1,114 @@
+"""
+Spaced repetition scheduling for quizzes, based on the SM-2 algorithm.
+
+Every card has an ease factor, a review interval and a due time. Cards are
+identified by a hash of their question and answer, so schedules survive
+reloading and reordering the deck. The scheduler keeps due times in a heap,
+so the next card to study is found in O(log n) without scanning the deck.
+"""
+
+import heapq
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from models import card_key
+
+DAY_SECONDS = 24 * 60 * 60
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# A card that was answered wrongly comes back after this many seconds
+RELEARN_DELAY = 10 * 60
+
+def review_quality(correct: bool, attempts: int) -> int:
+    """Maps a quiz answer to an SM-2 quality grade from 0 to 5."""
+    if not correct:
+        return 1
+    return 5 if attempts <= 1 else 3
+
+class CardSchedule:
+    """The SM-2 state of a single card. Due is a Unix timestamp; 0 means new."""
+    __slots__ = ("ease", "interval", "repetitions", "due")
+
+    def __init__(self, ease: float = DEFAULT_EASE, interval: float = 0.0, repetitions: int = 0, due: float = 0.0):
+        self.ease = ease
+        self.interval = interval
+        self.repetitions = repetitions
+        self.due = due
+
+    def review(self, quality: int, now: float):
+        """Updates the schedule after a review graded 0 (forgotten) to 5 (perfect)."""
+        if quality < 3:
+            self.repetitions = 0
+            self.interval = 0.0
+            self.due = now + RELEARN_DELAY
+        else:
+            self.repetitions += 1
+            if self.repetitions == 1:
+                self.interval = 1.0
+            elif self.repetitions == 2:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.ease, 2)
+            self.due = now + self.interval * DAY_SECONDS
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    def to_list(self) -> List[float]:
+        """Converts the schedule to a compact list for serialization."""
+        return [self.ease, self.interval, self.repetitions, self.due]
+
+    @staticmethod
+    def from_list(data: List[float]) -> "CardSchedule":
+        """Creates a CardSchedule from its serialized list."""
+        return CardSchedule(*data)
+
+class Scheduler:
+    """Orders the cards of a deck by due time, using a saved schedule state."""
+    def __init__(self, cards: Sequence, state: Dict[str, List[float]] = None):
+        state = state or {}
+        self.cards = cards
+        self._schedules: Dict[str, CardSchedule] = {}
+        self._indexes: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        for index, card in enumerate(cards):
+            key = card_key(card)
+            if key in self._schedules:
+                continue
+            saved = state.get(key)
+            schedule = CardSchedule.from_list(saved) if saved else CardSchedule()
+            self._schedules[key] = schedule
+            self._indexes[key] = index
+            # New cards are due at time 0, so they come up in deck order
+            self._heap.append((schedule.due, index, key))
+        heapq.heapify(self._heap)
+
+    def due_count(self, now: float = None) -> int:
+        """Returns how many cards are due at time now."""
+        now = time.time() if now is None else now
+        return sum(1 for schedule in self._schedules.values() if schedule.due <= now)
+
+    def next_due(self, now: float = None) -> Optional[object]:
+        """Removes and returns the card that has been due the longest, or None if no card is due."""
+        now = time.time() if now is None else now
+        while self._heap and self._heap[0][0] <= now:
+            due, index, key = heapq.heappop(self._heap)
+            # Cards reviewed since they were queued have a newer heap entry
+            if self._schedules[key].due == due:
+                return self.cards[index]
+        return None
+
+    def review(self, card, quality: int, now: float = None):
+        """Records a review of card and queues it again at its new due time."""
+        now = time.time() if now is None else now
+        key = card_key(card)
+        schedule = self._schedules[key]
+        schedule.review(quality, now)
+        heapq.heappush(self._heap, (schedule.due, self._indexes[key], key))
+
+    def card_keys(self) -> List[str]:
+        """Returns the keys of the deck's distinct cards."""
+        return list(self._schedules)
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        """Returns the schedule state of every card that has been reviewed."""
+        return {key: schedule.to_list() for key, schedule in self._schedules.items() if schedule.repetitions or schedule.due}
@@ -0,0 +1,469 @@
+"""
+Inverted full-text index over public decks, for searching by content.
+
+Deck names and the front, back and hint of every card are split into words
+with the tokenizer of the answer matcher (see matcher.py). Each word maps to
+the decks containing it and a weight, which counts the word's occurrences
+with name matches counting the most.
+
+The index is stored in two parts:
+    segment  an immutable, memory-mapped file with the sorted words and
+             their postings, written when the index is built or compacted
+    journal  JSON lines with the words of each deck saved or removed since
+             the segment was written, replayed into memory on open
+
+Opening the index only maps the segment and reads the short journal, so it
+takes milliseconds no matter how many decks are indexed. Words are found by
+binary search over the segment, which also serves prefix lookups. Once the
+journal holds enough records it is folded into a new segment.
+
+Segment layout (little-endian):
+    header    magic "FCSX", format version (u16), reserved (u16),
+              deck count (u32), word count (u32), posting count (u32)
+    decks     deck count + 1 u64 offsets, then the UTF-8 deck IDs
+    words     word count + 1 u64 offsets, then the sorted UTF-8 words
+    postings  word count + 1 u32 offsets into the posting arrays, then the
+              deck numbers (u32) and weights (f32) of all postings
+
+Queries are words separated by spaces, all of which must match. Words joined
+by OR match if either does, and a word ending in * matches every word it is
+a prefix of. Results are ranked by the BM25 term weighting of the matches.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from matcher import tokens
+
+SEGMENT_FILENAME = "public_search.index"
+JOURNAL_FILENAME = "public_search.journal"
+
+# Number of journal records after which they are folded into a new segment
+SEARCH_COMPACT_THRESHOLD = 1000
+# A prefix expands to at most this many words, in sorted order
+MAX_PREFIX_EXPANSIONS = 500
+
+NAME_WEIGHT = 3.0
+CARD_WEIGHT = 1.0
+HINT_WEIGHT = 0.5
+# BM25 term frequency saturation
+_K1 = 1.2
+
+_MAGIC = b"FCSX"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIII")
+_OFFSET = struct.Struct("<Q")
+_OFFSET_PAIR = struct.Struct("<2Q")
+_POSTING_PAIR = struct.Struct("<2I")
+
+def add_name_terms(terms: Counter, name: str):
+    """Counts the words of a deck name into terms."""
+    for word in tokens(name or ""):
+        terms[word] += NAME_WEIGHT
+
+def add_card_terms(terms: Counter, card):
+    """Counts the words of a card's front, back and hint into terms."""
+    for word in tokens(card.front):
+        terms[word] += CARD_WEIGHT
+    for word in tokens(card.back):
+        terms[word] += CARD_WEIGHT
+    for word in tokens(card.hint or ""):
+        terms[word] += HINT_WEIGHT
+
+def deck_terms(name: str, cards: Iterable) -> Dict[str, float]:
+    """Returns the weighted words of a deck."""
+    terms = Counter()
+    add_name_terms(terms, name)
+    for card in cards:
+        add_card_terms(terms, card)
+    return dict(terms)
+
+def parse_query(query: str, prefix_last: bool = False) -> List[List[Tuple[str, bool]]]:
+    """
+    Parses a query into clauses that must all match. Each clause is a list of
+    (word, is_prefix) alternatives. With prefix_last, the last word is a prefix
+    even without a *, for searching while the query is being typed.
+    """
+    clauses: List[List[Tuple[str, bool]]] = []
+    join_next = False
+    parts = query.split()
+    for position, part in enumerate(parts):
+        if part == "OR":
+            join_next = bool(clauses)
+            continue
+        is_prefix = part.endswith("*") or (prefix_last and position == len(parts) - 1)
+        words = tokens(part)
+        for number, word in enumerate(words):
+            alternative = (word, is_prefix and number == len(words) - 1)
+            if join_next and number == 0:
+                clauses[-1].append(alternative)
+            else:
+                clauses.append([alternative])
+        if words:
+            join_next = False
+    return clauses
+
+class _Segment:
+    """Read access to a memory-mapped index segment."""
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.deck_count, self.word_count, posting_count = _HEADER.unpack_from(self._mapped, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._mapped.close()
+            raise ValueError(f"{path} is not a search index segment")
+        self._deck_offsets = _HEADER.size
+        self._deck_blob = self._deck_offsets + (self.deck_count + 1) * _OFFSET.size
+        deck_blob_size = _OFFSET.unpack_from(self._mapped, self._deck_blob - _OFFSET.size)[0]
+        self._word_offsets = self._deck_blob + deck_blob_size
+        self._word_blob = self._word_offsets + (self.word_count + 1) * _OFFSET.size
+        word_blob_size = _OFFSET.unpack_from(self._mapped, self._word_blob - _OFFSET.size)[0]
+        self._posting_offsets = self._word_blob + word_blob_size
+        self._posting_decks = self._posting_offsets + (self.word_count + 1) * 4
+        self._posting_weights = self._posting_decks + posting_count * 4
+
+    def close(self):
+        self._mapped.close()
+
+    def deck_id(self, number: int) -> str:
+        start, end = _OFFSET_PAIR.unpack_from(self._mapped, self._deck_offsets + number * _OFFSET.size)
+        return self._mapped[self._deck_blob + start:self._deck_blob + end].decode('utf-8')
+
+    def deck_number(self, deck_id: str) -> Optional[int]:
+        """Returns the number of a deck in the segment, or None if it is not there."""
+        low, high = 0, self.deck_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.deck_id(middle) < deck_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low if low < self.deck_count and self.deck_id(low) == deck_id else None
+
+    def word(self, index: int) -> str:
+        start, end = _OFFSET_PAIR.unpack_from(self._mapped, self._word_offsets + index * _OFFSET.size)
+        return self._mapped[self._word_blob + start:self._word_blob + end].decode('utf-8')
+
+    def lower_bound(self, word: str) -> int:
+        """Returns the index of the first word not less than word."""
+        low, high = 0, self.word_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.word(middle) < word:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def postings(self, index: int) -> Iterator[Tuple[int, float]]:
+        """Yields the (deck number, weight) postings of the word at index."""
+        start, end = _POSTING_PAIR.unpack_from(self._mapped, self._posting_offsets + index * 4)
+        count = end - start
+        decks = struct.unpack_from(f"<{count}I", self._mapped, self._posting_decks + start * 4)
+        weights = struct.unpack_from(f"<{count}f", self._mapped, self._posting_weights + start * 4)
+        return zip(decks, weights)
+
+    def deck_ids(self) -> List[str]:
+        return [self.deck_id(number) for number in range(self.deck_count)]
+
+    def words(self) -> List[str]:
+        return [self.word(index) for index in range(self.word_count)]
+
+    def posting_arrays(self) -> Tuple[array, array, array]:
+        """Returns the posting offsets, deck numbers and weights of all words."""
+        sections = []
+        for typecode, start, count in (('I', self._posting_offsets, self.word_count + 1),
+                                       ('I', self._posting_decks, (self._posting_weights - self._posting_decks) // 4),
+                                       ('f', self._posting_weights, (self._posting_weights - self._posting_decks) // 4)):
+            section = array(typecode)
+            section.frombytes(self._mapped[start:start + count * 4])
+            if sys.byteorder != "little":
+                section.byteswap()
+            sections.append(section)
+        return tuple(sections)
+
+def _merged_postings(segment: Optional[_Segment], decks: Dict[str, Optional[Dict[str, float]]]):
+    """
+    Returns the deck IDs, words, posting offsets, deck numbers and weights of
+    a segment holding the postings of an existing segment, with the given decks
+    replaced or removed (None). Postings are remapped array slices, so this
+    never builds a dictionary per deck.
+    """
+    old_ids = segment.deck_ids() if segment is not None else []
+    deck_ids = sorted([deck_id for deck_id in old_ids if deck_id not in decks] +
+                      [deck_id for deck_id, terms in decks.items() if terms is not None])
+    numbers = {deck_id: number for number, deck_id in enumerate(deck_ids)}
+    # New number of every old deck, or -1 where the deck was replaced or removed
+    remap = [-1 if deck_id in decks else numbers[deck_id] for deck_id in old_ids]
+
+    # Deck numbers and weights of each word in the given decks
+    new_postings: Dict[str, Tuple[List[int], List[float]]] = {}
+    for deck_id, terms in decks.items():
+        number = numbers.get(deck_id)
+        for word, weight in (terms or {}).items():
+            entry = new_postings.get(word)
+            if entry is None:
+                entry = new_postings[word] = ([], [])
+            entry[0].append(number)
+            entry[1].append(weight)
+
+    old_words = segment.words() if segment is not None else []
+    old_offsets, old_decks, old_weights = segment.posting_arrays() if segment is not None else ([0], [], [])
+    old_indexes = {word: index for index, word in enumerate(old_words)}
+    words: List[str] = []
+    posting_offsets, posting_decks, posting_weights = array('I', [0]), array('I'), array('f')
+    for word in sorted(old_indexes.keys() | new_postings.keys()):
+        index = old_indexes.get(word)
+        if index is not None:
+            start, end = old_offsets[index], old_offsets[index + 1]
+            mapped = [remap[number] for number in old_decks[start:end]]
+            weights = old_weights[start:end]
+            if -1 in mapped:
+                kept = [(number, weight) for number, weight in zip(mapped, weights) if number >= 0]
+                mapped = [number for number, _ in kept]
+                weights = [weight for _, weight in kept]
+            posting_decks.extend(mapped)
+            posting_weights.extend(weights)
+        entry = new_postings.get(word)
+        if entry is not None:
+            posting_decks.extend(entry[0])
+            posting_weights.extend(entry[1])
+        if len(posting_decks) > posting_offsets[-1]:
+            words.append(word)
+            posting_offsets.append(len(posting_decks))
+    return deck_ids, words, posting_offsets, posting_decks, posting_weights
+
+def _write_segment(path: str, deck_ids: List[str], words: List[str],
+                   posting_offsets: array, posting_decks: array, posting_weights: array):
+    """Writes a segment file at path."""
+    def encoded_strings(strings: List[str]) -> Tuple[array, bytes]:
+        encoded = [value.encode('utf-8') for value in strings]
+        offsets = array('Q', [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        return offsets, b"".join(encoded)
+
+    deck_offsets, deck_blob = encoded_strings(deck_ids)
+    word_offsets, word_blob = encoded_strings(words)
+    sections = [deck_offsets, word_offsets, posting_offsets, posting_decks, posting_weights]
+    if sys.byteorder != "little":
+        for section in sections:
+            section.byteswap()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(deck_ids), len(words), len(posting_decks)))
+        f.write(deck_offsets.tobytes())
+        f.write(deck_blob)
+        f.write(word_offsets.tobytes())
+        f.write(word_blob)
+        for section in sections[2:]:
+            f.write(section.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class SearchIndex:
+    """The search index of the public decks, stored in index_dir."""
+    def __init__(self, index_dir: str):
+        self.segment_path = os.path.join(index_dir, SEGMENT_FILENAME)
+        self.journal_path = os.path.join(index_dir, JOURNAL_FILENAME)
+        self._lock = threading.Lock()
+        self._segment: Optional[_Segment] = None
+        self._opened = False
+        # Updates made while a rebuild reads the decks, which win over what it read
+        self._rebuilding: Optional[Dict[str, Optional[Dict[str, float]]]] = None
+        self._forget_recent()
+
+    def _forget_recent(self):
+        # Decks saved or removed (None) since the segment was written, and their postings
+        self._recent: Dict[str, Optional[Dict[str, float]]] = {}
+        self._recent_postings: Dict[str, Dict[str, float]] = {}
+        self._recent_words: Optional[List[str]] = None
+        # Segment numbers of the decks in _recent, whose segment postings are out of date
+        self._masked: Set[int] = set()
+        self._journal_records = 0
+
+    def exists(self) -> bool:
+        """Returns True once the index has been built. Updates alone only write the journal."""
+        return os.path.exists(self.segment_path)
+
+    def _open(self):
+        if self._opened:
+            return
+        try:
+            self._segment = _Segment(self.segment_path)
+        except (OSError, ValueError, struct.error):
+            self._segment = None
+        try:
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted write
+                        continue
+                    self._apply(record["d"], record["t"])
+                    self._journal_records += 1
+        except OSError:
+            pass
+        self._opened = True
+
+    def _apply(self, deck_id: str, terms: Optional[Dict[str, float]]):
+        if deck_id not in self._recent and self._segment is not None:
+            number = self._segment.deck_number(deck_id)
+            if number is not None:
+                self._masked.add(number)
+        for word in self._recent.get(deck_id) or ():
+            word_postings = self._recent_postings[word]
+            del word_postings[deck_id]
+            if not word_postings:
+                del self._recent_postings[word]
+        self._recent[deck_id] = terms
+        for word, weight in (terms or {}).items():
+            self._recent_postings.setdefault(word, {})[deck_id] = weight
+        self._recent_words = None
+
+    def update_deck(self, deck_id: str, terms: Optional[Dict[str, float]]):
+        """Replaces the weighted words of a deck, or removes the deck when terms is None."""
+        self.update_decks({deck_id: terms})
+
+    def update_decks(self, decks: Dict[str, Optional[Dict[str, float]]]):
+        """Replaces the weighted words of several decks with a single journal write."""
+        with self._lock:
+            self._open()
+            lines = []
+            for deck_id, terms in decks.items():
+                self._apply(deck_id, terms)
+                lines.append(json.dumps({"d": deck_id, "t": terms}, separators=(',', ':')) + "\n")
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(self.journal_path, 'a') as f:
+                f.write("".join(lines))
+            self._journal_records += len(lines)
+            if self._rebuilding is not None:
+                self._rebuilding.update(decks)
+            elif self._journal_records >= SEARCH_COMPACT_THRESHOLD:
+                self._compact()
+
+    def remove_deck(self, deck_id: str):
+        """Removes a deck from the index."""
+        self.update_deck(deck_id, None)
+
+    def start_rebuild(self):
+        """
+        Call before reading the decks for rebuild(), so that decks saved or
+        removed in the meantime are not lost when the index is replaced.
+        """
+        with self._lock:
+            self._rebuilding = {}
+
+    def cancel_rebuild(self):
+        """Stops collecting updates for a rebuild that failed."""
+        with self._lock:
+            self._rebuilding = None
+
+    def rebuild(self, decks: Dict[str, Dict[str, float]]):
+        """
+        Replaces the whole index with the weighted words of the given decks.
+        Updates made since start_rebuild() take precedence over decks.
+        """
+        with self._lock:
+            self._open()
+            decks = dict(decks)
+            for deck_id, terms in (self._rebuilding or {}).items():
+                if terms is None:
+                    decks.pop(deck_id, None)
+                else:
+                    decks[deck_id] = terms
+            self._rebuilding = None
+            self._replace_segment(_merged_postings(None, decks))
+
+    def _compact(self):
+        self._replace_segment(_merged_postings(self._segment, self._recent))
+
+    def _replace_segment(self, merged: Tuple):
+        os.makedirs(os.path.dirname(self.segment_path), exist_ok=True)
+        _write_segment(self.segment_path, *merged)
+        if self._segment is not None:
+            self._segment.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._segment = _Segment(self.segment_path)
+        self._forget_recent()
+
+    def _word_postings(self, word: str, is_prefix: bool) -> Iterator[List[Tuple[Union[int, str], float]]]:
+        """
+        Yields the postings of each indexed word matching a query word. Decks
+        are keyed by their segment number, or by ID if saved since the segment.
+        """
+        matches: Dict[str, List[Tuple[Union[int, str], float]]] = {}
+        segment = self._segment
+        if segment is not None:
+            index = segment.lower_bound(word)
+            while index < segment.word_count and len(matches) < MAX_PREFIX_EXPANSIONS:
+                found = segment.word(index)
+                if found != word and not (is_prefix and found.startswith(word)):
+                    break
+                matches[found] = [(number, weight) for number, weight in segment.postings(index)
+                                  if number not in self._masked]
+                index += 1
+
+        if self._recent_words is None:
+            self._recent_words = sorted(self._recent_postings)
+        index = bisect_left(self._recent_words, word)
+        while index < len(self._recent_words):
+            found = self._recent_words[index]
+            if found != word and not (is_prefix and found.startswith(word)):
+                break
+            matches.setdefault(found, []).extend(self._recent_postings[found].items())
+            index += 1
+        return iter(matches.values())
+
+    def _score_clause(self, clause: List[Tuple[str, bool]], deck_total: int) -> Dict[Union[int, str], float]:
+        """Returns the score of every deck matching any alternative of a clause."""
+        scores: Dict[Union[int, str], float] = {}
+        for word, is_prefix in clause:
+            for postings in self._word_postings(word, is_prefix):
+                idf = math.log(1 + deck_total / max(1, len(postings)))
+                for deck, weight in postings:
+                    scores[deck] = scores.get(deck, 0.0) + idf * weight * (_K1 + 1) / (weight + _K1)
+        return scores
+
+    def search(self, query: str, limit: int = 50, prefix_last: bool = False) -> List[Tuple[str, float]]:
+        """Returns the (deck ID, score) pairs of the best matches for a query, best first."""
+        clauses = parse_query(query, prefix_last)
+        if not clauses:
+            return []
+        with self._lock:
+            self._open()
+            deck_total = (self._segment.deck_count if self._segment is not None else 0) + len(self._recent)
+            scores = None
+            for clause in clauses:
+                clause_scores = self._score_clause(clause, deck_total)
+                if scores is None:
+                    scores = clause_scores
+                else:
+                    scores = {deck: score + clause_scores[deck] for deck, score in scores.items() if deck in clause_scores}
+                if not scores:
+                    return []
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            # Only the returned decks need their segment IDs decoded
+            return [(self._segment.deck_id(deck) if isinstance(deck, int) else deck, score) for deck, score in best]
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._forget_recent()
+            self._opened = False
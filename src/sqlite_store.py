@@ -0,0 +1,444 @@
+"""
+SQLite storage backend for decks and progress.
+
+Provides the same operations as the JSON file storage in persistence.py,
+but keeps every deck and progress record in a single database file.
+Enable it with persistence.configure_storage("sqlite").
+
+As with the JSON files, a deck's cards are stored once per distinct card
+list, in the contents table under the digest of their canonical encoding,
+and deck rows refer to them. Decks with the same cards share one row and one
+parsed copy in memory.
+"""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+from models import Card, CopyOnWriteCards, Deck
+from content_store import CONTENT_DIRNAME, ContentStore, encode_card_batch, encode_cards
+from exceptions import DeckLoadError
+from names import name_from_path, named_path
+from progress_journal import ProgressJournal
+
+# Owner used for public decks, private decks use the owner's username
+PUBLIC_OWNER = ""
+
+# Number of parsed card lists kept in memory
+SHARED_CARDS_CACHE_SIZE = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decks (
+    owner TEXT NOT NULL,
+    deck_id TEXT NOT NULL,
+    name TEXT,
+    card_count INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated_ns INTEGER NOT NULL,
+    content_id TEXT,
+    PRIMARY KEY (owner, deck_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contents (
+    content_id TEXT PRIMARY KEY,
+    cards TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS progress (
+    owner TEXT NOT NULL,
+    deck_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (owner, deck_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS schedules (
+    owner TEXT NOT NULL,
+    deck_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (owner, deck_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _encode(data: Any) -> str:
+    """Serializes a record compactly for storage in a TEXT column."""
+    return json.dumps(data, separators=(',', ':'))
+
+def _expand_content(deck_data: Dict[str, Any], public_dir: str) -> Dict[str, Any]:
+    """Fills in the cards of a deck file that refers to a card list in the content store."""
+    if "content" not in deck_data:
+        return deck_data
+    store = ContentStore(os.path.join(os.path.dirname(public_dir), CONTENT_DIRNAME))
+    return dict(deck_data, cards=json.loads(store.read(deck_data["content"])))
+
+def _expand_public_reference(deck_data: Dict[str, Any], public_dir: str) -> Dict[str, Any]:
+    """Turns an imported public deck reference into a full deck record."""
+    with open(named_path(public_dir, deck_data['public_ref'], ".json"), 'r') as f:
+        public_data = _expand_content(json.load(f), public_dir)
+    overlay = deck_data.get("overlay", {})
+    return {
+        "name": overlay.get("name", public_data.get("name")),
+        "deck_id": deck_data.get("deck_id"),
+        "cards": public_data.get("cards", []) + overlay.get("added_cards", [])
+    }
+
+class SQLiteStorage:
+    """Stores decks and progress in a SQLite database running in WAL mode."""
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # The connection is shared between threads, so every use goes through the lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(decks)")]
+        if "content_id" not in columns:
+            # Databases written before card lists were shared keep the cards in the deck rows
+            self._conn.execute("ALTER TABLE decks ADD COLUMN content_id TEXT")
+        self._shared_cards: "OrderedDict[str, Sequence]" = OrderedDict()
+
+    def close(self):
+        """Closes the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _put_content(self, encoded: str) -> str:
+        """Stores a canonically encoded card list, once. Returns its digest."""
+        content_id = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+        self._conn.execute("INSERT OR IGNORE INTO contents VALUES (?, ?)", (content_id, encoded))
+        return content_id
+
+    def _put_deck_row(self, owner: str, deck_id: str, name: str, card_count: int, content_id: str,
+                      progress: Dict[str, float] = None):
+        """Writes a deck row that refers to its stored card list."""
+        data = _encode({
+            "name": name,
+            "deck_id": deck_id,
+            "content": content_id,
+            "card_count": card_count,
+            "progress": progress if progress is not None else {"correct": 0, "total": 0}
+        })
+        self._conn.execute(
+            "INSERT OR REPLACE INTO decks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (owner, deck_id, name, card_count, hashlib.sha256(data.encode('utf-8')).hexdigest(), data,
+             time.time_ns(), content_id)
+        )
+
+    def _put_deck(self, owner: str, deck: Deck) -> str:
+        content_id = self._put_content(encode_cards(deck.cards).decode('utf-8'))
+        self._put_deck_row(owner, deck.deck_id, deck.name, len(deck.cards), content_id, deck.progress)
+        return content_id
+
+    def _put_reference(self, owner: str, deck_id: str, name: str, card_count: int, public_ref: str,
+                       overlay: Dict[str, Any] = None):
+        """Writes a deck row that refers to a public deck, plus the user's overlay of changes."""
+        data = _encode({"name": name, "deck_id": deck_id, "public_ref": public_ref, "overlay": overlay or {}})
+        self._conn.execute(
+            "INSERT OR REPLACE INTO decks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (owner, deck_id, name, card_count, hashlib.sha256(data.encode('utf-8')).hexdigest(), data,
+             time.time_ns(), None)
+        )
+
+    def _load_shared_cards(self, content_id: str) -> Sequence:
+        """Returns the parsed card list that every deck with these cards shares, for read-only use."""
+        with self._lock:
+            cards = self._shared_cards.get(content_id)
+            if cards is not None:
+                self._shared_cards.move_to_end(content_id)
+                return cards
+            row = self._conn.execute("SELECT cards FROM contents WHERE content_id = ?", (content_id,)).fetchone()
+        if row is None:
+            raise DeckLoadError(content_id)
+        cards = Deck.from_dict({"cards": json.loads(row[0])}, lazy=True).cards
+        with self._lock:
+            # Stored card lists never change, so a parsed copy stays valid
+            self._shared_cards[content_id] = cards
+            while len(self._shared_cards) > SHARED_CARDS_CACHE_SIZE:
+                self._shared_cards.popitem(last=False)
+        return cards
+
+    def _deck_from_data(self, deck_data: Dict[str, Any], lazy: bool = False) -> Deck:
+        """Builds a deck from its row data, resolving the card list or public deck it refers to."""
+        if "public_ref" in deck_data:
+            # The public deck's card list is shared with every other importer unless the overlay adds cards
+            shared = self.load_public_deck(deck_data["public_ref"])
+            overlay = deck_data.get("overlay", {})
+            cards = shared.cards
+            if overlay.get("added_cards"):
+                cards = list(shared.cards) + [Card.from_dict(card) for card in overlay["added_cards"]]
+            return Deck(
+                name=overlay.get("name", shared.name),
+                deck_id=deck_data.get("deck_id", shared.deck_id),
+                cards=cards
+            )
+        if "content" in deck_data:
+            return Deck(
+                name=deck_data.get("name"),
+                deck_id=deck_data.get("deck_id"),
+                cards=CopyOnWriteCards(self._load_shared_cards(deck_data["content"])),
+                progress=dict(deck_data.get("progress", {"correct": 0, "total": 0}))
+            )
+        return Deck.from_dict(deck_data, lazy=lazy)
+
+    def save_deck_to_private(self, username: str, deck: Deck):
+        """Saves a deck as a private deck for a specific user, with empty progress."""
+        with self._lock, self._conn:
+            self._put_deck(username, deck)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?)",
+                (username, deck.deck_id, _encode({"correct": 0, "total": 0}))
+            )
+
+    def import_public_deck(self, username: str, deck: Deck):
+        """
+        Imports a public deck for a user. Instead of copying the cards, the user's row
+        refers to the public deck, with an empty overlay for the user's own changes.
+        """
+        with self._lock, self._conn:
+            self._put_reference(username, deck.deck_id, deck.name, len(deck.cards), deck.deck_id)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?)",
+                (username, deck.deck_id, _encode({"correct": 0, "total": 0}))
+            )
+        print(f"Public deck '{deck.name}' imported for user '{username}'.")
+
+    def save_deck_stream(self, username: Optional[str], deck_id: str, name: str, cards: Iterable[Card],
+                         batch_size: int = 1000) -> int:
+        """Writes a deck from a card iterator, encoding the cards in batches."""
+        buffer = io.StringIO()
+        buffer.write("[")
+        card_count = 0
+        iterator = iter(cards)
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            buffer.write(("," if card_count else "") + encode_card_batch(batch))
+            card_count += len(batch)
+        buffer.write("]")
+
+        owner = PUBLIC_OWNER if username is None else username
+        with self._lock, self._conn:
+            content_id = self._put_content(buffer.getvalue())
+            self._put_deck_row(owner, deck_id, name, card_count, content_id)
+            if username is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO progress VALUES (?, ?, ?)",
+                    (username, deck_id, _encode({"correct": 0, "total": 0}))
+                )
+        return card_count
+
+    def save_deck_to_public(self, deck: Deck) -> Optional[str]:
+        """
+        Saves a deck as a public deck. Returns the ID of an existing public deck
+        with exactly the same cards, or None. The cards are only stored once.
+        """
+        with self._lock, self._conn:
+            content_id = self._put_deck(PUBLIC_OWNER, deck)
+            row = self._conn.execute(
+                "SELECT deck_id FROM decks WHERE owner = ? AND content_id = ? AND deck_id != ? LIMIT 1",
+                (PUBLIC_OWNER, content_id, deck.deck_id)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def collect_unused_content(self, grace_seconds: float = None) -> Tuple[int, int]:
+        """
+        Removes stored card lists that no deck refers to. Returns the number removed
+        and the bytes freed. Decks and their card lists are written in one transaction,
+        so no grace period is needed.
+        """
+        unused = "FROM contents WHERE content_id NOT IN (SELECT content_id FROM decks WHERE content_id IS NOT NULL)"
+        with self._lock, self._conn:
+            removed, freed = self._conn.execute(f"SELECT count(*), coalesce(sum(length(CAST(cards AS BLOB))), 0) {unused}").fetchone()
+            self._conn.execute(f"DELETE {unused}")
+        return removed, freed
+
+    def load_all_user_decks(self, user: Dict[str, Any]) -> Dict[str, Deck]:
+        """Loads all decks owned by a specific user, together with their progress."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT d.deck_id, d.data, p.data FROM decks d "
+                "LEFT JOIN progress p ON p.owner = d.owner AND p.deck_id = d.deck_id "
+                "WHERE d.owner = ?",
+                (user['username'],)
+            ).fetchall()
+        decks = {}
+        for deck_id, deck_data, progress_data in rows:
+            try:
+                deck = self._deck_from_data(json.loads(deck_data), lazy=True)
+                deck.progress = json.loads(progress_data) if progress_data else {"correct": 0.0, "total": 0.0}
+                decks[deck_id] = deck
+            except Exception as e:
+                print(f"Error loading deck {deck_id}: {e}")
+        return decks
+
+    def load_all_public_decks(self) -> Dict[str, Deck]:
+        """Loads all public decks."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT deck_id, data FROM decks WHERE owner = ?", (PUBLIC_OWNER,)
+            ).fetchall()
+        decks = {}
+        for deck_id, deck_data in rows:
+            try:
+                decks[deck_id] = self._deck_from_data(json.loads(deck_data))
+            except Exception as e:
+                print(f"Error loading public deck {deck_id}: {e}")
+        return decks
+
+    def load_user_deck(self, username: str, deck_id: str) -> Deck:
+        """Loads a single private deck of a user by its ID."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM decks WHERE owner = ? AND deck_id = ?", (username, deck_id)
+            ).fetchone()
+        if row is None:
+            raise DeckLoadError(deck_id)
+        return self._deck_from_data(json.loads(row[0]), lazy=True)
+
+    def load_public_deck(self, deck_id: str) -> Deck:
+        """Loads a single public deck by its ID."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM decks WHERE owner = ? AND deck_id = ?", (PUBLIC_OWNER, deck_id)
+            ).fetchone()
+        if row is None:
+            raise DeckLoadError(deck_id)
+        return self._deck_from_data(json.loads(row[0]))
+
+    def load_public_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """Lists public decks without decoding their cards."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT deck_id, name, card_count, length(data), updated_ns, content_hash, content_id "
+                "FROM decks WHERE owner = ?", (PUBLIC_OWNER,)
+            ).fetchall()
+        return {
+            deck_id: {"deck_id": deck_id, "name": name, "card_count": card_count,
+                      "size": size, "mtime": mtime, "hash": content_hash, "content": content_id}
+            for deck_id, name, card_count, size, mtime, content_hash, content_id in rows
+        }
+
+    def sync_public_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """The catalog is a query over the decks table, so it is always in sync."""
+        return self.load_public_catalog()
+
+    def load_progress(self, username: str, deck_id: str) -> Dict[str, float]:
+        """Loads the progress for a user on a specific deck."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM progress WHERE owner = ? AND deck_id = ?", (username, deck_id)
+            ).fetchone()
+        if row is None:
+            return {"correct": 0.0, "total": 0.0}
+        return json.loads(row[0])
+
+    def save_progress(self, username: str, deck_id: str, progress: Dict[str, float]):
+        """Saves the progress for a user on a specific deck."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO progress VALUES (?, ?, ?)",
+                (username, deck_id, _encode(progress))
+            )
+
+    def all_progress(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Returns the progress of every user on every deck."""
+        with self._lock:
+            rows = self._conn.execute("SELECT owner, deck_id, data FROM progress").fetchall()
+        progress = {}
+        for owner, deck_id, data in rows:
+            progress.setdefault(owner, {})[deck_id] = json.loads(data)
+        return progress
+
+    def load_schedule(self, username: str, deck_id: str) -> Dict[str, List[float]]:
+        """Loads a user's spaced repetition state for a deck."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM schedules WHERE owner = ? AND deck_id = ?", (username, deck_id)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else {}
+
+    def save_schedule(self, username: str, deck_id: str, schedule: Dict[str, List[float]]):
+        """Saves a user's spaced repetition state for a deck."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO schedules VALUES (?, ?, ?)",
+                (username, deck_id, _encode(schedule))
+            )
+
+    def is_migrated(self) -> bool:
+        """Returns True once the JSON data tree has been imported."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+        return row is not None
+
+    def migrate_json_tree(self, private_dir: str, public_dir: str, progress_dir: str) -> int:
+        """
+        Imports the existing JSON deck and progress files in one transaction.
+        Returns the number of decks imported. Unreadable files are reported and skipped.
+        """
+        deck_files = []
+        if os.path.isdir(public_dir):
+            deck_files += [(PUBLIC_OWNER, entry.path) for entry in os.scandir(public_dir)]
+        if os.path.isdir(private_dir):
+            for user_entry in os.scandir(private_dir):
+                if user_entry.is_dir():
+                    deck_files += [(name_from_path(user_entry.name), entry.path) for entry in os.scandir(user_entry.path)]
+
+        imported = 0
+        with self._lock, self._conn:
+            for owner, path in deck_files:
+                if not path.endswith('.json'):
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        deck_data = json.load(f)
+                    if "public_ref" in deck_data:
+                        # References stay references, the public decks are imported too
+                        card_count = len(_expand_public_reference(deck_data, public_dir)["cards"])
+                        self._put_reference(owner, deck_data.get("deck_id"), deck_data.get("name"), card_count,
+                                            deck_data["public_ref"], deck_data.get("overlay"))
+                    else:
+                        self._put_deck(owner, Deck.from_dict(_expand_content(deck_data, public_dir)))
+                    imported += 1
+                except Exception as e:
+                    print(f"Error migrating deck {path}: {e}")
+
+            if os.path.isdir(progress_dir):
+                for user_entry in os.scandir(progress_dir):
+                    if not user_entry.is_dir():
+                        continue
+                    for deck_id, progress in ProgressJournal(user_entry.path).all_progress().items():
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO progress VALUES (?, ?, ?)",
+                            (name_from_path(user_entry.name), deck_id, _encode(progress))
+                        )
+                    for entry in os.scandir(user_entry.path):
+                        if not entry.name.endswith('.schedule'):
+                            continue
+                        try:
+                            with open(entry.path, 'r') as f:
+                                schedule = json.load(f)
+                        except (OSError, ValueError) as e:
+                            print(f"Error migrating schedule {entry.path}: {e}")
+                            continue
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO schedules VALUES (?, ?, ?)",
+                            (name_from_path(user_entry.name), name_from_path(entry.name[:-len('.schedule')]),
+                             _encode(schedule))
+                        )
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('migrated_from', ?)", (os.path.dirname(progress_dir),)
+            )
+        return imported
@@ -0,0 +1,48 @@
+"""
+Timing of the GUI's startup phases, reported by `python src/main.py --profile-startup`.
+
+Phases on the Tk thread are marked as they end, so each one is timed from
+the end of the previous one, and together they add up to the time until
+the login screen is painted. Work that runs in the background meanwhile is
+recorded separately, with its own duration.
+"""
+
+import threading
+import time
+from typing import List, Tuple
+
+class StartupProfiler:
+    """The phases of one startup, timed from start, a time.perf_counter() value."""
+    def __init__(self, start: float = None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self._lock = threading.Lock()
+        self.phases: List[Tuple[str, float]] = []
+        self.background: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """Ends a foreground phase, timed from the end of the previous one."""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append((phase, now - self._last))
+            self._last = now
+
+    def record(self, phase: str, seconds: float):
+        """Records a phase that ran in the background, from any thread."""
+        with self._lock:
+            self.background.append((phase, seconds))
+
+    def time_to_interactive(self) -> float:
+        """Returns the seconds from the start to the end of the last foreground phase."""
+        return self._last - self.start
+
+    def report(self) -> str:
+        """Returns a table of the phases in milliseconds."""
+        with self._lock:
+            rows = [(phase, seconds) for phase, seconds in self.phases]
+            rows.append(("time to interactive", self.time_to_interactive()))
+            rows += [(f"{phase} (background)", seconds) for phase, seconds in self.background]
+        width = max(len(phase) for phase, _ in rows)
+        lines = ["Startup profile:"]
+        lines += [f"  {phase:<{width}}  {seconds * 1000:8.1f} ms" for phase, seconds in rows]
+        return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+Streaming importer for the plain-text deck format described in deck_import_guide.txt:
+
+    Q: What is the capital of France?
+    A: Paris
+    H: It is a city known for the Eiffel Tower.
+
+Cards are separated by blank lines and the hint is optional. Files are read
+line by line, and cards are written to storage and added to the due index in
+batches, so the importer only holds one batch of cards at a time no matter
+how large the file is.
+
+Headless usage:
+    python src/text_import.py my_deck.txt --user alice
+"""
+
+import argparse
+import os
+import sys
+import uuid
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+import persistence
+from exceptions import CardError, DeckFormatError
+from models import Card, card_key
+
+# Number of cards encoded and written to storage at a time
+IMPORT_BATCH_SIZE = 5000
+
+def _report(on_error: Optional[Callable[[DeckFormatError], None]], error: DeckFormatError):
+    """Raises the error, or hands it to the caller's error handler."""
+    if on_error is None:
+        raise error
+    on_error(error)
+
+def _make_card(source: str, start: int, front: Optional[str], back: Optional[str], hint: Optional[str]) -> Card:
+    """Builds the card for a finished block, or raises DeckFormatError."""
+    if back is None:
+        raise DeckFormatError(source, start, "Card is missing an 'A:' line")
+    try:
+        return Card(front, back, hint)
+    except CardError:
+        raise DeckFormatError(source, start, "Card has an empty question or answer")
+
+def iter_text_cards(lines: Iterable[str], source: str = "<text>",
+                    on_error: Callable[[DeckFormatError], None] = None) -> Iterator[Card]:
+    """
+    Yields a Card for every block in a Q:/A:/H: text deck.
+    Malformed blocks raise DeckFormatError with the offending line number, or,
+    when on_error is given, are passed to it and skipped.
+    """
+    front = back = hint = None
+    start = 0
+    skipping = False
+
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        tag = line[:2]
+
+        if not line or tag == "Q:":
+            # A blank line or a new question finishes the current block
+            if front is not None and not skipping:
+                try:
+                    yield _make_card(source, start, front, back, hint)
+                except DeckFormatError as e:
+                    _report(on_error, e)
+            front = back = hint = None
+            skipping = False
+            if not line:
+                continue
+            front = line[2:].strip()
+            start = line_number
+        elif skipping:
+            continue
+        elif tag == "A:" and front is not None and back is None:
+            back = line[2:].strip()
+        elif tag == "H:" and back is not None and hint is None:
+            hint = line[2:].strip()
+        else:
+            # Skip the rest of the block so one mistake is reported only once
+            skipping = True
+            _report(on_error, DeckFormatError(source, line_number, f"Unexpected line {line[:30]!r}"))
+
+    if front is not None and not skipping:
+        try:
+            yield _make_card(source, start, front, back, hint)
+        except DeckFormatError as e:
+            _report(on_error, e)
+
+def import_text_deck(file_path: str, username: Optional[str], deck_name: str = None,
+                     on_error: Callable[[DeckFormatError], None] = None,
+                     batch_size: int = IMPORT_BATCH_SIZE) -> Tuple[str, int]:
+    """
+    Imports a text deck file as a new deck, private to username or public when
+    username is None. The deck name defaults to the file name.
+    Returns the new deck ID and the number of cards imported.
+    """
+    source = os.path.basename(file_path)
+    deck_name = deck_name or os.path.splitext(source)[0]
+    deck_id = str(uuid.uuid4())
+
+    def index_batches(cards: Iterable[Card]) -> Iterator[Card]:
+        # New cards are due immediately, index them in batches as they stream past
+        keys = []
+        for card in cards:
+            keys.append(card_key(card))
+            if len(keys) >= batch_size:
+                persistence.extend_due_index(username, deck_id, keys)
+                keys = []
+            yield card
+        if keys:
+            persistence.extend_due_index(username, deck_id, keys)
+
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        cards = iter_text_cards(f, source=source, on_error=on_error)
+        if username is None:
+            return deck_id, persistence.save_deck_stream(None, deck_id, deck_name, cards, batch_size=batch_size)
+        try:
+            card_count = persistence.save_deck_stream(username, deck_id, deck_name, index_batches(cards),
+                                                      batch_size=batch_size)
+        except BaseException:
+            # The deck was never saved, drop the batches already indexed
+            persistence.update_due_index(username, deck_id, [], schedule={})
+            raise
+    return deck_id, card_count
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import a Q:/A:/H: text deck file.")
+    parser.add_argument("file", help="path to the .txt deck file")
+    owner = parser.add_mutually_exclusive_group(required=True)
+    owner.add_argument("--user", help="import as a private deck of this user")
+    owner.add_argument("--public", action="store_true", help="import as a public deck")
+    parser.add_argument("--name", help="deck name (defaults to the file name)")
+    parser.add_argument("--strict", action="store_true", help="stop at the first malformed block")
+    args = parser.parse_args(argv)
+
+    def print_error(error: DeckFormatError):
+        print(error.message, file=sys.stderr)
+
+    try:
+        deck_id, card_count = import_text_deck(args.file, None if args.public else args.user, args.name,
+                                               on_error=None if args.strict else print_error)
+    except (OSError, DeckFormatError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {card_count} cards into deck {deck_id}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
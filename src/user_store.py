@@ -0,0 +1,149 @@
+"""
+User accounts stored one file per user, in directories sharded by hash.
+
+A user's record lives at <root>/<h[:2]>/<h>.json, where h is the SHA-256 of
+the username, so looking up, creating or updating an account only touches
+that user's file. New accounts are written to a temporary file and linked
+into place, which fails if the name is already taken, so two registrations
+can never overwrite each other. Updates replace the file atomically.
+
+The first time an account is written, the accounts of the old monolithic
+users.json are copied in, and the file is renamed to users.json.migrated-backup
+so it cannot be mistaken for the live accounts. Until then, lookups fall back
+to it, so opening the store and reading from it write nothing.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from file_lock import file_lock
+
+MIGRATION_MARKER = ".migrated"
+MIGRATION_LOCK = ".migrate.lock"
+LEGACY_BACKUP_SUFFIX = ".migrated-backup"
+
+class UserStore:
+    """The user accounts stored under root."""
+    def __init__(self, root: str, legacy_file: str = None):
+        self.root = root
+        self.legacy_file = legacy_file
+        self._migrated = legacy_file is None
+        self._migrate_lock = threading.Lock()
+
+    def _is_migrated(self) -> bool:
+        if not self._migrated:
+            self._migrated = os.path.exists(os.path.join(self.root, MIGRATION_MARKER))
+        return self._migrated
+
+    def _ensure_migrated(self):
+        """Migrates the legacy file before the first write."""
+        with self._migrate_lock:
+            if not self._is_migrated():
+                # Another process may be migrating the same file; the marker is checked again under the lock
+                with file_lock(os.path.join(self.root, MIGRATION_LOCK)):
+                    if not self._is_migrated():
+                        self._migrate(self.legacy_file)
+                self._migrated = True
+
+    def _legacy_record(self, username: str) -> Optional[Dict[str, Any]]:
+        """Looks a user up in the legacy file, while it has not been migrated."""
+        if self._is_migrated():
+            return None
+        try:
+            with open(self.legacy_file, 'r') as f:
+                record = json.load(f).get(username)
+        except (OSError, ValueError):
+            return None
+        return dict(record) if record is not None else None
+
+    def _path(self, username: str) -> str:
+        digest = hashlib.sha256(username.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.json")
+
+    def _write_tmp(self, path: str, record: Dict[str, Any]) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp_path
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Returns the record of a user, or None if there is no such user."""
+        try:
+            with open(self._path(username), 'r') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return self._legacy_record(username)
+        record.pop("username", None)
+        return record
+
+    def __contains__(self, username: str) -> bool:
+        return os.path.exists(self._path(username)) or self._legacy_record(username) is not None
+
+    def create(self, username: str, record: Dict[str, Any]) -> bool:
+        """Stores a new user. Returns False, changing nothing, if the username is taken."""
+        self._ensure_migrated()
+        return self._create(username, record)
+
+    def _create(self, username: str, record: Dict[str, Any]) -> bool:
+        path = self._path(username)
+        tmp_path = self._write_tmp(path, dict(record, username=username))
+        try:
+            # Linking never replaces an existing file, unlike a rename
+            os.link(tmp_path, path)
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(tmp_path)
+        return True
+
+    def update(self, username: str, record: Dict[str, Any]):
+        """Replaces the record of an existing user."""
+        self._ensure_migrated()
+        path = self._path(username)
+        os.replace(self._write_tmp(path, dict(record, username=username)), path)
+
+    def usernames(self) -> Iterator[str]:
+        """Yields every username, in no particular order. Reads every account."""
+        stored = set()
+        if os.path.isdir(self.root):
+            for shard in os.scandir(self.root):
+                if shard.is_dir():
+                    for entry in os.scandir(shard.path):
+                        if entry.name.endswith('.json'):
+                            with open(entry.path, 'r') as f:
+                                stored.add(json.load(f)["username"])
+        yield from stored
+        if not self._is_migrated():
+            try:
+                with open(self.legacy_file, 'r') as f:
+                    legacy_users = json.load(f)
+            except (OSError, ValueError):
+                legacy_users = {}
+            yield from (username for username in legacy_users if username not in stored)
+
+    def _migrate(self, legacy_file: str):
+        """Copies the accounts of a users.json file into the store, once, then renames the file."""
+        try:
+            with open(legacy_file, 'r') as f:
+                legacy_users = json.load(f)
+        except FileNotFoundError:
+            legacy_users = {}
+        os.makedirs(self.root, exist_ok=True)
+        for username, record in legacy_users.items():
+            # Accounts created since an interrupted migration are kept
+            self._create(username, record)
+        with open(os.path.join(self.root, MIGRATION_MARKER), 'w') as f:
+            f.write(f"{len(legacy_users)}\n")
+        if legacy_users:
+            # Kept as a backup; the store no longer reads it once the marker exists
+            try:
+                os.replace(legacy_file, legacy_file + LEGACY_BACKUP_SUFFIX)
+            except FileNotFoundError:
+                # Without fcntl, another process may have renamed it already
+                pass
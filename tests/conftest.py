@@ -0,0 +1,44 @@
+import sys
+import os
+
+import pytest
+
+# The modules import each other by bare name, and so do the tests
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import auth
+import persistence
+from models import Card, Deck
+
+# Cheap enough for tests, which hash many passwords
+TEST_KDF_PARAMS = {"algorithm": "pbkdf2_sha256", "iterations": 1000}
+
+
+def make_cards(count):
+    """Returns the cards Q0/A0, Q1/A1, ..."""
+    return [Card(f"Q{i}", f"A{i}") for i in range(count)]
+
+
+def make_deck(name="Test Deck", deck_id="deck_123", count=2):
+    """Returns a deck of the cards Q0/A0/H0, Q1/A1/H1, ..."""
+    deck = Deck(name, deck_id)
+    for i in range(count):
+        deck.add_card(Card(f"Q{i}", f"A{i}", f"H{i}"))
+    return deck
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Points storage and accounts at a temporary data directory."""
+    monkeypatch.setattr(persistence, "PRIVATE_DECKS_DIR", str(tmp_path / "decks" / "private"))
+    monkeypatch.setattr(persistence, "PUBLIC_DECKS_DIR", str(tmp_path / "decks" / "public"))
+    monkeypatch.setattr(persistence, "USER_PROGRESS_DIR", str(tmp_path / "progress"))
+    monkeypatch.setattr(persistence, "PUBLIC_CATALOG_PATH", str(tmp_path / "decks" / "public_catalog.json"))
+    persistence.ensure_deck_storage()
+
+    monkeypatch.setattr(auth, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(auth, "USERS_FILE", str(tmp_path / "users.json"))
+    monkeypatch.setattr(auth, "USERS_DIR", str(tmp_path / "users"))
+    monkeypatch.setattr(auth, "_kdf_params", dict(TEST_KDF_PARAMS))
+    monkeypatch.setattr(auth, "_verified", {})
+    return tmp_path
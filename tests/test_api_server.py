@@ -0,0 +1,218 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import api_load
+import api_server
+import auth
+import persistence
+
+
+@pytest.fixture
+def data_dir(data_dir):
+    """Adds one public deck to the temporary data directory."""
+    deck = api_server.Deck("Capitals", "capitals")
+    deck.add_card(persistence.Card("Capital of France?", "Paris"))
+    deck.add_card(persistence.Card("Capital of Italy?", "Rome"))
+    persistence.save_deck_to_public(deck)
+    return data_dir
+
+
+def run_with_server(scenario):
+    """Runs scenario(port) against a server listening on a free local port."""
+    async def main():
+        server = api_server.FlashcardServer(io_workers=4)
+        listener = await server.start("127.0.0.1", 0)
+        try:
+            return await scenario(listener.sockets[0].getsockname()[1])
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    return asyncio.run(main())
+
+
+async def logged_in_client(port, username="alice"):
+    client = api_load.ApiClient("127.0.0.1", port)
+    await client.login(username, "secret")
+    return client
+
+
+def test_quiz_flow_over_http(data_dir):
+    """Test registering, importing a public deck, answering and saving progress."""
+    async def scenario(port):
+        client = await logged_in_client(port)
+        status, catalog = await client.request("GET", "/public")
+        assert status == 200 and [entry["deck_id"] for entry in catalog] == ["capitals"]
+        assert (await client.request("POST", "/public/capitals/import"))[0] == 200
+
+        status, deck = await client.request("GET", "/decks/capitals")
+        assert status == 200
+        assert [card["back"] for card in deck["cards"]] == ["Paris", "Rome"]
+        _, result = await client.request("POST", "/decks/capitals/answer", {"card": 0, "answer": "paris"})
+        assert result == {"correct": True, "answer": "Paris"}
+        _, result = await client.request("POST", "/decks/capitals/answer", {"card": 1, "answer": "Milan"})
+        assert result["correct"] is False
+
+        assert (await client.request("POST", "/decks/capitals/progress", {"correct": 1, "total": 2}))[0] == 200
+        _, decks = await client.request("GET", "/decks")
+        assert decks == [{"deck_id": "capitals", "name": "Capitals", "card_count": 2,
+                          "progress": {"correct": 1.0, "total": 2.0}}]
+        _, summary = await client.request("GET", "/progress")
+        assert (summary["correct"], summary["total"]) == (1.0, 2.0)
+        client.close()
+
+    run_with_server(scenario)
+
+
+def test_errors_have_status_codes(data_dir):
+    """Test that bad requests are answered with a status code and an error message."""
+    async def scenario(port):
+        anonymous = api_load.ApiClient("127.0.0.1", port)
+        assert (await anonymous.request("GET", "/decks"))[0] == 401
+        assert (await anonymous.request("POST", "/login", {"username": "nobody", "password": "x"}))[0] == 401
+        assert (await anonymous.request("GET", "/nowhere"))[0] == 404
+        assert (await anonymous.request("DELETE", "/public"))[0] == 405
+        assert (await anonymous.request("GET", "/public/missing"))[0] == 404
+        anonymous.close()
+
+        client = await logged_in_client(port)
+        status, body = await client.request("POST", "/decks/capitals/progress", {"correct": 1})
+        assert status == 400 and "total" in body["error"]
+        assert (await client.request("POST", "/decks/capitals/answer", {"card": 0, "answer": "x"}))[0] == 404
+        client.close()
+
+    run_with_server(scenario)
+
+
+def test_unsafe_names_are_rejected(data_dir):
+    """Test that new usernames must be plain file names and other deck IDs stay inside the user's directories."""
+    async def scenario(port):
+        anonymous = api_load.ApiClient("127.0.0.1", port)
+        for username in ("../../../../tmp/evil_fc", ".hidden", "a/b", "x" * 65, 42, ["alice"]):
+            status, body = await anonymous.request("POST", "/register",
+                                                   {"username": username, "password": "pw", "hint": "h"})
+            assert status == 400, (username, body)
+        assert (await anonymous.request("POST", "/login", {"username": 42, "password": "pw"}))[0] == 401
+        anonymous.close()
+
+        client = await logged_in_client(port)
+        assert (await client.request("GET", "/decks/..%2F..%2Fusers"))[0] == 404
+        assert (await client.request("GET", "/decks/.."))[0] == 404
+        assert (await client.request("POST", "/decks/../progress", {"correct": 1, "total": 1}))[0] == 200
+        assert (await client.request("GET", "/decks/.."))[0] == 404
+        client.close()
+
+    run_with_server(scenario)
+    persistence.flush_progress()
+    assert sorted(os.listdir(data_dir)) == ["decks", "progress", "users"]
+    assert sorted(os.listdir(data_dir / "progress")) == ["alice", "progress.summary", "progress.summary.lock"]
+    assert persistence.load_progress("alice", "..") == {"correct": 1, "total": 1}
+
+
+def test_expired_sessions_and_idle_progress_locks_are_dropped(data_dir, monkeypatch):
+    """Test that the server does not keep state for expired logins or finished progress writes."""
+    server = api_server.FlashcardServer(io_workers=1)
+    server._sessions["old"] = ("alice", time.monotonic() - 1)
+
+    async def scenario():
+        auth.register_user(server.users, "alice", "secret", "hint")
+        await server.login(api_server.Request("POST", "/login", {}, {}, b'{"username": "alice", "password": "secret"}'))
+        request = api_server.Request("POST", "/decks/capitals/progress", {}, {}, b'{"correct": 1, "total": 1}')
+        request.username = "alice"
+        await server.save_progress(request, "capitals")
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.close()
+    assert "old" not in server._sessions and len(server._sessions) == 1
+    assert server._progress_locks == {}
+
+
+def test_concurrent_public_deck_requests_are_coalesced(data_dir, monkeypatch):
+    """Test that a hot public deck is loaded once for all the requests waiting on it."""
+    loads = []
+    load_public_deck = persistence.load_public_deck
+
+    def slow_load(deck_id):
+        loads.append(deck_id)
+        time.sleep(0.2)
+        return load_public_deck(deck_id)
+
+    monkeypatch.setattr(persistence, "load_public_deck", slow_load)
+
+    async def scenario(port):
+        clients = [api_load.ApiClient("127.0.0.1", port) for _ in range(8)]
+        responses = await asyncio.gather(*(client.request("GET", "/public/capitals") for client in clients))
+        for client in clients:
+            client.close()
+        return responses
+
+    responses = run_with_server(scenario)
+    assert loads == ["capitals"]
+    assert all(status == 200 and body["name"] == "Capitals" for status, body in responses)
+
+
+def test_progress_writes_of_a_user_do_not_overlap(data_dir, monkeypatch):
+    """Test that one user's progress writes run one at a time, ending with the last one sent."""
+    active = []
+    overlapped = []
+    written = []
+    save_progress = persistence.save_progress
+    lock = threading.Lock()
+
+    def slow_save(username, deck_id, progress):
+        with lock:
+            active.append(username)
+            overlapped.append(active.count(username) > 1)
+        time.sleep(0.01)
+        written.append(progress["total"])
+        save_progress(username, deck_id, progress)
+        with lock:
+            active.remove(username)
+
+    monkeypatch.setattr(persistence, "save_progress", slow_save)
+
+    async def scenario(port):
+        client = await logged_in_client(port)
+        await client.request("POST", "/public/capitals/import")
+        clients = [api_load.ApiClient("127.0.0.1", port) for _ in range(10)]
+        for other in clients:
+            other.token = client.token
+        for total in range(1, 11):
+            # Each request is sent before the next one, over its own connection
+            await asyncio.sleep(0.005)
+            asyncio.ensure_future(clients[total - 1].request("POST", "/decks/capitals/progress",
+                                                             {"correct": 0, "total": total}))
+        deadline = time.monotonic() + 10
+        while len(written) < 11 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        _, deck = await client.request("GET", "/decks/capitals")
+        for other in clients + [client]:
+            other.close()
+        return deck
+
+    deck = run_with_server(scenario)
+    assert not any(overlapped)
+    assert written[1:] == list(range(1, 11))
+    assert deck["progress"]["total"] == 10
+
+
+def test_load_generator_reports_request_rate(data_dir):
+    """Test that the load generator runs its request mix without errors."""
+    async def scenario(port):
+        return await api_load.run_load("127.0.0.1", port, clients=4, duration=0.5)
+
+    result = run_with_server(scenario)
+    assert result["requests"] > 0
+    assert result["errors"] == 0
+    assert result["requests_per_second"] > 0
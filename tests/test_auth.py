@@ -0,0 +1,209 @@
+import sys
+import os
+import json
+import hashlib
+import threading
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import auth
+import password_hash
+from user_store import UserStore
+
+# Cheap enough for tests, which hash many passwords
+TEST_KDF_PARAMS = {"algorithm": "pbkdf2_sha256", "iterations": 1000}
+
+
+@pytest.fixture(autouse=True)
+def cheap_kdf(monkeypatch):
+    """Uses a low hashing cost and an empty verification cache."""
+    monkeypatch.setattr(auth, "_kdf_params", dict(TEST_KDF_PARAMS))
+    monkeypatch.setattr(auth, "_verified", {})
+
+
+@pytest.fixture
+def users(tmp_path, monkeypatch):
+    """Opens a user store in a temporary data directory."""
+    monkeypatch.setattr(auth, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(auth, "USERS_FILE", str(tmp_path / "users.json"))
+    monkeypatch.setattr(auth, "USERS_DIR", str(tmp_path / "users"))
+    return auth.load_users()
+
+
+def test_register_login_and_hint(users):
+    """Test that a registered user can log in and read their hint."""
+    assert auth.register_user(users, "alice", "secret", "pet name") == {"username": "alice"}
+    assert auth.login_user(users, "alice", "secret") == {"username": "alice"}
+    assert auth.get_password_hint(users, "alice") == "pet name"
+    assert auth.get_password_hint(users, "bob") == "User not found."
+    with pytest.raises(Exception):
+        auth.login_user(users, "alice", "wrong")
+    with pytest.raises(Exception):
+        auth.login_user(users, "bob", "secret")
+
+
+def test_register_existing_user_fails(users, monkeypatch):
+    """Test that a username can only be registered once, keeping the first account, without hashing again."""
+    auth.register_user(users, "alice", "secret", "hint")
+    hash_password = auth._hash_password
+    hashed = []
+    monkeypatch.setattr(auth, "_hash_password", hashed.append)
+    with pytest.raises(Exception):
+        auth.register_user(users, "alice", "other", "hint")
+    assert hashed == []
+    monkeypatch.setattr(auth, "_hash_password", hash_password)
+    assert auth.login_user(users, "alice", "secret") == {"username": "alice"}
+
+
+def test_concurrent_registrations_are_all_kept(users, tmp_path):
+    """Test that registrations racing each other neither lose accounts nor double-register."""
+    winners = []
+
+    def register(name: str):
+        try:
+            auth.register_user(users, name, "pw", "hint")
+            winners.append(name)
+        except Exception:
+            pass
+
+    threads = [threading.Thread(target=register, args=(f"user{i % 20}",)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(winners) == sorted(f"user{i}" for i in range(20))
+    reopened = UserStore(str(tmp_path / "users"))
+    assert sorted(reopened.usernames()) == sorted(winners)
+
+
+def test_legacy_users_file_is_migrated(tmp_path, monkeypatch):
+    """Test that accounts from users.json are available after the store is first opened."""
+    with open(tmp_path / "users.json", "w") as f:
+        json.dump({"carol": {"password": hashlib.sha256(b"pw").hexdigest(), "hint": "old"}}, f)
+    monkeypatch.setattr(auth, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(auth, "USERS_FILE", str(tmp_path / "users.json"))
+    monkeypatch.setattr(auth, "USERS_DIR", str(tmp_path / "users"))
+
+    users = auth.load_users()
+    assert auth.login_user(users, "carol", "pw") == {"username": "carol"}
+    auth.register_user(users, "dave", "pw", "new")
+    # The legacy file is moved aside once its accounts are in the store
+    assert not os.path.exists(tmp_path / "users.json")
+    assert os.path.exists(tmp_path / "users.json.migrated-backup")
+    assert sorted(auth.load_users().usernames()) == ["carol", "dave"]
+
+
+def test_password_hashes_are_salted():
+    """Test that the same password hashes differently each time and still verifies."""
+    first = password_hash.hash_password("secret", TEST_KDF_PARAMS)
+    second = password_hash.hash_password("secret", TEST_KDF_PARAMS)
+    assert first != second
+    assert password_hash.verify_password("secret", first, TEST_KDF_PARAMS) == (True, False)
+    assert password_hash.verify_password("wrong", first, TEST_KDF_PARAMS) == (False, False)
+    # A hash made at another cost still verifies, but should be redone
+    assert password_hash.verify_password("secret", first, {"algorithm": "pbkdf2_sha256", "iterations": 2000}) == (True, True)
+
+
+def test_scrypt_hashes_verify():
+    """Test that scrypt hashes verify when this Python provides scrypt."""
+    if not hasattr(hashlib, "scrypt"):
+        pytest.skip("hashlib.scrypt is not available")
+    params = {"algorithm": "scrypt", "n": 2 ** 10, "r": 8, "p": 1}
+    stored = password_hash.hash_password("secret", params)
+    assert stored.startswith("scrypt$1024$8$1$")
+    assert password_hash.verify_password("secret", stored, params) == (True, False)
+    assert password_hash.verify_password("wrong", stored, params)[0] is False
+
+
+def test_legacy_hash_is_upgraded_on_login(users):
+    """Test that an unsalted SHA-256 hash is replaced after the next successful login."""
+    users.create("erin", {"password": hashlib.sha256(b"pw").hexdigest(), "hint": "h"})
+    with pytest.raises(Exception):
+        auth.login_user(users, "erin", "wrong")
+    assert "$" not in users.get("erin")["password"]
+
+    assert auth.login_user(users, "erin", "pw") == {"username": "erin"}
+    upgraded = users.get("erin")
+    assert upgraded["password"].startswith("pbkdf2_sha256$1000$")
+    assert upgraded["hint"] == "h"
+    auth._verified.clear()
+    assert auth.login_user(users, "erin", "pw") == {"username": "erin"}
+
+
+def test_repeated_login_skips_hashing(users, monkeypatch):
+    """Test that a recent successful login is remembered, but only for the same password."""
+    auth.register_user(users, "alice", "secret", "hint")
+    calls = []
+    original = auth.verify_password
+    monkeypatch.setattr(auth, "verify_password", lambda *args: calls.append(args) or original(*args))
+
+    auth.login_user(users, "alice", "secret")
+    auth.login_user(users, "alice", "secret")
+    assert len(calls) == 1
+    with pytest.raises(Exception):
+        auth.login_user(users, "alice", "wrong")
+    assert len(calls) == 2
+
+    monkeypatch.setattr(auth, "VERIFY_CACHE_SECONDS", -1)
+    auth._verified.clear()
+    auth.login_user(users, "alice", "secret")
+    auth.login_user(users, "alice", "secret")
+    assert len(calls) == 4
+
+
+def test_submitted_logins_run_in_the_background(users):
+    """Test that submitted registrations and logins deliver their result or error through a future."""
+    assert auth.submit_registration(users, "alice", "secret", "hint").result(timeout=10) == {"username": "alice"}
+    assert auth.submit_login(users, "alice", "secret").result(timeout=10) == {"username": "alice"}
+    with pytest.raises(Exception):
+        auth.submit_login(users, "alice", "wrong").result(timeout=10)
+
+
+def test_calibration_stays_near_target():
+    """Test that calibration returns usable parameters at or above the minimum cost."""
+    params = password_hash.calibrate(0.001, algorithm="pbkdf2_sha256")
+    assert params == {"algorithm": "pbkdf2_sha256", "iterations": password_hash.MIN_PBKDF2_ITERATIONS}
+    params = password_hash.calibrate(0.2, algorithm="pbkdf2_sha256")
+    assert params["iterations"] >= password_hash.MIN_PBKDF2_ITERATIONS
+    assert password_hash.verify_password("pw", password_hash.hash_password("pw", params), params) == (True, False)
+
+
+def test_migration_rechecks_marker_under_lock(tmp_path, monkeypatch):
+    """Test that a store that saw no marker does not migrate again once another process has."""
+    with open(tmp_path / "users.json", "w") as f:
+        json.dump({"carol": {"password": "x", "hint": "old"}}, f)
+    first = UserStore(str(tmp_path / "users"), str(tmp_path / "users.json"))
+    second = UserStore(str(tmp_path / "users"), str(tmp_path / "users.json"))
+    # The second store checks for the marker before the first one writes it
+    checks = []
+    real_is_migrated = second._is_migrated
+    monkeypatch.setattr(second, "_is_migrated", lambda: bool(checks.append(1) or len(checks) > 1) and real_is_migrated())
+    monkeypatch.setattr(second, "_migrate", lambda legacy_file: pytest.fail("migrated twice"))
+
+    first.update("carol", {"password": "y", "hint": "new"})
+    second.update("carol", {"password": "z", "hint": "newer"})
+    assert os.path.exists(tmp_path / "users.json.migrated-backup")
+    assert UserStore(str(tmp_path / "users"), str(tmp_path / "users.json")).get("carol")["hint"] == "newer"
+
+
+def test_migration_tolerates_legacy_file_renamed_by_another_process(tmp_path, monkeypatch):
+    """Test that a migration whose legacy file was renamed meanwhile still completes."""
+    with open(tmp_path / "users.json", "w") as f:
+        json.dump({"carol": {"password": "x", "hint": "old"}}, f)
+    store = UserStore(str(tmp_path / "users"), str(tmp_path / "users.json"))
+    real_replace = os.replace
+
+    def replace_after_other_process(src, dst):
+        if src.endswith("users.json"):
+            real_replace(src, dst)
+        real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", replace_after_other_process)
+    store.update("carol", {"password": "y", "hint": "new"})
+    monkeypatch.undo()
+    assert os.path.exists(tmp_path / "users.json.migrated-backup")
+    assert UserStore(str(tmp_path / "users"), str(tmp_path / "users.json")).get("carol")["hint"] == "new"
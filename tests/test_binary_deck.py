@@ -0,0 +1,63 @@
+import sys
+import os
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import persistence
+from binary_deck import write_binary_deck, open_binary_deck, read_binary_deck, json_to_binary
+from exceptions import InvalidDeckFileError
+from models import Card, Deck
+
+
+def make_deck_data(count=5):
+    deck = Deck("Binary Deck", "binary_123")
+    for i in range(count):
+        deck.add_card(Card(f"Q{i} ünïcode", f"A{i}", f"H{i}" if i % 2 else None))
+    deck.progress = {"correct": 2, "total": 3}
+    return deck.to_dict()
+
+
+def test_binary_round_trip_is_lossless(tmp_path):
+    """Test that converting a deck to the binary format and back changes nothing."""
+    deck_data = make_deck_data()
+    path = str(tmp_path / "deck.fcdb")
+    write_binary_deck(deck_data, path)
+    assert read_binary_deck(path) == deck_data
+
+
+def test_open_binary_deck_gives_random_access(tmp_path):
+    """Test that single cards and shuffled orders are read from the mapped file."""
+    path = str(tmp_path / "deck.fcdb")
+    write_binary_deck(make_deck_data(count=100), path)
+    deck = open_binary_deck(path)
+    assert deck.name == "Binary Deck"
+    assert len(deck.cards) == 100
+    assert deck.cards[42].front == "Q42 ünïcode"
+    assert deck.cards[-1].back == "A99"
+    assert deck.cards[0].hint == ""
+    shuffled = deck.get_shuffled_cards()
+    assert sorted(card.back for card in shuffled) == sorted(f"A{i}" for i in range(100))
+
+
+def test_persistence_loads_binary_decks(tmp_path, monkeypatch):
+    """Test that .fcdb files are listed next to JSON decks."""
+    monkeypatch.setattr(persistence, "PUBLIC_DECKS_DIR", str(tmp_path / "public"))
+    os.makedirs(persistence.PUBLIC_DECKS_DIR)
+    write_binary_deck(make_deck_data(count=3), os.path.join(persistence.PUBLIC_DECKS_DIR, "binary_123.fcdb"))
+    decks = persistence.load_all_public_decks()
+    assert decks["binary_123"].cards[2].front == "Q2 ünïcode"
+
+
+def test_json_to_binary_reads_stored_card_lists(data_dir):
+    """Test that deck files referring to a stored card list convert with their cards, and others fail."""
+    persistence.save_deck_to_private("alice", Deck.from_dict(make_deck_data(count=4)))
+    binary_path = str(data_dir / "deck.fcdb")
+    json_to_binary(persistence._get_user_deck_path("alice", "binary_123"), binary_path)
+    assert read_binary_deck(binary_path)["cards"] == make_deck_data(count=4)["cards"]
+
+    with pytest.raises(InvalidDeckFileError):
+        write_binary_deck({"name": "Reference", "public_ref": "pub_1"}, binary_path)
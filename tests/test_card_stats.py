@@ -0,0 +1,46 @@
+import sys
+import os
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from card_stats import CardStatsFile
+from models import Card
+from conftest import make_cards
+
+
+def test_card_stats_record_in_place(tmp_path):
+    """Test that answers update one fixed-width record without resizing the file."""
+    path = str(tmp_path / "deck.stats")
+    cards = make_cards(4)
+    stats = CardStatsFile(path, cards)
+    size = os.path.getsize(path)
+    stats.record(cards[1], True, now=10.0)
+    stats.record(cards[1], True, now=20.0)
+    stats.record(cards[1], False, now=30.0)
+    stats.record(cards[3], False, now=40.0)
+    stats.close()
+    assert os.path.getsize(path) == size
+
+    reopened = CardStatsFile(path, cards)
+    assert tuple(reopened.get(cards[1])) == (3, 2, 30.0, -1)
+    assert reopened.get(cards[0]).attempts == 0
+    assert reopened.weakest(cards) == [cards[3], cards[1]]
+    reopened.close()
+
+
+def test_card_stats_follow_cards_after_deck_edits(tmp_path):
+    """Test that counters are carried over by card key when the deck changes."""
+    path = str(tmp_path / "deck.stats")
+    cards = make_cards(4)
+    stats = CardStatsFile(path, cards)
+    stats.record(cards[2], True, now=5.0)
+    stats.close()
+
+    edited = [Card("New", "Card")] + list(reversed(cards[1:]))
+    stats = CardStatsFile(path, edited)
+    assert stats.get(cards[2]) == (1, 1, 5.0, 1)
+    assert stats.get(edited[0]).attempts == 0
+    assert len(stats) == 4
+    stats.close()
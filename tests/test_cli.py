@@ -0,0 +1,162 @@
+import sys
+import os
+import io
+import json
+import subprocess
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import auth
+import cli
+import persistence
+
+DECK_TEXT = """Q: What is the capital of France?
+A: Paris
+H: Eiffel Tower
+
+Q: What is the capital of Italy?
+A: Rome
+"""
+
+
+@pytest.fixture
+def data_dir(data_dir):
+    """Adds one account and a text deck to the temporary data directory."""
+    auth.register_user(auth.load_users(), "alice", "secret", "hint")
+    with open(data_dir / "capitals.txt", "w", encoding="utf-8") as f:
+        f.write(DECK_TEXT)
+    return data_dir
+
+
+def import_capitals(data_dir):
+    assert cli.main(["import", str(data_dir / "capitals.txt"), "--user", "alice"]) == 0
+    (deck_id,) = persistence.load_all_user_decks({"username": "alice"})
+    return deck_id
+
+
+def test_import_and_export_round_trip(data_dir):
+    """Test that an exported deck is the text file it was imported from."""
+    deck_id = import_capitals(data_dir)
+    out = data_dir / "out.txt"
+    assert cli.main(["export", deck_id, "--user", "alice", "-o", str(out)]) == 0
+    assert out.read_text(encoding="utf-8") == DECK_TEXT + "\n"
+
+    assert cli.main(["export", deck_id, "--user", "alice", "--format", "json", "-o", str(out)]) == 0
+    exported = json.loads(out.read_text(encoding="utf-8"))
+    assert exported["name"] == "capitals"
+    assert [card["back"] for card in exported["cards"]] == ["Paris", "Rome"]
+
+
+def test_grade_and_stats(data_dir, capsys):
+    """Test that graded answers are reported and can be saved as progress."""
+    deck_id = import_capitals(data_dir)
+    answers = data_dir / "answers.txt"
+    answers.write_text("paris\nMilan\n", encoding="utf-8")
+    capsys.readouterr()
+
+    assert cli.main(["grade", deck_id, str(answers), "--user", "alice", "--save"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split("\t")[:2] == ["1", "correct"]
+    assert lines[1].split("\t")[:2] == ["2", "wrong"]
+    assert lines[2] == "1/2 correct"
+    assert persistence.load_progress("alice", deck_id) == {"correct": 1, "total": 2}
+
+    assert cli.main(["stats", "--user", "alice"]) == 0
+    assert capsys.readouterr().out.splitlines()[0] == "Overall: 50% of 2 answers correct"
+
+
+def test_review_quizzes_due_cards_across_decks(data_dir, capsys, monkeypatch):
+    """Test that review reads one answer per due card and reschedules the cards it asked."""
+    deck_id = import_capitals(data_dir)
+    capsys.readouterr()
+    monkeypatch.setattr(sys, "stdin", io.StringIO("paris\nMilan\n"))
+    assert cli.main(["review", "--user", "alice"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "1/2\tWhat is the capital of France?"
+    assert lines[1] == "correct"
+    assert lines[3] == "wrong, the answer is: Rome"
+    assert lines[-1] == "1/2 correct"
+    assert persistence.load_progress("alice", deck_id) == {"correct": 1, "total": 2}
+
+    assert cli.main(["review", "--user", "alice"]) == 0
+    assert capsys.readouterr().out == "No cards are due for review.\n"
+
+
+def file_tree(root):
+    return sorted(os.path.join(path, name) for path, _, names in os.walk(root) for name in names)
+
+
+def test_read_commands_write_nothing(data_dir, monkeypatch):
+    """Test that export and stats leave the data directory as it was."""
+    deck_id = import_capitals(data_dir)
+    persistence.flush_progress()
+    # An account that is still only in the old users file must not be migrated by a read
+    (data_dir / "legacy_users.json").write_text(json.dumps({"bob": {"password": "x", "hint": "y"}}))
+    monkeypatch.setattr(auth, "USERS_FILE", str(data_dir / "legacy_users.json"))
+    monkeypatch.setattr(auth, "USERS_DIR", str(data_dir / "new_users"))
+    before = file_tree(data_dir)
+
+    assert cli.main(["stats", "--user", "bob"]) == 0
+    assert cli.main(["stats"]) == 0
+    assert cli.main(["export", deck_id, "--user", "alice"]) == 0
+    assert file_tree(data_dir) == before
+
+
+def test_unknown_user_is_an_error(data_dir, capsys):
+    """Test that commands for a missing account fail without touching storage."""
+    assert cli.main(["stats", "--user", "mallory"]) == 1
+    assert "mallory" in capsys.readouterr().err
+    assert not os.path.exists(data_dir / "progress" / "mallory")
+
+
+def test_unreadable_answers_are_an_error(data_dir, capsys):
+    """Test that an answers file that is not UTF-8 gives an error message instead of a traceback."""
+    deck_id = import_capitals(data_dir)
+    answers = data_dir / "answers.txt"
+    answers.write_bytes(b"\xff\xfe paris\n")
+    capsys.readouterr()
+    assert cli.main(["grade", deck_id, str(answers), "--user", "alice"]) == 1
+    assert capsys.readouterr().err.startswith("Error: ")
+
+
+def test_reindex_rebuilds_search_index(data_dir):
+    """Test that reindexing recreates a deleted search index."""
+    assert cli.main(["import", str(data_dir / "capitals.txt"), "--public", "--name", "Capitals"]) == 0
+    for name in os.listdir(data_dir / "decks"):
+        if name.startswith("public_search"):
+            os.remove(data_dir / "decks" / name)
+    persistence._search_indexes.clear()
+
+    assert cli.main(["reindex", "--user", "alice"]) == 0
+    assert [deck_id for deck_id, _ in persistence.search_public_decks("rome")] == list(persistence.load_public_catalog())
+
+
+def test_gc_removes_unused_card_lists(data_dir, capsys):
+    """Test that gc reclaims the card list of a deck that was saved again with other cards."""
+    deck_id = import_capitals(data_dir)
+    deck = persistence.load_user_deck("alice", deck_id)
+    deck.add_card(persistence.Card("What is the capital of Spain?", "Madrid"))
+    persistence.save_deck_to_private("alice", deck)
+    capsys.readouterr()
+
+    assert cli.main(["gc", "--grace-hours", "0"]) == 0
+    assert capsys.readouterr().out.startswith("Removed 1 unused card lists")
+    assert len(persistence.load_user_deck("alice", deck_id).cards) == 3
+
+
+def test_cli_never_imports_the_gui(tmp_path):
+    """Test that running a command loads neither tkinter nor PIL."""
+    script = (
+        "import sys, persistence, cli\n"
+        f"persistence.USER_PROGRESS_DIR = {str(tmp_path / 'progress')!r}\n"
+        "cli.main(['stats'])\n"
+        "print(sorted(name for name in ('tkinter', 'PIL', 'main') if name in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.join(ROOT, "src"),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "[]"
@@ -0,0 +1,41 @@
+import sys
+import os
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from content_store import ContentStore, encode_cards, encode_card_batch
+from models import Card
+
+
+def test_encoding_is_canonical():
+    """Test that Card objects and card dictionaries with missing hints encode the same."""
+    cards = [Card("Q1", "A1"), Card("Q2", "A2", "H2")]
+    as_dicts = [{"front": "Q1", "back": "A1", "hint": None}, {"back": "A2", "front": "Q2", "hint": "H2"}]
+    assert encode_cards(cards) == encode_cards(as_dicts)
+    assert encode_cards(cards) == f"[{encode_card_batch(cards[:1])},{encode_card_batch(cards[1:])}]".encode('utf-8')
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    """Test that storing the same cards again, in one piece or in chunks, reuses the stored list."""
+    store = ContentStore(str(tmp_path))
+    data = encode_cards([Card("Q", "A")])
+    digest, created = store.put(data)
+    assert created
+    assert store.put_chunks([data[:5], data[5:]]) == (digest, False)
+    assert store.read(digest) == data
+    assert list(store.digests()) == [digest]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_collect_garbage_keeps_live_and_recent_lists(tmp_path):
+    """Test that only unreferenced lists older than the grace period are removed."""
+    store = ContentStore(str(tmp_path))
+    live, _ = store.put(encode_cards([Card("Q1", "A1")]))
+    dead, _ = store.put(encode_cards([Card("Q2", "A2")]))
+
+    assert store.collect_garbage({live}) == (0, 0)
+    removed, freed = store.collect_garbage({live}, grace_seconds=-1)
+    assert removed == 1 and freed > 0
+    assert set(store.digests()) == {live}
@@ -16,12 +16,12 @@ except ImportError:
         # Exit or handle gracefully, as we can't run tests without pytest.
         sys.exit(1)
 
-# Add the project's root directory to the Python path
-# so we can import modules from the 'src' directory.
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from src.models import Card, Deck, Session
-from src.exceptions import CardError
+from models import Card, Deck, Session, LazyCardList, CardStore, COMPACT_DECK_THRESHOLD
+from exceptions import CardError
 
 def test_card_creation_success():
     """Test that a Card can be created with a front and a back."""
@@ -118,6 +118,55 @@ def test_deck_from_dict():
     assert deck.cards[0].hint == "test hint"
     assert deck.progress == {"correct": 5, "total": 10}
 
+def test_deck_from_dict_lazy():
+    """Test that a lazy Deck decodes cards only when they are accessed."""
+    deck_dict = {
+        "name": "Test Deck",
+        "deck_id": "deck_123",
+        "cards": [{"front": "A", "back": "B"}, {"front": "C", "back": "D", "hint": "E"}],
+        "progress": {"correct": 1, "total": 2}
+    }
+    deck = Deck.from_dict(deck_dict, lazy=True)
+    assert isinstance(deck.cards, LazyCardList)
+    assert len(deck.cards) == 2
+    assert all(isinstance(item, dict) for item in deck.cards._items)
+    assert deck.cards[1].hint == "E"
+    assert deck.cards[-1] is deck.cards[1]
+    assert [card.front for card in deck.cards[:1]] == ["A"]
+    assert len(deck.get_shuffled_cards()) == 2
+    assert deck.to_dict()["cards"] == [
+        {"front": "A", "back": "B", "hint": ""},
+        {"front": "C", "back": "D", "hint": "E"}
+    ]
+
+def test_large_lazy_deck_decodes_only_accessed_cards():
+    """Test that a lazy deck above the compact threshold still decodes its cards on access."""
+    card_data = [{"front": f"Q{i}", "back": f"A{i}"} for i in range(COMPACT_DECK_THRESHOLD)]
+    deck = Deck.from_dict({"name": "Big", "deck_id": "big", "cards": card_data}, lazy=True)
+    assert isinstance(deck.cards, LazyCardList)
+    assert all(isinstance(item, dict) for item in deck.cards._items)
+    assert deck.cards[42].front == "Q42"
+    assert sum(not isinstance(item, dict) for item in deck.cards._items) == 1
+    assert isinstance(Deck.from_dict({"cards": card_data}).cards, CardStore)
+
+def test_card_store_views():
+    """Test that a CardStore exposes the Card API through lightweight views."""
+    store = CardStore.from_dicts([{"front": "Café", "back": "B"}, {"front": "C", "back": "D", "hint": "E"}])
+    store.append(Card("F", "G"))
+    assert len(store) == 3
+    assert store[0].front == "Café"
+    assert store[-2].to_dict() == {"front": "C", "back": "D", "hint": "E"}
+    assert [card.front for card in store[1:]] == ["C", "F"]
+    with pytest.raises(IndexError):
+        store[3]
+
+def test_card_store_shuffle_permutes_indices():
+    """Test that shuffling a CardStore deck returns every card exactly once."""
+    deck = Deck("Test Deck", "deck_123", cards=CardStore(Card(str(i), "x") for i in range(50)))
+    shuffled_cards = deck.get_shuffled_cards()
+    assert len(shuffled_cards) == 50
+    assert sorted(int(card.front) for card in shuffled_cards) == list(range(50))
+
 def test_session_creation():
     """Test that a Session object can be created."""
     session = Session("Test Deck", 5)
@@ -0,0 +1,109 @@
+import sys
+import os
+import re
+import random
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from matcher import AnswerMatcher, matcher_for, is_similar, grade_batch
+from models import Card, CardStore
+from edit_distance import osa_distance
+
+
+def reference_is_similar(user_answer, correct_answer, strictness):
+    """The original FlashcardApp.is_similar, kept to check the matcher against."""
+    user_lower = user_answer.strip().lower()
+    correct_lower = correct_answer.strip().lower()
+    if re.search(r'\d{4}|\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}', user_lower) and user_lower != correct_lower:
+        return False
+    user_words = set(re.findall(r'\b\w+\b', user_lower))
+    correct_words = set(re.findall(r'\b\w+\b', correct_lower))
+    stop_words = {"the", "a", "an", "is", "of", "in", "to", "for", "on", "and", "by"}
+    user_words = user_words - stop_words
+    correct_words = correct_words - stop_words
+    if not user_words or not correct_words:
+        return user_lower == correct_lower
+    intersection = user_words.intersection(correct_words)
+    union = user_words.union(correct_words)
+    return (len(intersection) / len(union)) * 100 >= strictness
+
+
+ANSWERS = ["Paris", "Leonardo da Vinci", "The Battle of Hastings", "1066", "12/05/1999",
+           "100°C", "the", "A", "Mitochondria is the powerhouse of the cell", "New York City"]
+GUESSES = ["paris", " Paris ", "Rome", "leonardo", "da vinci leonardo", "Battle Hastings",
+           "the battle of hastings in 1066", "1066", "1067", "12/05/1999", "100°c", "100",
+           "the", "a", "an", "", "powerhouse cell", "mitochondria", "new york", "york city new"]
+
+
+def test_matcher_agrees_with_original_is_similar():
+    """Test that the matcher grades exactly like the original Jaccard check."""
+    for answer in ANSWERS:
+        matcher = AnswerMatcher(answer)
+        for guess in GUESSES:
+            for strictness in (0, 30, 50, 67, 80, 100):
+                expected = reference_is_similar(guess, answer, strictness)
+                assert matcher.matches(guess, strictness) == expected, (guess, answer, strictness)
+                assert is_similar(guess, answer, strictness) == expected
+
+
+def test_matcher_is_cached_on_cards():
+    """Test that cards keep their matcher until the answer changes."""
+    card = Card("Capital of France?", "Paris")
+    matcher = matcher_for(card)
+    assert matcher_for(card) is matcher
+    card.back = "Lyon"
+    assert matcher_for(card).matches("lyon", 80)
+    # Card views cannot hold the matcher, they share one per answer instead
+    store = CardStore([card, Card("Another", "Lyon")])
+    assert matcher_for(store[0]) is matcher_for(store[1])
+
+
+def test_grade_batch_matches_scalar_grading():
+    """Test that batch grading returns the same results and scores as the scalar path."""
+    pairs = [(guess, Card("Question", answer)) for answer in ANSWERS for guess in GUESSES if guess]
+    answers = [guess for guess, _ in pairs] + ["", "paris"]
+    cards = [card for _, card in pairs] + [Card("Q", "Paris"), Card("Q", "Paris")]
+    strictness = [(i * 7) % 101 for i in range(len(cards))]
+
+    results, scores = grade_batch(answers, cards, strictness)
+    for i, (answer, card) in enumerate(zip(answers, cards)):
+        matcher = AnswerMatcher(card.back)
+        assert results[i] == matcher.matches(answer, strictness[i])
+        assert scores[i] == matcher.similarity(answer)
+    assert grade_batch(["paris"], [Card("Q", "Paris")], 80) == ([True], [100.0])
+
+
+def reference_osa_distance(a, b):
+    """Textbook dynamic programming optimal string alignment distance."""
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def test_osa_distance_matches_dynamic_programming():
+    """Test the bit-parallel distance, including the bounded early exit."""
+    rng = random.Random(7)
+    for _ in range(2000):
+        a = "".join(rng.choice("abc") for _ in range(rng.randint(0, 8)))
+        b = "".join(rng.choice("abc") for _ in range(rng.randint(0, 8)))
+        bound = rng.randint(0, 4)
+        assert osa_distance(a, b, bound) == min(reference_osa_distance(a, b), bound + 1), (a, b, bound)
+
+
+def test_typo_tolerant_matching():
+    """Test that misspelled words are accepted only in typo-tolerant mode."""
+    assert not is_similar("Einstien", "Einstein", 80)
+    assert is_similar("Einstien", "Einstein", 80, typo_tolerant=True)
+    assert is_similar("albert einstien", "Albert Einstein", 80, typo_tolerant=True)
+    assert is_similar("Leonardo da Vinchi", "Leonardo da Vinci", 80, typo_tolerant=True)
+    # Full strictness allows no typos, and unrelated words stay wrong
+    assert not is_similar("Einstien", "Einstein", 100, typo_tolerant=True)
+    assert not is_similar("Newton", "Einstein", 50, typo_tolerant=True)
+    # Dates still have to match exactly
+    assert not is_similar("1067", "1066", 0, typo_tolerant=True)
@@ -0,0 +1,522 @@
+import sys
+import os
+import json
+import sqlite3
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import persistence
+from exceptions import InvalidNameError
+from models import Card, LazyCardList, card_key
+from progress_journal import ProgressJournal
+from progress_summary import ProgressSummary
+from sqlite_store import SQLiteStorage
+import due_index
+from conftest import make_deck
+
+
+def test_save_public_deck_updates_catalog(data_dir):
+    """Test that publishing a deck records it in the catalog."""
+    persistence.save_deck_to_public(make_deck(count=3))
+    catalog = persistence.load_public_catalog()
+    assert catalog["deck_123"]["name"] == "Test Deck"
+    assert catalog["deck_123"]["card_count"] == 3
+    assert len(catalog["deck_123"]["hash"]) == 64
+
+
+def test_sync_public_catalog_picks_up_external_changes(data_dir):
+    """Test that decks added or removed outside the app are reflected on sync."""
+    persistence.save_deck_to_public(make_deck(deck_id="kept"))
+    persistence.save_deck_to_public(make_deck(deck_id="removed"))
+    os.remove(os.path.join(persistence.PUBLIC_DECKS_DIR, "removed.json"))
+    with open(os.path.join(persistence.PUBLIC_DECKS_DIR, "added.json"), "w") as f:
+        json.dump(make_deck("Added", "added", count=1).to_dict(), f)
+
+    catalog = persistence.sync_public_catalog()
+    assert set(catalog) == {"kept", "added"}
+    assert catalog["added"]["name"] == "Added"
+    assert persistence.load_public_catalog() == catalog
+
+
+def test_load_public_deck(data_dir):
+    """Test that a single public deck can be loaded by ID."""
+    persistence.save_deck_to_public(make_deck())
+    deck = persistence.load_public_deck("deck_123")
+    assert deck.name == "Test Deck"
+    assert [card.front for card in deck.cards] == ["Q0", "Q1"]
+
+
+@pytest.fixture
+def sqlite_storage(data_dir, monkeypatch):
+    """Switches persistence to a SQLite database inside the temporary data directory."""
+    monkeypatch.setattr(persistence, "_storage_backend", None)
+    persistence.configure_storage("sqlite", str(data_dir / "flashcards.db"))
+    yield persistence._storage_backend
+    persistence._storage_backend.close()
+
+
+def test_sqlite_storage_round_trip(sqlite_storage):
+    """Test that decks and progress saved through persistence land in SQLite."""
+    persistence.save_deck_to_private("alice", make_deck())
+    persistence.save_progress("alice", "deck_123", {"correct": 2, "total": 3})
+    persistence.save_deck_to_public(make_deck("Shared", "pub_1", count=4))
+
+    decks = persistence.load_all_user_decks({"username": "alice"})
+    assert list(decks) == ["deck_123"]
+    assert decks["deck_123"].progress == {"correct": 2, "total": 3}
+    assert [card.back for card in decks["deck_123"].cards] == ["A0", "A1"]
+    assert persistence.load_public_catalog()["pub_1"]["card_count"] == 4
+    assert persistence.load_public_deck("pub_1").name == "Shared"
+    assert not os.listdir(persistence.PUBLIC_DECKS_DIR)
+
+
+def test_schedule_round_trip(data_dir):
+    """Test that spaced repetition state is saved next to the user's progress."""
+    assert persistence.load_schedule("alice", "deck_123") == {}
+    persistence.save_schedule("alice", "deck_123", {"abc": [2.5, 1.0, 1, 86400.0]})
+    assert persistence.load_schedule("alice", "deck_123") == {"abc": [2.5, 1.0, 1, 86400.0]}
+    # Schedule files must not be mistaken for legacy progress files
+    assert ProgressJournal(os.path.join(persistence.USER_PROGRESS_DIR, "alice")).all_progress() == {}
+
+
+def test_sqlite_storage_saves_schedules(sqlite_storage):
+    """Test that schedules are stored in the SQLite backend when it is enabled."""
+    persistence.save_schedule("alice", "deck_123", {"abc": [2.5, 6.0, 2, 5.0]})
+    assert persistence.load_schedule("alice", "deck_123") == {"abc": [2.5, 6.0, 2, 5.0]}
+    assert persistence.load_schedule("bob", "deck_123") == {}
+
+
+def test_due_index_spans_decks(data_dir):
+    """Test that due cards are found across decks, earliest first, loading only those decks."""
+    first, second = make_deck("First", "deck_1", count=3), make_deck("Second", "deck_2", count=2)
+    for deck in (first, second):
+        persistence.save_deck_to_private("alice", deck)
+    keys = [card_key(card) for card in first.cards]
+    schedule = {keys[0]: [2.5, 1.0, 1, 500.0], keys[1]: [2.5, 6.0, 2, 100.0], keys[2]: [2.5, 1.0, 1, 5000.0]}
+    persistence.update_due_index("alice", "deck_1", keys, schedule)
+    persistence.update_due_index("alice", "deck_2", [card_key(card) for card in second.cards], {})
+
+    due = persistence.load_due_cards("alice", now=1000.0)
+    assert [(deck_id, card.front) for deck_id, card in due] == [
+        ("deck_2", "Q0"), ("deck_2", "Q1"), ("deck_1", "Q1"), ("deck_1", "Q0")
+    ]
+    assert len(persistence.load_due_cards("alice", now=1000.0, limit=2)) == 2
+    # A deck with nothing due is not loaded at all
+    os.remove(os.path.join(persistence.PRIVATE_DECKS_DIR, "alice", "deck_1.json"))
+    assert [deck_id for deck_id, _ in persistence.load_due_cards("alice", now=50.0)] == ["deck_2", "deck_2"]
+
+
+def test_due_index_appends_updates_and_compacts(data_dir, monkeypatch):
+    """Test that deck updates are appended to the index log and folded into a snapshot."""
+    monkeypatch.setattr(due_index, "DUE_COMPACT_THRESHOLD", 3)
+    user_dir = str(data_dir / "progress" / "alice")
+    first, second = due_index.DueIndex(user_dir), due_index.DueIndex(user_dir)
+    first.update_deck("deck_1", [(5.0, "a"), (1.0, "b")])
+    second.update_deck("deck_2", [(2.0, "c")])
+    with open(first.path) as f:
+        assert len(f.readlines()) == 2
+    assert first.due(now=3.0) == [(1.0, "deck_1", "b"), (2.0, "deck_2", "c")]
+
+    for due in (6.0, 7.0, 8.0):
+        first.update_deck("deck_1", [(due, "a"), (1.0, "b")])
+    with open(first.path) as f:
+        assert len(f.readlines()) == 1
+    for index in (second, due_index.DueIndex(user_dir)):
+        assert index.due(now=10.0) == [(1.0, "deck_1", "b"), (2.0, "deck_2", "c"), (8.0, "deck_1", "a")]
+
+
+def test_due_index_reads_single_file_format(data_dir):
+    """Test that an index written as one JSON document by older versions is still read and extended."""
+    user_dir = data_dir / "progress" / "alice"
+    user_dir.mkdir(parents=True)
+    (user_dir / "due.index").write_text(json.dumps({"version": 1, "decks": {"deck_1": [[1.0, "a"]]}}))
+    index = due_index.DueIndex(str(user_dir))
+    index.update_deck("deck_2", [(2.0, "b")])
+    assert due_index.DueIndex(str(user_dir)).due(now=3.0) == [(1.0, "deck_1", "a"), (2.0, "deck_2", "b")]
+
+
+def test_due_index_extends_decks_in_batches(data_dir):
+    """Test that batches added to a deck are kept alongside its entries and read back in order."""
+    user_dir = str(data_dir / "progress" / "alice")
+    index = due_index.DueIndex(user_dir)
+    index.update_deck("deck_1", [(2.0, "a")])
+    index.extend_deck("deck_1", [(0.0, "c"), (0.0, "b")])
+    index.extend_deck("deck_1", [(0.0, "d")])
+    with open(index.path) as f:
+        assert len(f.readlines()) == 3
+    expected = [(0.0, "deck_1", "b"), (0.0, "deck_1", "c"), (0.0, "deck_1", "d"), (2.0, "deck_1", "a")]
+    assert index.due(now=3.0) == expected
+    assert due_index.DueIndex(user_dir).due(now=3.0) == expected
+
+
+def test_progress_summary_applies_deltas(data_dir):
+    """Test that saving progress updates the deck, user and global totals by the change only."""
+    persistence.save_progress("alice", "deck_1", {"correct": 2, "total": 3})
+    persistence.save_progress("alice", "deck_2", {"correct": 1, "total": 1})
+    persistence.save_progress("alice", "deck_1", {"correct": 5, "total": 7})
+    persistence.save_progress("bob", "deck_3", {"correct": 0, "total": 4})
+
+    summary = persistence.load_progress_summary("alice")
+    assert (summary["correct"], summary["total"]) == (6, 8)
+    assert summary["decks"]["deck_1"] == {"correct": 5, "total": 7}
+    overall = persistence.load_global_progress_summary()
+    assert (overall["correct"], overall["total"]) == (6, 12)
+    assert overall["users"]["bob"] == {"correct": 0, "total": 4}
+
+
+def test_progress_summary_is_built_from_existing_progress(data_dir):
+    """Test that the summary is rebuilt once from saved progress when no summary file exists."""
+    user_dir = os.path.join(persistence.USER_PROGRESS_DIR, "alice")
+    os.makedirs(user_dir)
+    with open(os.path.join(user_dir, "deck_1.json"), "w") as f:
+        json.dump({"correct": 3, "total": 4}, f)
+    summary = persistence.load_progress_summary("alice")
+    assert (summary["correct"], summary["total"]) == (3, 4)
+
+    persistence.save_progress("alice", "deck_1", {"correct": 4, "total": 5})
+    persistence.flush_progress()
+    persistence._progress_summaries.clear()
+    assert persistence.load_global_progress_summary()["correct"] == 4
+
+
+def test_progress_summary_batches_and_shares_files(data_dir):
+    """Test that totals are written in batches and that two writers of the files add up."""
+    first = ProgressSummary(persistence.USER_PROGRESS_DIR)
+    second = ProgressSummary(persistence.USER_PROGRESS_DIR)
+    first.record("alice", "deck_1", {"correct": 1, "total": 2})
+    assert not first.exists()
+
+    second.record("bob", "deck_2", {"correct": 2, "total": 2})
+    second.flush()
+    first.record("alice", "deck_1", {"correct": 2, "total": 3})
+    first.flush()
+    overall = second.global_summary()
+    assert (overall["correct"], overall["total"]) == (4, 5)
+    assert overall["users"] == {"alice": {"correct": 2, "total": 3}, "bob": {"correct": 2, "total": 2}}
+
+
+def test_progress_summary_is_stale_after_progress_saved_elsewhere(data_dir):
+    """Test that totals older than the user's progress journal are reported as not current."""
+    persistence.save_progress("alice", "deck_1", {"correct": 1, "total": 2})
+    persistence.flush_progress()
+    assert persistence.progress_summary_is_current("alice")
+
+    # Another process saves progress but has not written its totals yet
+    other = ProgressJournal(os.path.join(persistence.USER_PROGRESS_DIR, "alice"))
+    other.record("deck_1", {"correct": 2, "total": 3})
+    other.flush()
+    summary_path = os.path.join(persistence.USER_PROGRESS_DIR, "alice", "progress.summary")
+    modified = os.stat(summary_path).st_mtime_ns
+    os.utime(other.journal_path, ns=(modified + 10 ** 9, modified + 10 ** 9))
+    assert not persistence.progress_summary_is_current("alice")
+
+
+def test_sqlite_storage_stores_card_lists_once(sqlite_storage):
+    """Test that SQLite decks with the same cards share one stored card list, like the JSON files."""
+    assert persistence.save_deck_to_public(make_deck("First", "pub_1", count=3)) is None
+    assert persistence.save_deck_to_public(make_deck("Second", "pub_2", count=3)) == "pub_1"
+    persistence.save_deck_to_private("alice", make_deck("Mine", "deck_1", count=3))
+    conn = sqlite_storage._conn
+    assert conn.execute("SELECT count(*) FROM contents").fetchone()[0] == 1
+    assert persistence.load_public_deck("pub_2").cards.shared is persistence.load_user_deck("alice", "deck_1").cards.shared
+
+    persistence.save_deck_to_private("alice", make_deck("Mine", "deck_1", count=2))
+    assert persistence.collect_unused_content() == (0, 0)
+    persistence.save_deck_to_public(make_deck("First", "pub_1", count=1))
+    persistence.save_deck_to_public(make_deck("Second", "pub_2", count=1))
+    removed, freed = persistence.collect_unused_content()
+    assert removed == 1 and freed > 0
+    assert [card.back for card in persistence.load_user_deck("alice", "deck_1").cards] == ["A0", "A1"]
+
+
+def test_sqlite_storage_reads_decks_written_before_shared_card_lists(data_dir):
+    """Test that a database whose deck rows hold their cards gains the new column and still loads."""
+    db_path = str(data_dir / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE decks (owner TEXT NOT NULL, deck_id TEXT NOT NULL, name TEXT, card_count INTEGER NOT NULL, "
+                 "content_hash TEXT NOT NULL, data TEXT NOT NULL, updated_ns INTEGER NOT NULL, "
+                 "PRIMARY KEY (owner, deck_id)) WITHOUT ROWID")
+    conn.execute("INSERT INTO decks VALUES ('alice', 'deck_1', 'Old', 2, 'x', ?, 0)",
+                 (json.dumps(make_deck("Old", "deck_1").to_dict()),))
+    conn.commit()
+    conn.close()
+    storage = SQLiteStorage(db_path)
+    try:
+        assert [card.front for card in storage.load_user_deck("alice", "deck_1").cards] == ["Q0", "Q1"]
+        assert storage.collect_unused_content() == (0, 0)
+    finally:
+        storage.close()
+
+
+def test_sqlite_storage_imports_public_decks_as_references(sqlite_storage):
+    """Test that importing a public deck into SQLite stores a reference, which follows the public deck."""
+    persistence.save_deck_to_public(make_deck("Shared", "pub_1", count=3))
+    persistence.import_public_deck("alice", persistence.load_public_deck("pub_1"))
+    data = json.loads(sqlite_storage._conn.execute(
+        "SELECT data FROM decks WHERE owner = 'alice' AND deck_id = 'pub_1'").fetchone()[0])
+    assert data == {"name": "Shared", "deck_id": "pub_1", "public_ref": "pub_1", "overlay": {}}
+    deck = persistence.load_user_deck("alice", "pub_1")
+    assert deck.cards.shared is persistence.load_public_deck("pub_1").cards.shared
+
+    persistence.save_deck_to_public(make_deck("Shared", "pub_1", count=4))
+    assert len(persistence.load_all_user_decks({"username": "alice"})["pub_1"].cards) == 4
+
+
+def test_sqlite_storage_progress_summary(sqlite_storage):
+    """Test that the running totals also follow progress saved to SQLite."""
+    sqlite_storage.save_progress("alice", "deck_1", {"correct": 1, "total": 2})
+    assert persistence.load_progress_summary("alice")["total"] == 2
+    persistence.save_progress("alice", "deck_1", {"correct": 3, "total": 5})
+    assert persistence.load_global_progress_summary()["users"]["alice"] == {"correct": 3, "total": 5}
+
+
+def test_sqlite_storage_migrates_json_tree(data_dir, monkeypatch):
+    """Test that the existing JSON files are imported the first time SQLite is used."""
+    persistence.save_deck_to_private("bob", make_deck())
+    persistence.save_progress("bob", "deck_123", {"correct": 1, "total": 1})
+    persistence.save_deck_to_public(make_deck("Shared", "pub_1"))
+
+    monkeypatch.setattr(persistence, "_storage_backend", None)
+    persistence.configure_storage("sqlite", str(data_dir / "flashcards.db"))
+    try:
+        decks = persistence.load_all_user_decks({"username": "bob"})
+        assert decks["deck_123"].progress == {"correct": 1, "total": 1}
+        assert set(persistence.load_public_catalog()) == {"pub_1"}
+        assert persistence._storage_backend.is_migrated()
+    finally:
+        persistence._storage_backend.close()
+
+
+def test_progress_journal_round_trip(data_dir):
+    """Test that saved progress is readable before and after the journal is flushed."""
+    persistence.save_progress("carol", "deck_123", {"correct": 1, "total": 2})
+    persistence.save_progress("carol", "deck_123", {"correct": 3, "total": 4})
+    assert persistence.load_progress("carol", "deck_123") == {"correct": 3, "total": 4}
+
+    persistence.flush_progress()
+    reopened = ProgressJournal(str(data_dir / "progress" / "carol"))
+    assert reopened.get("deck_123") == {"correct": 3, "total": 4}
+    assert reopened.get("missing") is None
+
+
+def test_progress_journal_compaction_and_torn_tail(data_dir):
+    """Test that compaction keeps the latest values and a partial last line is ignored."""
+    user_dir = str(data_dir / "progress" / "dave")
+    journal = ProgressJournal(user_dir)
+    for total in range(1, 6):
+        journal.record("deck_a", {"correct": 0, "total": total})
+    journal.record("deck_b", {"correct": 1, "total": 1})
+    journal.compact()
+    journal.record("deck_a", {"correct": 6, "total": 6})
+    journal.flush()
+    with open(journal.journal_path, "a") as f:
+        f.write('{"d":"deck_b","p":{"corr')
+
+    reopened = ProgressJournal(user_dir)
+    assert reopened.get("deck_a") == {"correct": 6, "total": 6}
+    assert reopened.get("deck_b") == {"correct": 1, "total": 1}
+
+
+def test_progress_journal_shared_between_processes(data_dir):
+    """Test that compaction keeps records appended by another writer of the same files."""
+    user_dir = str(data_dir / "progress" / "hank")
+    first = ProgressJournal(user_dir)
+    second = ProgressJournal(user_dir)
+    first.record("deck_a", {"correct": 1, "total": 1})
+    first.flush()
+    assert second.get("deck_a") == {"correct": 1, "total": 1}
+
+    first.record("deck_a", {"correct": 2, "total": 2})
+    first.flush()
+    second.record("deck_b", {"correct": 0, "total": 1})
+    second.compact()
+    first.record("deck_c", {"correct": 3, "total": 3})
+    first.flush()
+
+    for journal in (first, second, ProgressJournal(user_dir)):
+        assert journal.all_progress() == {"deck_a": {"correct": 2, "total": 2},
+                                          "deck_b": {"correct": 0, "total": 1},
+                                          "deck_c": {"correct": 3, "total": 3}}
+
+
+def test_progress_journal_reads_legacy_files(data_dir):
+    """Test that per-deck progress files from older versions are still used."""
+    user_dir = data_dir / "progress" / "erin"
+    user_dir.mkdir(parents=True)
+    (user_dir / "old_deck.json").write_text(json.dumps({"correct": 2, "total": 5}))
+    assert persistence.load_progress("erin", "old_deck") == {"correct": 2, "total": 5}
+    persistence.save_progress("erin", "old_deck", {"correct": 3, "total": 6})
+    assert persistence.load_progress("erin", "old_deck") == {"correct": 3, "total": 6}
+
+
+def test_import_public_deck_stores_reference(data_dir):
+    """Test that importers share one in-memory copy of a public deck."""
+    persistence.save_deck_to_public(make_deck("Shared", "pub_1", count=3))
+    public_deck = persistence.load_public_deck("pub_1")
+    persistence.import_public_deck("frank", public_deck)
+    persistence.import_public_deck("gina", public_deck)
+
+    with open(os.path.join(persistence.PRIVATE_DECKS_DIR, "frank", "pub_1.json")) as f:
+        assert json.load(f)["public_ref"] == "pub_1"
+
+    frank_deck = persistence.load_all_user_decks({"username": "frank"})["pub_1"]
+    gina_deck = persistence.load_all_user_decks({"username": "gina"})["pub_1"]
+    assert frank_deck.name == "Shared"
+    assert [card.front for card in frank_deck.cards] == ["Q0", "Q1", "Q2"]
+    assert frank_deck.cards.shared is gina_deck.cards.shared
+    frank_deck.add_card(Card("Mine", "Only"))
+    assert len(gina_deck.cards) == 3 and len(public_deck.cards) == 3
+    assert frank_deck.progress == {"correct": 0, "total": 0}
+
+
+def test_load_all_user_decks_reports_bad_files(data_dir, capsys):
+    """Test that parallel loading still reports unreadable decks one file at a time."""
+    for i in range(5):
+        persistence.save_deck_to_private("henry", make_deck(f"Deck {i}", f"deck_{i}"))
+    persistence.save_progress("henry", "deck_3", {"correct": 1, "total": 2})
+    with open(os.path.join(persistence.PRIVATE_DECKS_DIR, "henry", "broken.json"), "w") as f:
+        f.write("{not json")
+
+    decks = persistence.load_all_user_decks({"username": "henry"})
+    assert sorted(decks) == [f"deck_{i}" for i in range(5)]
+    assert decks["deck_3"].progress == {"correct": 1, "total": 2}
+    assert "Error loading deck broken.json" in capsys.readouterr().out
+
+
+def test_deck_cache_serves_unchanged_decks(data_dir):
+    """Test that reloading unchanged decks reuses the parsed cards until a save, without sharing changes."""
+    persistence.save_deck_to_private("iris", make_deck())
+    first = persistence.load_all_user_decks({"username": "iris"})["deck_123"]
+    second = persistence.load_all_user_decks({"username": "iris"})["deck_123"]
+    assert second is not first and second.cards.shared is first.cards.shared
+    first.add_card(Card("Mine", "Only"))
+    first.progress["correct"] = 5
+    third = persistence.load_user_deck("iris", "deck_123")
+    assert len(third.cards) == 2 and third.progress == {"correct": 0, "total": 0}
+
+    persistence.save_deck_to_private("iris", make_deck("Renamed"))
+    reloaded = persistence.load_all_user_decks({"username": "iris"})["deck_123"]
+    assert reloaded is not first
+    assert reloaded.name == "Renamed"
+
+
+def test_deck_cache_builds_the_requested_representation(data_dir):
+    """Test that decks written before the content store are built lazily or not, as each caller asks."""
+    with open(os.path.join(persistence.PUBLIC_DECKS_DIR, "old.json"), "w") as f:
+        json.dump(make_deck("Old", "old").to_dict(), f)
+    path = persistence._get_public_deck_path("old")
+    assert isinstance(persistence.load_deck(path).cards, list)
+    assert isinstance(persistence.load_deck(path, lazy=True).cards, LazyCardList)
+    assert isinstance(persistence.load_deck(path).cards, list)
+
+
+def test_deck_cache_evicts_least_recently_used(tmp_path):
+    """Test that the cache stays within its budget by evicting the oldest entries."""
+    cache = persistence.DeckCache(budget_bytes=10)
+    paths = []
+    for name in "abc":
+        path = tmp_path / name
+        path.write_bytes(b"x" * 4)
+        paths.append(str(path))
+        cache.put(str(path), os.stat(path), name)
+
+    assert cache.get(paths[0], os.stat(paths[0])) is None
+    assert cache.get(paths[2], os.stat(paths[2])) == "c"
+    with open(paths[2], "ab") as f:
+        f.write(b"y")
+    assert cache.get(paths[2], os.stat(paths[2])) is None
+
+
+def test_public_deck_search_follows_saves(data_dir):
+    """Test that public decks are searchable as soon as they are saved."""
+    persistence.save_deck_to_public(make_deck("Spanish Verbs", "verbs"))
+    persistence.save_deck_stream(None, "streamed", "Streamed", iter([Card("Boiling point?", "100 degrees")]))
+    assert [deck_id for deck_id, _ in persistence.search_public_decks("spanish")] == ["verbs"]
+    assert [deck_id for deck_id, _ in persistence.search_public_decks("boil", prefix_last=True)] == ["streamed"]
+
+    os.remove(os.path.join(persistence.PUBLIC_DECKS_DIR, "verbs.json"))
+    persistence.sync_public_catalog()
+    assert persistence.search_public_decks("spanish") == []
+
+
+def test_missing_search_index_is_built_in_background(data_dir, monkeypatch):
+    """Test that a missing search index is built on a background thread instead of by the first search."""
+    persistence.save_deck_to_public(make_deck("Spanish Verbs", "verbs"))
+    for name in os.listdir(os.path.dirname(persistence.PUBLIC_CATALOG_PATH)):
+        if name.startswith("public_search"):
+            os.remove(os.path.join(os.path.dirname(persistence.PUBLIC_CATALOG_PATH), name))
+    persistence._search_indexes.clear()
+    threads = []
+
+    class RecordedThread:
+        def __init__(self, target, args, daemon):
+            threads.append((target, args))
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr(persistence.threading, "Thread", RecordedThread)
+
+    assert persistence.search_public_decks("spanish") == []
+    assert len(threads) == 1
+    target, args = threads[0]
+    target(*args)
+    assert [deck_id for deck_id, _ in persistence.search_public_decks("spanish")] == ["verbs"]
+    assert len(threads) == 1
+
+
+def test_identical_decks_share_stored_cards(data_dir):
+    """Test that duplicate public decks are detected and every copy shares one card list."""
+    assert persistence.save_deck_to_public(make_deck("Original", "original", count=3)) is None
+    assert persistence.save_deck_to_public(make_deck("Copy", "copy", count=3)) == "original"
+    persistence.save_deck_to_private("kate", make_deck("Mine", "mine", count=3))
+
+    catalog = persistence.load_public_catalog()
+    assert catalog["original"]["content"] == catalog["copy"]["content"]
+    assert len(list(persistence._get_content_store().digests())) == 1
+    original = persistence.load_public_deck("original")
+    private = persistence.load_all_user_decks({"username": "kate"})["mine"]
+    assert original.cards.shared is private.cards.shared
+    assert (private.name, [card.back for card in private.cards]) == ("Mine", ["A0", "A1", "A2"])
+    # Changing one deck's cards copies them first
+    private.add_card(Card("Q3", "A3"))
+    assert len(original.cards) == 3
+
+
+def test_collect_unused_content_reclaims_replaced_cards(data_dir):
+    """Test that card lists no deck refers to any more are removed by garbage collection."""
+    persistence.save_deck_to_private("kate", make_deck(count=2))
+    persistence.save_deck_to_private("kate", make_deck(count=4))
+    persistence.save_deck_to_public(make_deck("Shared", "shared", count=4))
+    assert len(list(persistence._get_content_store().digests())) == 2
+
+    assert persistence.collect_unused_content()[0] == 0
+    removed, freed = persistence.collect_unused_content(grace_seconds=-1)
+    assert removed == 1 and freed > 0
+    assert len(persistence.load_public_deck("shared").cards) == 4
+
+
+def test_existing_names_that_are_not_plain_keep_working(data_dir):
+    """Test that names older versions allowed are read in place or encoded, and only new decks are checked."""
+    legacy_dir = data_dir / "decks" / "private" / "Zoë Smith"
+    legacy_dir.mkdir(parents=True)
+    (legacy_dir / "my deck.json").write_text(json.dumps(make_deck("Old", "my deck").to_dict()))
+    decks = persistence.load_all_user_decks({"username": "Zoë Smith"})
+    assert list(decks) == ["my deck"]
+    assert persistence.load_user_deck("Zoë Smith", "my deck").name == "Old"
+
+    persistence.save_schedule("Zoë Smith", "../my deck", {"abc": [2.5, 1.0, 1, 5.0]})
+    assert persistence.load_schedule("Zoë Smith", "../my deck") == {"abc": [2.5, 1.0, 1, 5.0]}
+    assert os.listdir(persistence.USER_PROGRESS_DIR) == ["%Zo%C3%AB%20Smith"]
+    persistence.save_progress("Zoë Smith", "my deck", {"correct": 1, "total": 2})
+    persistence.flush_progress()
+    assert persistence.all_progress() == {"Zoë Smith": {"my deck": {"correct": 1, "total": 2}}}
+
+    with pytest.raises(InvalidNameError):
+        persistence.save_deck_to_private("Zoë Smith", make_deck("New", "new deck"))
+    persistence.save_deck_to_private("Zoë Smith", make_deck("Renamed", "my deck"))
+    assert persistence.load_user_deck("Zoë Smith", "my deck").name == "Renamed"
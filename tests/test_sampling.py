@@ -0,0 +1,54 @@
+import sys
+import os
+import random
+from collections import Counter
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from card_stats import CardStats
+from models import Card, Deck
+from sampling import FenwickSampler, card_weight, DAY_SECONDS
+
+
+def test_fenwick_sampler_follows_weights():
+    """Test that draws follow the weights, including after live updates."""
+    sampler = FenwickSampler([1, 0, 3, 0, 6], rng=random.Random(3))
+    counts = Counter(sampler.sample() for _ in range(20000))
+    assert set(counts) == {0, 2, 4}
+    assert 0.55 < counts[4] / 20000 < 0.65
+
+    sampler.update(4, 0)
+    sampler.update(1, 6)
+    assert sampler.total() == 10
+    counts = Counter(sampler.sample() for _ in range(20000))
+    assert set(counts) == {0, 1, 2}
+    assert 0.55 < counts[1] / 20000 < 0.65
+
+
+def test_fenwick_sampler_rejects_all_zero_weights():
+    """Test that sampling with nothing to draw fails loudly."""
+    with pytest.raises(IndexError):
+        FenwickSampler([0, 0]).sample()
+
+
+def test_card_weight_prefers_weak_and_stale_cards():
+    """Test that missed and long unseen cards weigh more than known or just seen ones."""
+    now = 100 * DAY_SECONDS
+    weak = card_weight(CardStats(10, 2, now - DAY_SECONDS, -3), now)
+    known = card_weight(CardStats(10, 10, now - DAY_SECONDS, 10), now)
+    just_seen = card_weight(CardStats(10, 2, now, -3), now)
+    unseen = card_weight(CardStats(0, 0, 0.0, 0), now)
+    assert weak > known
+    assert weak > just_seen
+    assert unseen > known
+
+
+def test_deck_weighted_sampler():
+    """Test that a deck builds a sampler over its cards."""
+    deck = Deck("Weighted", "weighted_1", [Card("Q1", "A1"), Card("Q2", "A2")])
+    sampler = deck.get_weighted_sampler(lambda card: 1.0 if card.front == "Q2" else 0.0)
+    assert {sampler.sample() for _ in range(50)} == {1}
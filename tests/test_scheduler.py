@@ -0,0 +1,52 @@
+import sys
+import os
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from scheduler import Scheduler, CardSchedule, DAY_SECONDS, RELEARN_DELAY, card_key, review_quality
+from conftest import make_cards
+
+
+def test_card_schedule_follows_sm2_intervals():
+    """Test the SM-2 interval progression and the relearning step."""
+    schedule = CardSchedule()
+    intervals = []
+    for _ in range(4):
+        schedule.review(5, now=0)
+        intervals.append(schedule.interval)
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] > 6.0 and intervals[3] > intervals[2]
+    assert schedule.due == intervals[3] * DAY_SECONDS
+
+    schedule.review(review_quality(False, 1), now=100)
+    assert schedule.repetitions == 0
+    assert schedule.due == 100 + RELEARN_DELAY
+    assert schedule.ease >= 1.3
+
+
+def test_scheduler_draws_due_cards_in_order():
+    """Test that new cards come first in deck order and reviewed cards wait until due."""
+    cards = make_cards(5)
+    scheduler = Scheduler(cards)
+    assert scheduler.due_count(now=0) == 5
+    first = scheduler.next_due(now=0)
+    assert first is cards[0]
+    scheduler.review(first, review_quality(True, 1), now=0)
+    assert [scheduler.next_due(now=0) for _ in range(4)] == cards[1:]
+    assert scheduler.next_due(now=0) is None
+    assert scheduler.next_due(now=DAY_SECONDS) is cards[0]
+
+
+def test_scheduler_state_survives_reordering():
+    """Test that saved schedules follow cards by content, not by position."""
+    cards = make_cards(5)
+    scheduler = Scheduler(cards)
+    scheduler.review(cards[2], review_quality(True, 1), now=0)
+    state = scheduler.to_dict()
+    assert list(state) == [card_key(cards[2])]
+
+    reloaded = Scheduler(list(reversed(cards)), state)
+    assert reloaded.due_count(now=0) == 4
+    assert reloaded.due_count(now=DAY_SECONDS) == 5
@@ -0,0 +1,82 @@
+import sys
+import os
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import search_index
+from models import Card
+from search_index import SearchIndex, deck_terms, parse_query
+
+
+DECKS = {
+    "capitals": deck_terms("European Capitals", [Card("Capital of France?", "Paris"), Card("Capital of Spain?", "Madrid")]),
+    "rivers": deck_terms("Rivers", [Card("Longest river in France?", "Loire", "Starts with L")]),
+    "chem": deck_terms("Chemistry", [Card("Symbol for gold?", "Au"), Card("Symbol for iron?", "Fe")]),
+}
+
+
+def test_parse_query_groups_or_and_prefixes():
+    """Test that words are ANDed, OR joins alternatives and * marks a prefix."""
+    assert parse_query("france OR spain capit*") == [[("france", False), ("spain", False)], [("capit", True)]]
+    assert parse_query("The river", prefix_last=True) == [[("river", True)]]
+    assert parse_query("OR the") == []
+
+
+def test_search_ranks_and_combines_terms(tmp_path):
+    """Test AND, OR and prefix lookups, with decks matching more words ranked first."""
+    index = SearchIndex(str(tmp_path))
+    index.rebuild(DECKS)
+
+    assert [deck_id for deck_id, _ in index.search("france OR loire")] == ["rivers", "capitals"]
+    assert [deck_id for deck_id, _ in index.search("france paris")] == ["capitals"]
+    assert sorted(deck_id for deck_id, _ in index.search("gold OR madrid")) == ["capitals", "chem"]
+    assert [deck_id for deck_id, _ in index.search("capital")] == ["capitals"]
+    assert [deck_id for deck_id, _ in index.search("chem", prefix_last=True)] == ["chem"]
+    assert index.search("france gold") == []
+
+
+def test_incremental_updates_survive_reopening(tmp_path):
+    """Test that saved and removed decks are found through the journal and after compaction."""
+    index = SearchIndex(str(tmp_path))
+    index.rebuild(DECKS)
+    index.update_deck("capitals", deck_terms("Asian Capitals", [Card("Capital of Japan?", "Tokyo")]))
+    index.update_deck("planets", deck_terms("Planets", [Card("Red planet?", "Mars")]))
+    index.remove_deck("chem")
+    index.close()
+
+    reopened = SearchIndex(str(tmp_path))
+    assert [deck_id for deck_id, _ in reopened.search("france")] == ["rivers"]
+    assert [deck_id for deck_id, _ in reopened.search("tokyo")] == ["capitals"]
+    assert reopened.search("gold") == []
+    assert [deck_id for deck_id, _ in reopened.search("mar*")] == ["planets"]
+
+    reopened._compact()
+    assert not os.path.exists(reopened.journal_path)
+    assert sorted(deck_id for deck_id, _ in reopened.search("capital* OR planet*")) == ["capitals", "planets"]
+
+
+def test_journal_is_compacted_at_threshold(tmp_path, monkeypatch):
+    """Test that enough journal records are folded into a new segment."""
+    monkeypatch.setattr(search_index, "SEARCH_COMPACT_THRESHOLD", 3)
+    index = SearchIndex(str(tmp_path))
+    for number in range(3):
+        index.update_deck(f"deck_{number}", deck_terms(f"Deck {number}", [Card("Q", "A")]))
+    assert not os.path.exists(index.journal_path)
+    assert len(index.search("deck")) == 3
+
+
+def test_rebuild_keeps_updates_made_while_reading_decks(tmp_path):
+    """Test that decks saved or removed during a rebuild win over the decks it read."""
+    index = SearchIndex(str(tmp_path))
+    index.start_rebuild()
+    index.update_deck("chem", None)
+    index.update_deck("rivers", deck_terms("Rivers", [Card("Longest river in Italy?", "Po")]))
+    assert not index.exists()
+    index.rebuild(DECKS)
+
+    assert index.exists()
+    assert index.search("gold") == []
+    assert [deck_id for deck_id, _ in index.search("italy")] == ["rivers"]
+    assert index.search("loire") == []
@@ -0,0 +1,38 @@
+import sys
+import os
+import threading
+import time
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from startup_profile import StartupProfiler
+
+
+def test_foreground_phases_add_up_to_time_to_interactive():
+    """Test that each marked phase is timed from the end of the previous one."""
+    profiler = StartupProfiler(time.perf_counter() - 0.05)
+    profiler.mark("imports")
+    time.sleep(0.01)
+    profiler.mark("widget construction")
+
+    (imports, first), (widgets, second) = profiler.phases
+    assert (imports, widgets) == ("imports", "widget construction")
+    assert first >= 0.05 and second >= 0.01
+    assert abs(profiler.time_to_interactive() - (first + second)) < 1e-9
+
+
+def test_report_lists_background_phases_separately():
+    """Test that background work is reported apart from the time to interactive."""
+    profiler = StartupProfiler()
+    profiler.mark("imports")
+    thread = threading.Thread(target=profiler.record, args=("data load", 0.25))
+    thread.start()
+    thread.join()
+
+    lines = profiler.report().splitlines()
+    assert lines[0] == "Startup profile:"
+    assert [line.split()[0] for line in lines[1:]] == ["imports", "time", "data"]
+    assert lines[-1].startswith("  data load (background)")
+    assert lines[-1].endswith("250.0 ms")
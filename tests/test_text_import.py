@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+
+import pytest
+
+# Add the 'src' directory to the Python path
+# so its modules can be imported by name.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import persistence
+from text_import import iter_text_cards, import_text_deck
+
+GUIDE_EXAMPLE = """Q: What is the capital of France?
+A: Paris
+H: It is a city known for the Eiffel Tower.
+
+Q: Who painted the Mona Lisa?
+A: Leonardo da Vinci
+
+Q: What is the boiling point of water in Celsius?
+A: 100°C
+"""
+
+
+def test_iter_text_cards_parses_guide_example():
+    """Test that the example from the import guide is parsed card by card."""
+    cards = list(iter_text_cards(GUIDE_EXAMPLE.splitlines()))
+    assert [card.front for card in cards] == [
+        "What is the capital of France?",
+        "Who painted the Mona Lisa?",
+        "What is the boiling point of water in Celsius?"
+    ]
+    assert cards[0].hint == "It is a city known for the Eiffel Tower."
+    assert cards[2].back == "100°C"
+
+
+def test_iter_text_cards_reports_malformed_blocks():
+    """Test that malformed blocks are skipped and reported with line numbers."""
+    text = "Q: a\nA: b\nH: c\nH: d\n\nA: orphan\n\nQ: no answer\n\nQ: fine\nA: ok\n"
+    errors = []
+    cards = list(iter_text_cards(text.splitlines(), "deck.txt", on_error=errors.append))
+    assert [card.front for card in cards] == ["fine"]
+    assert [error.line_number for error in errors] == [4, 6, 8]
+
+
+def test_iter_text_cards_raises_without_error_handler():
+    """Test that a malformed block stops the import when no handler is given."""
+    with pytest.raises(Exception) as excinfo:
+        list(iter_text_cards(["Q: question", "oops"]))
+    assert excinfo.value.line_number == 2
+
+
+def test_import_text_deck_writes_private_deck(tmp_path, monkeypatch):
+    """Test that an imported text file becomes a loadable private deck."""
+    monkeypatch.setattr(persistence, "PRIVATE_DECKS_DIR", str(tmp_path / "decks" / "private"))
+    monkeypatch.setattr(persistence, "PUBLIC_DECKS_DIR", str(tmp_path / "decks" / "public"))
+    monkeypatch.setattr(persistence, "USER_PROGRESS_DIR", str(tmp_path / "progress"))
+    deck_file = tmp_path / "Geography.txt"
+    deck_file.write_text(GUIDE_EXAMPLE, encoding="utf-8")
+
+    deck_id, card_count = import_text_deck(str(deck_file), "alice", batch_size=2)
+    assert card_count == 3
+    with open(os.path.join(persistence.PRIVATE_DECKS_DIR, "alice", f"{deck_id}.json")) as f:
+        deck_data = json.load(f)
+    assert deck_data["name"] == "Geography"
+    assert deck_data["card_count"] == 3
+    content_path = persistence._get_content_store().path(deck_data["content"])
+    with open(content_path) as f:
+        assert len(json.load(f)) == 3
+    assert persistence.load_all_user_decks({"username": "alice"})[deck_id].cards[1].back == "Leonardo da Vinci"
+    assert sorted(card.back for _, card in persistence.load_due_cards("alice")) == ["100°C", "Leonardo da Vinci", "Paris"]